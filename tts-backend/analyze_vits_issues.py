@@ -3,6 +3,9 @@ import json
 import matplotlib.pyplot as plt
 import numpy as np
 
+from checkpoint_reader import CheckpointReader
+from param_stats import parameter_stats
+
 def analyze_model_issues(model_path, config_path):
     """Analyze VITS model architecture and identify potential issues"""
     # Load config
@@ -10,36 +13,44 @@ def analyze_model_issues(model_path, config_path):
         config = json.load(f)
     
     # Load model
-    checkpoint = torch.load(model_path, map_location='cpu')
-    state_dict = checkpoint['model']
+    # One pass over the weights; the checks below only look up statistics
+    with CheckpointReader(model_path) as checkpoint:
+        stats = parameter_stats(checkpoint.refs())
+    tensors = stats['tensors']
     
     issues = []
     recommendations = []
     
     # Check embedding ranges
-    emb_weights = state_dict.get('text_encoder.emb.weight', None)
-    if emb_weights is not None:
-        emb_std = emb_weights.std().item()
+    emb_stats = tensors.get('text_encoder.emb.weight', None)
+    if emb_stats is not None:
+        emb_std = emb_stats['std']
         if emb_std < 0.1:
             issues.append("Text embeddings have low variance")
             recommendations.append("Increase embedding initialization scale")
     
     # Check decoder upsample ratios
-    decoder_ups = [k for k in state_dict.keys() if 'waveform_decoder.ups' in k]
+    decoder_ups = [k for k in tensors if 'waveform_decoder.ups' in k]
     if len(decoder_ups) > 0:
-        up_weights = [state_dict[k].std().item() for k in decoder_ups]
+        up_weights = [tensors[k]['std'] for k in decoder_ups]
         if min(up_weights) < 0.01:
             issues.append("Very small upsampling weights")
             recommendations.append("Adjust upsampling initialization")
     
     # Check duration predictor
-    dur_weights = [v for k, v in state_dict.items() if 'duration_predictor' in k]
+    dur_weights = [s for k, s in tensors.items() if 'duration_predictor' in k]
     if dur_weights:
-        dur_std = np.mean([w.std().item() for w in dur_weights])
+        dur_std = np.nanmean([s['std'] for s in dur_weights])
         if dur_std > 0.3:
             issues.append("Duration predictor weights too large")
             recommendations.append("Reduce duration predictor learning rate")
     
+    # Non-finite weights anywhere make every other check moot
+    for comp, comp_stats in stats['components'].items():
+        if comp_stats['nans'] or comp_stats['infs']:
+            issues.append(f"{comp} has {comp_stats['nans']} NaN and {comp_stats['infs']} Inf weights")
+            recommendations.append(f"Resume from an earlier checkpoint; lower the learning rate for {comp}")
+    
     # Save analysis
     with open('analysis_outputs/model_issues.txt', 'w') as f:
         f.write("VITS Model Analysis\n\n")
@@ -5,6 +5,8 @@ from TTS.tts.configs.vits_config import VitsConfig
 from TTS.tts.models.vits import Vits
 import os
 
+from checkpoint_reader import CheckpointReader
+
 def analyze_model_components(model_path, config_path):
     """Analyze individual components of the VITS model"""
     try:
@@ -12,8 +14,8 @@ def analyze_model_components(model_path, config_path):
         config = VitsConfig()
         config.load_json(config_path)
         model = Vits.init_from_config(config)
-        checkpoint = torch.load(model_path, map_location="cpu")
-        model.load_state_dict(checkpoint["model"])
+        with CheckpointReader(model_path) as checkpoint:
+            model.load_state_dict(checkpoint.state_dict())
         model.eval()
         
         os.makedirs("analysis_outputs", exist_ok=True)
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from checkpoint_writer import latest_checkpoint
+
+SUBSET_NAME = "eval_subset.json"
+DEFAULT_SUBSET_SIZE = 64
+METRICS_NAME = "eval_metrics.jsonl"
+DURATION_BUCKETS = 4
+
+
+def select_eval_subset(samples, size, seed=0):
+    """Fixed eval subset stratified by speaker and duration quartile
+
+    Every stratum gets at least one clip and the rest is shared in proportion to
+    stratum size. File size stands in for duration (the clips are 16-bit PCM).
+    """
+    if size >= len(samples):
+        return list(samples)
+    sizes = sorted(os.path.getsize(s["audio_file"]) for s in samples)
+    edges = [sizes[len(sizes) * q // DURATION_BUCKETS] for q in range(1, DURATION_BUCKETS)]
+
+    strata = {}
+    for sample in sorted(samples, key=lambda s: s["audio_file"]):
+        bucket = sum(os.path.getsize(sample["audio_file"]) >= edge for edge in edges)
+        strata.setdefault((sample.get("speaker_name"), bucket), []).append(sample)
+
+    rng = random.Random(seed)
+    subset = []
+    for key in sorted(strata, key=str):
+        members = strata[key]
+        take = max(1, round(size * len(members) / len(samples)))
+        subset.extend(rng.sample(members, min(take, len(members))))
+    return subset
+
+
+def load_eval_subset(path, samples, size, seed=0):
+    """Reuse the subset saved at path while its clips are still among samples, else select a new one"""
+    available = {s["audio_file"]: s for s in samples}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["size"] == size and all(audio_file in available for audio_file in saved["audio_files"]):
+            return [available[audio_file] for audio_file in saved["audio_files"]]
+    except FileNotFoundError:
+        pass
+
+    subset = select_eval_subset(samples, size, seed)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"size": size, "seed": seed, "audio_files": [s["audio_file"] for s in subset]}, f, indent=1)
+    os.replace(path + ".tmp", path)
+    return subset
+
+
+def evaluate(model, config, samples):
+    """Per-batch average of eval losses over samples, running eval_step like the Trainer does"""
+    import torch
+
+    criterion = model.get_criterion()
+    loader = model.get_data_loader(config=config, assets={}, is_eval=True, samples=samples, verbose=False,
+                                   num_gpus=0)
+    totals, count = {}, 0
+    model.eval()
+    with torch.no_grad():
+        for batch in loader:
+            batch = model.format_batch(batch)
+            batch = model.format_batch_on_device(batch)
+            # Multi-optimizer models (VITS) evaluate one pass per criterion
+            for idx in range(len(criterion)) if isinstance(criterion, list) else [None]:
+                if idx is None:
+                    _, loss_dict = model.eval_step(batch, criterion)
+                else:
+                    _, loss_dict = model.eval_step(batch, criterion, idx)
+                for key, value in (loss_dict or {}).items():
+                    value = value.item() if torch.is_tensor(value) else value
+                    totals[key] = totals.get(key, 0.0) + value
+            count += 1
+    return {key: value / count for key, value in totals.items()} if count else {}
+
+
+def load_eval_model(model_name, config):
+    """The training model class for model_name, with the caches its training script uses"""
+    from TTS.tts.utils.speakers import SpeakerManager
+    from TTS.tts.utils.text.tokenizer import TTSTokenizer
+    from TTS.utils.audio import AudioProcessor
+
+    from phoneme_store import use_packed_phonemes
+
+    # Coqui's init_from_config always builds the base class, so construct it like the training scripts do
+    ap = AudioProcessor.init_from_config(config, verbose=False)
+    tokenizer, config = TTSTokenizer.init_from_config(config)
+    use_packed_phonemes(config.phoneme_cache_path)
+    # Multi-speaker runs point config.speakers_file at the speakers.pth saved in the run folder
+    speaker_manager = SpeakerManager.init_from_config(config)
+    if model_name == "vits":
+        from train_vits import TrainVits
+
+        return TrainVits(config, ap, tokenizer, speaker_manager=speaker_manager)
+    from train_glowtts import TrainGlowTTS
+
+    return TrainGlowTTS(config, ap, tokenizer, speaker_manager=speaker_manager)
+
+
+def watch(run_dir, model_name, subset_path, parent_pid=None, poll=30, threads=1):
+    """Evaluate each new checkpoint in run_dir until the training process exits
+
+    Without parent_pid only the latest checkpoint is evaluated.
+    """
+    import torch
+    from torch.utils.tensorboard import SummaryWriter
+    from TTS.config import load_config
+    from TTS.tts.datasets import load_tts_samples
+
+    torch.set_num_threads(threads)
+    config = load_config(os.path.join(run_dir, "config.json"))
+    with open(subset_path or os.path.join(config.datasets[0].path, SUBSET_NAME), "r", encoding="utf-8") as f:
+        audio_files = set(json.load(f)["audio_files"])
+    samples, _ = load_tts_samples(config.datasets, eval_split=False)
+    samples = [s for s in samples if s["audio_file"] in audio_files]
+    if model_name == "vits" and config.model_args.use_speaker_embedding:
+        from train_vits import label_speakers
+
+        label_speakers(samples)
+    model = load_eval_model(model_name, config)
+    if model_name == "vits":
+        from feature_store import FeatureStore, build_feature_store
+        from train_vits import FEATURE_STORE_DIR
+
+        # The subset is small, so make sure its features are cached instead of recomputed every round
+        build_feature_store(samples, config.audio, FEATURE_STORE_DIR, workers=1)
+        model.feature_store = FeatureStore.open_for(FEATURE_STORE_DIR, config.audio)
+
+    # Scalars land next to the Trainer's own event files, under the same tags as its eval stats
+    writer = SummaryWriter(run_dir, filename_suffix=".async_eval")
+    last_step = -1
+    print(f"Async eval: {len(samples)} clips, watching {run_dir}")
+    while True:
+        latest = latest_checkpoint(run_dir)
+        if latest is not None and latest[0] > last_step:
+            step, path = latest
+            try:
+                model.load_checkpoint(config, path, eval=True)
+            except FileNotFoundError:
+                # Pruned between listing and loading; the next round sees the newer one
+                continue
+            start = time.perf_counter()
+            losses = evaluate(model, config, samples)
+            elapsed = time.perf_counter() - start
+            for key, value in losses.items():
+                writer.add_scalar(f"{config.model}_EvalStats/avg_{key}", value, step)
+            writer.flush()
+            with open(os.path.join(run_dir, METRICS_NAME), "a", encoding="utf-8") as f:
+                f.write(json.dumps({"step": step, "checkpoint": os.path.basename(path), "seconds": elapsed,
+                                    **losses}) + "\n")
+            print(f"✅ Step {step}: " + ", ".join(f"{k}={v:.4f}" for k, v in losses.items()) + f" ({elapsed:.1f}s)")
+            last_step = step
+            continue
+        if parent_pid is None or not _alive(parent_pid):
+            break
+        time.sleep(poll)
+    writer.close()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def start_eval_worker(run_dir, model_name, subset_path, poll=30, threads=1):
+    """Launch watch() in a separate process tied to this training process"""
+    return subprocess.Popen([
+        sys.executable, os.path.abspath(__file__), run_dir, "--model", model_name, "--subset", subset_path,
+        "--parent_pid", str(os.getpid()), "--poll", str(poll), "--threads", str(threads),
+    ], cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the checkpoints of a training run on a fixed subset")
+    parser.add_argument("run_dir", help="Trainer output folder (run-<date>-...)")
+    parser.add_argument("--model", choices=["vits", "glowtts"], default="vits")
+    parser.add_argument("--subset", default=None, help=f"Subset file (default: <dataset path>/{SUBSET_NAME})")
+    parser.add_argument("--parent_pid", type=int, default=None,
+                        help="Keep watching until this process exits (default: evaluate the latest checkpoint once)")
+    parser.add_argument("--poll", type=float, default=30, help="Seconds between checkpoint checks")
+    parser.add_argument("--threads", type=int, default=1, help="Torch threads, kept low to leave cores to training")
+    args = parser.parse_args()
+
+    watch(args.run_dir, args.model, args.subset, args.parent_pid, args.poll, args.threads)
@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from glob import glob
+
+import numpy as np
+
+VALIDATION_DIR = "./validation_outputs"
+REPORT_DIR = "./analysis_outputs"
+
+# librosa.feature.melspectrogram's defaults, with the 80 bands the TTS configs use
+SAMPLE_RATE = 16000
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 80
+BATCH_FRAMES = 2048  # STFT frames per FFT call; bounds memory whatever the clip lengths
+TOP_DB = 80.0
+ZERO_LEVEL = 1e-6
+
+COLUMNS = ("duration", "min", "max", "mean", "std", "peak", "abs_mean", "rms", "zero_ratio",
+           "mel_db_mean", "mel_db_std", "high_band_db")
+
+
+@lru_cache(maxsize=8)
+def _mel_basis(sr, n_fft, n_mels):
+    import librosa
+
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+
+
+@lru_cache(maxsize=8)
+def _window(n_fft):
+    # Periodic Hann, as librosa's get_window("hann", fftbins=True)
+    return (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+
+
+def _frames(y, n_fft, hop_length):
+    """Centered, zero-padded STFT frames of y as a strided view (no copy)"""
+    y = np.pad(np.asarray(y, dtype=np.float32), n_fft // 2)
+    if len(y) < n_fft:
+        y = np.pad(y, (0, n_fft - len(y)))
+    return np.lib.stride_tricks.sliding_window_view(y, n_fft)[::hop_length]
+
+
+def mel_spectrograms(waves, sr=SAMPLE_RATE, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS):
+    """Power mel spectrograms [n_mels, frames] of many waveforms, as librosa.feature.melspectrogram computes them
+
+    Frames of all waveforms are stacked into blocks of BATCH_FRAMES and each
+    block goes through one batched FFT and one matrix product with the mel basis.
+    """
+    window, basis = _window(n_fft), _mel_basis(sr, n_fft, n_mels)
+    views = [_frames(y, n_fft, hop_length) for y in waves]
+    counts = [len(v) for v in views]
+    out = np.empty((sum(counts), n_mels), dtype=np.float32)
+    row, pending, pending_rows = 0, [], 0
+
+    def flush():
+        nonlocal row, pending, pending_rows
+        spec = np.fft.rfft(np.concatenate(pending) * window, axis=1)
+        power = (spec.real ** 2 + spec.imag ** 2).astype(np.float32)
+        out[row:row + pending_rows] = power @ basis.T
+        row += pending_rows
+        pending, pending_rows = [], 0
+
+    for view in views:
+        start = 0
+        while start < len(view):
+            take = min(BATCH_FRAMES - pending_rows, len(view) - start)
+            pending.append(view[start:start + take])
+            pending_rows += take
+            start += take
+            if pending_rows == BATCH_FRAMES:
+                flush()
+    if pending:
+        flush()
+    return [mel.T for mel in np.split(out, np.cumsum(counts)[:-1])]
+
+
+def power_to_db(mel, top_db=TOP_DB):
+    """librosa.power_to_db(mel, ref=np.max)"""
+    db = 10 * np.log10(np.maximum(mel, 1e-10))
+    db -= 10 * np.log10(max(float(mel.max()), 1e-10))
+    return np.maximum(db, db.max() - top_db)
+
+
+def waveform_stats(y, mel, sr=SAMPLE_RATE):
+    """One row of COLUMNS for a waveform and its power mel spectrogram"""
+    if not len(y):
+        return (0.0,) * 8 + (1.0,) + (float("nan"),) * 3
+    y64 = y.astype(np.float64)
+    abs_y = np.abs(y64)
+    mel_db = power_to_db(mel)
+    return (
+        len(y) / sr,
+        float(y64.min()),
+        float(y64.max()),
+        float(y64.mean()),
+        float(y64.std()),
+        float(abs_y.max()),
+        float(abs_y.mean()),
+        float(np.sqrt(np.mean(y64 * y64))),
+        float(np.mean(abs_y < ZERO_LEVEL)),
+        float(mel_db.mean()),
+        float(mel_db.std()),
+        # Energy in the top quarter of the bands; very low means muffled output, very high hiss
+        float(mel_db[-mel_db.shape[0] // 4:].mean()),
+    )
+
+
+def analyze_waveforms(waves, sr=SAMPLE_RATE):
+    """Rows of COLUMNS for in-memory waveforms, mel spectrograms computed in one batch"""
+    waves = [np.asarray(y, dtype=np.float32).reshape(-1) for y in waves]
+    return [waveform_stats(y, mel, sr) for y, mel in zip(waves, mel_spectrograms(waves, sr))]
+
+
+def _analyze_chunk(job):
+    """Worker: load a few files and analyze them together"""
+    import librosa
+
+    paths, sr = job
+    loaded, results = [], []
+    for path in paths:
+        try:
+            loaded.append((path, librosa.load(path, sr=sr)[0]))
+        except Exception as e:
+            results.append((path, None, str(e) or type(e).__name__))
+    if loaded:
+        rows = analyze_waveforms([y for _, y in loaded], sr)
+        results.extend((path, row, None) for (path, _), row in zip(loaded, rows))
+    return results
+
+
+def analyze_files(paths, sr=SAMPLE_RATE, workers=None, chunk=8):
+    """Columnar statistics (COLUMNS) for every path, resampled to sr
+
+    Files are fanned out in chunks across worker processes; each worker holds
+    one chunk of waveforms and their mel spectrograms at a time.
+    """
+    columns = {name: np.full(len(paths), np.nan) for name in COLUMNS}
+    errors = {}
+    position = {path: i for i, path in enumerate(paths)}
+    jobs = [(paths[i:i + chunk], sr) for i in range(0, len(paths), chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_analyze_chunk, jobs):
+            for path, row, error in results:
+                if row is None:
+                    errors[path] = error
+                    continue
+                for name, value in zip(COLUMNS, row):
+                    columns[name][position[path]] = value
+    return columns, errors
+
+
+def _pyplot():
+    # Headless: no display on the servers, and Agg skips GUI toolkit setup
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def plot_audio(waves, sr, output_path, titles=None, waveform=True):
+    """One figure with a row per waveform: the waveform (optional) and its mel spectrogram"""
+    import librosa.display
+
+    plt = _pyplot()
+    mels = mel_spectrograms(waves, sr)
+    titles = titles or [str(i + 1) for i in range(len(waves))]
+    cols = 2 if waveform else 1
+    fig, axes = plt.subplots(len(waves), cols, figsize=(15 if waveform else 10, 4 * len(waves)), squeeze=False)
+    for row, (y, mel, title) in enumerate(zip(waves, mels, titles)):
+        if waveform:
+            axes[row, 0].plot(y)
+            axes[row, 0].set_title(f"Waveform {title}")
+        image = librosa.display.specshow(power_to_db(mel), sr=sr, hop_length=HOP_LENGTH, x_axis="time",
+                                         y_axis="mel", ax=axes[row, cols - 1])
+        fig.colorbar(image, ax=axes[row, cols - 1], format="%+2.0f dB")
+        axes[row, cols - 1].set_title(f"Mel Spectrogram {title}")
+    fig.tight_layout()
+    fig.savefig(output_path)
+    plt.close(fig)
+
+
+def plot_files(paths, output_path, sr=SAMPLE_RATE, titles=None, waveform=True):
+    import librosa
+
+    plot_audio([librosa.load(path, sr=sr)[0] for path in paths], sr, output_path, titles, waveform)
+
+
+def _plot_one(job):
+    path, output_path, sr, waveform = job
+    try:
+        plot_files([path], output_path, sr, [os.path.splitext(os.path.basename(path))[0]], waveform)
+        return None
+    except Exception as e:
+        return f"{path}: {str(e) or type(e).__name__}"
+
+
+def render_plots(paths, output_dir, sr=SAMPLE_RATE, workers=None, prefix="", waveform=True):
+    """Plot stage: one PNG per file in output_dir, rendered in worker processes; returns the error messages"""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(path, os.path.join(output_dir, f"{prefix}{os.path.splitext(os.path.basename(path))[0]}.png"), sr,
+             waveform) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [error for error in pool.map(_plot_one, jobs) if error]
+
+
+def print_stats(paths, columns, errors):
+    for i, path in enumerate(paths):
+        if path in errors:
+            print(f"❌ {path}: {errors[path]}")
+            continue
+        print(f"{os.path.basename(path)}: {columns['duration'][i]:.2f}s, range {columns['min'][i]:.3f} to "
+              f"{columns['max'][i]:.3f}, mean {columns['mean'][i]:.3f}, std {columns['std'][i]:.3f}, "
+              f"zeros {columns['zero_ratio'][i]:.2%}, high bands {columns['high_band_db'][i]:.1f} dB")
+        if columns["peak"][i] < 0.1:
+            print(f"  ⚠️ Very quiet (peak {columns['peak'][i]:.3f})")
+        if columns["peak"][i] >= 0.999:
+            print(f"  ⚠️ Clipping (peak {columns['peak'][i]:.3f})")
+        if columns["zero_ratio"][i] > 0.5:
+            print(f"  ⚠️ Mostly silence ({columns['zero_ratio'][i]:.0%} zero samples)")
+
+
+def audio_paths(inputs):
+    paths = []
+    for item in inputs:
+        paths.extend(sorted(glob(os.path.join(item, "**", "*.wav"), recursive=True)) if os.path.isdir(item) else [item])
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch waveform and mel statistics for many audio files")
+    parser.add_argument("inputs", nargs="*", default=[VALIDATION_DIR], help=f"Files or folders (default: {VALIDATION_DIR})")
+    parser.add_argument("--sr", type=int, default=SAMPLE_RATE, help="Analysis sample rate")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--plots", action="store_true", help="Also render a PNG per file (slow)")
+    parser.add_argument("--plot_dir", default=os.path.join(REPORT_DIR, "audio_plots"))
+    parser.add_argument("--report", default=os.path.join(REPORT_DIR, "audio_analysis.json"))
+    args = parser.parse_args()
+
+    paths = audio_paths(args.inputs)
+    if not paths:
+        parser.error("no audio files found")
+    start = time.perf_counter()
+    columns, errors = analyze_files(paths, args.sr, args.workers)
+    print_stats(paths, columns, errors)
+    print(f"✅ Analyzed {len(paths) - len(errors)} of {len(paths)} files in {time.perf_counter() - start:.1f}s")
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"sample_rate": args.sr, "errors": errors,
+                   "files": {path: {name: float(columns[name][i]) for name in COLUMNS}
+                             for i, path in enumerate(paths) if path not in errors}}, f, indent=1)
+    print(f"Report: {args.report}")
+
+    if args.plots:
+        start = time.perf_counter()
+        plot_errors = render_plots([p for p in paths if p not in errors], args.plot_dir, args.sr, args.workers)
+        for error in plot_errors:
+            print(f"❌ {error}")
+        print(f"Plots in {args.plot_dir} ({time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+from azure_client import write_atomic
+
+# "Microsoft Server Speech Text to Speech Voice (en-US, AriaNeural)" is the long form of "en-US-AriaNeural"
+LONG_VOICE_NAME = re.compile(r"^Microsoft Server Speech Text to Speech Voice \(([^,]+),\s*([^)]+)\)$")
+
+
+def normalize_voice_name(name):
+    """Reduce a voice name to its lowercase short form"""
+    name = " ".join(name.split())
+    match = LONG_VOICE_NAME.match(name)
+    if match:
+        name = f"{match.group(1)}-{match.group(2)}"
+    return name.lower()
+
+
+# Containers whose edges are not between words: whitespace just inside them and between them is layout
+BLOCK_TAGS = {"speak", "voice"}
+
+
+def _collapse(text):
+    """Collapse whitespace runs to one space; whitespace-only text still separates words"""
+    if not text:
+        return None
+    return re.sub(r"\s+", " ", text)
+
+
+def _strip_edges(element):
+    """Drop layout whitespace at the inner edges of a block element and around it"""
+    if element.text:
+        element.text = element.text.lstrip() or None
+    if len(element):
+        last = element[-1]
+        if last.tail:
+            last.tail = last.tail.rstrip() or None
+    elif element.text:
+        element.text = element.text.rstrip() or None
+    if element.tail and not element.tail.strip():
+        element.tail = None
+
+
+def canonicalize_ssml(ssml):
+    """Return a canonical form of SSML so equivalent documents hash the same"""
+    if isinstance(ssml, bytes):
+        ssml = ssml.decode("utf-8")
+    try:
+        root = ET.fromstring(ssml.strip())
+    except ET.ParseError:
+        # Not well-formed XML; whitespace is the only thing we can safely normalize
+        return " ".join(ssml.split())
+
+    for element in root.iter():
+        element.text = _collapse(element.text)
+        element.tail = _collapse(element.tail)
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "voice" and "name" in element.attrib:
+            element.set("name", normalize_voice_name(element.get("name")))
+    # Second pass, so a child's tail is collapsed before its parent strips it
+    for element in root.iter():
+        if element is root or element.tag.rsplit("}", 1)[-1] in BLOCK_TAGS:
+            _strip_edges(element)
+
+    # C14N 2.0 sorts attributes and fixes quoting/namespace layout for us
+    return ET.canonicalize(ET.tostring(root, encoding="unicode"))
+
+
+def cache_key(ssml, output_format):
+    """Content address for a synthesis request"""
+    digest = hashlib.sha256()
+    digest.update(canonicalize_ssml(ssml).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(output_format.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SynthesisCache:
+    """On-disk LRU cache of synthesized audio keyed by canonical SSML + output format"""
+
+    def __init__(self, cache_dir, max_bytes=1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from file mtimes left by previous runs"""
+        found = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.startswith(".tmp-"):
+                    continue
+                st = os.stat(os.path.join(shard_dir, name))
+                found.append((st.st_mtime, os.path.splitext(name)[0], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._size += size
+
+    def key(self, ssml, output_format):
+        return cache_key(ssml, output_format)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".bin")
+
+    def get(self, key):
+        """Return cached audio bytes or None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+            return audio
+        except FileNotFoundError:
+            # Removed behind our back; treat as a miss
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    def put(self, key, audio):
+        """Store audio and evict least recently used entries beyond max_bytes"""
+        write_atomic(self._path(key), audio)
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self._size += len(audio)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old_key))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
@@ -0,0 +1,356 @@
+import argparse
+import email.utils
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+AZURE_KEY = os.getenv("AZURE_KEY")
+AZURE_REGION = os.getenv("AZURE_REGION", "centralindia")
+DEFAULT_OUTPUT_FORMAT = "audio-16khz-128kbitrate-mono-mp3"
+USER_AGENT = "MotivationAppClient"
+
+# Throttling and transient gateway errors are worth another attempt
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class AzureTTSError(Exception):
+    """Raised when Azure synthesis fails after all retries"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"Azure TTS error {status_code}: {message}")
+        self.status_code = status_code
+
+
+def azure_endpoint(region):
+    """Build the synthesis endpoint for an Azure region"""
+    return f"https://{region}.tts.speech.microsoft.com/cognitiveservices/v1"
+
+
+def atomic_tempfile(path):
+    """Create a temp file next to path for a later os.replace; returns (fd, tmp_path)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+
+
+def write_atomic(path, data):
+    """Write bytes to a temp file next to path, then rename it into place"""
+    fd, tmp_path = atomic_tempfile(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (q in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def parse_retry_after(value):
+    """Return the Retry-After delay in seconds (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class AzureTTSClient:
+    """Azure synthesis client sharing one pooled keep-alive session across threads"""
+
+    def __init__(self, key=None, region=None, endpoint=None, output_format=DEFAULT_OUTPUT_FORMAT,
+                 pool_size=8, max_retries=5, backoff_base=0.5, backoff_max=30.0, timeout=60, cache=None):
+        self.key = key or AZURE_KEY
+        self.endpoint = endpoint or azure_endpoint(region or AZURE_REGION)
+        self.output_format = output_format
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        # Optional azure_cache.SynthesisCache consulted before every request
+        self.cache = cache
+
+        self.session = requests.Session()
+        # pool_block keeps us at pool_size sockets instead of opening throwaway connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "bytes": 0}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def headers(self, output_format=None):
+        """Request headers for an SSML synthesis call"""
+        return {
+            "Ocp-Apim-Subscription-Key": self.key or "",
+            "Content-Type": "application/ssml+xml",
+            "X-Microsoft-OutputFormat": output_format or self.output_format,
+            "User-Agent": USER_AGENT,
+        }
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Jittered delay before the next attempt, honouring Retry-After when given"""
+        if retry_after is not None:
+            # Spread clients that were throttled together so they don't retry in lockstep
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post_ssml(self, ssml, output_format=None, stream=False):
+        """POST SSML with retries and return the successful response"""
+        data = ssml.encode("utf-8") if isinstance(ssml, str) else ssml
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count(retries=1)
+            self._count(requests=1)
+            try:
+                response = self.session.post(self.endpoint, headers=self.headers(output_format),
+                                             data=data, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = AzureTTSError(None, str(e))
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff_delay(attempt))
+                continue
+
+            if response.status_code == 200:
+                return response
+
+            last_error = AzureTTSError(response.status_code, response.text[:500])
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            response.close()
+            if response.status_code == 429:
+                self._count(throttled=1)
+            if response.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                break
+            time.sleep(self.backoff_delay(attempt, retry_after))
+        raise last_error
+
+    def synthesize(self, ssml, output_path=None, output_format=None):
+        """Synthesize SSML, optionally writing the audio atomically to output_path"""
+        output_format = output_format or self.output_format
+        key = self.cache.key(ssml, output_format) if self.cache is not None else None
+        audio = self.cache.get(key) if key else None
+        if audio is None:
+            response = self.post_ssml(ssml, output_format)
+            audio = response.content
+            self._count(bytes=len(audio))
+            if key:
+                self.cache.put(key, audio)
+        if output_path:
+            write_atomic(output_path, audio)
+        return audio
+
+    def synthesize_stream(self, ssml, sink, output_format=None, chunk_size=16384):
+        """Forward audio to a path, writable file/pipe or callback as it arrives; returns timing metrics
+
+        Paths are written through a temp file and renamed once the download completes.
+        TTFB is measured from the call, so it includes any retry backoff.
+        """
+        output_format = output_format or self.output_format
+        key = self.cache.key(ssml, output_format) if self.cache is not None else None
+        start = time.perf_counter()
+
+        out = tmp_path = None
+        if isinstance(sink, (str, os.PathLike)):
+            fd, tmp_path = atomic_tempfile(sink)
+            out = os.fdopen(fd, "wb")
+            write = out.write
+        elif callable(sink):
+            write = sink
+        else:
+            def write(chunk):
+                sink.write(chunk)
+                sink.flush()
+
+        ttfb = None
+        total_bytes = 0
+        cached = self.cache.get(key) if key else None
+        try:
+            if cached is not None:
+                write(cached)
+                ttfb = time.perf_counter() - start
+                total_bytes = len(cached)
+            else:
+                response = self.post_ssml(ssml, output_format, stream=True)
+                # Only the cache needs the whole body; without one memory stays at one chunk
+                chunks = [] if key else None
+                with response:
+                    for chunk in response.iter_content(chunk_size):
+                        if not chunk:
+                            continue
+                        if ttfb is None:
+                            ttfb = time.perf_counter() - start
+                        write(chunk)
+                        total_bytes += len(chunk)
+                        if chunks is not None:
+                            chunks.append(chunk)
+                self._count(bytes=total_bytes)
+                if key:
+                    self.cache.put(key, b"".join(chunks))
+            if out is not None:
+                out.close()
+                os.replace(tmp_path, sink)
+        except BaseException:
+            if out is not None:
+                out.close()
+                os.remove(tmp_path)
+            raise
+
+        elapsed = time.perf_counter() - start
+        return {
+            "ttfb": ttfb if ttfb is not None else elapsed,
+            "total": elapsed,
+            "bytes": total_bytes,
+            "bytes_per_sec": total_bytes / elapsed if elapsed else 0.0,
+            "cached": cached is not None,
+        }
+
+    def run_manifest(self, jobs, workers=4, overwrite=False, stream=False, metrics_log=None):
+        """Run a list of synthesis jobs with bounded concurrency and return a summary"""
+        summary = {"total": len(jobs), "succeeded": 0, "skipped": 0, "failed": []}
+        start = time.perf_counter()
+        request_metrics = []
+        log_file = open(metrics_log, "a", encoding="utf-8") if metrics_log else None
+
+        def run_job(job):
+            if not overwrite and os.path.exists(job["output"]):
+                return "skipped"
+            if not stream:
+                self.synthesize(load_job_ssml(job), job["output"], job.get("output_format"))
+                return "succeeded"
+            metrics = self.synthesize_stream(load_job_ssml(job), job["output"], job.get("output_format"))
+            metrics["output"] = job["output"]
+            with self._lock:
+                request_metrics.append(metrics)
+                if log_file:
+                    log_file.write(json.dumps(metrics) + "\n")
+            return "succeeded"
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    summary[future.result()] += 1
+                except Exception as e:
+                    summary["failed"].append({"output": job["output"], "error": str(e)})
+        if log_file:
+            log_file.close()
+
+        if request_metrics:
+            ttfbs = [m["ttfb"] for m in request_metrics]
+            summary["ttfb_p50"] = percentile(ttfbs, 50)
+            summary["ttfb_p95"] = percentile(ttfbs, 95)
+            summary["latency_p95"] = percentile([m["total"] for m in request_metrics], 95)
+            summary["bytes_per_sec"] = sum(m["bytes_per_sec"] for m in request_metrics) / len(request_metrics)
+        summary["elapsed"] = time.perf_counter() - start
+        summary["jobs_per_sec"] = summary["succeeded"] / summary["elapsed"] if summary["elapsed"] else 0.0
+        summary.update(self.stats)
+        if self.cache is not None:
+            summary["cache"] = self.cache.stats()
+        return summary
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_job_ssml(job):
+    """Return the SSML for a manifest job, reading ssml_file if given"""
+    if "ssml" in job:
+        return job["ssml"]
+    with open(job["ssml_file"], "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def load_manifest(manifest_path):
+    """Load jobs from a JSON list or a JSONL file of {"ssml"|"ssml_file", "output"} objects"""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        if manifest_path.endswith(".jsonl"):
+            jobs = [json.loads(line) for line in f if line.strip()]
+        else:
+            jobs = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for job in jobs:
+        # Relative paths in a manifest are relative to the manifest itself
+        for field in ("ssml_file", "output"):
+            if field in job and not os.path.isabs(job[field]):
+                job[field] = os.path.join(base_dir, job[field])
+    return jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a manifest of SSML jobs through Azure TTS")
+    parser.add_argument("--manifest", required=True, help="JSON or JSONL file of synthesis jobs")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    parser.add_argument("--output_format", default=DEFAULT_OUTPUT_FORMAT)
+    parser.add_argument("--endpoint", help="Override the synthesis endpoint (e.g. a local stub)")
+    parser.add_argument("--max_retries", type=int, default=5)
+    parser.add_argument("--overwrite", action="store_true", help="Re-render outputs that already exist")
+    parser.add_argument("--cache_dir", help="Reuse audio for identical SSML from this cache directory")
+    parser.add_argument("--cache_max_mb", type=int, default=1024, help="Evict cached audio beyond this size")
+    parser.add_argument("--stream", action="store_true", help="Stream audio to disk and record TTFB per request")
+    parser.add_argument("--metrics_log", help="Append per-request stream metrics to this JSONL file")
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache_dir:
+        from azure_cache import SynthesisCache
+        cache = SynthesisCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    jobs = load_manifest(args.manifest)
+    with AzureTTSClient(endpoint=args.endpoint, output_format=args.output_format,
+                        pool_size=args.workers, max_retries=args.max_retries, cache=cache) as client:
+        summary = client.run_manifest(jobs, workers=args.workers, overwrite=args.overwrite,
+                                      stream=args.stream, metrics_log=args.metrics_log)
+
+    print(f"✅ {summary['succeeded']} rendered, {summary['skipped']} skipped, "
+          f"{len(summary['failed'])} failed in {summary['elapsed']:.1f}s "
+          f"({summary['jobs_per_sec']:.2f} jobs/s)")
+    print(f"Requests: {summary['requests']}, retries: {summary['retries']}, throttled: {summary['throttled']}")
+    if "ttfb_p50" in summary:
+        print(f"TTFB p50: {summary['ttfb_p50'] * 1000:.0f} ms, p95: {summary['ttfb_p95'] * 1000:.0f} ms, "
+              f"latency p95: {summary['latency_p95'] * 1000:.0f} ms, "
+              f"{summary['bytes_per_sec'] / 1024:.0f} KB/s per request")
+    if "cache" in summary:
+        stats = summary["cache"]
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+              f"{stats['bytes'] / (1024 * 1024):.1f} MB in {stats['entries']} entries")
+    for failure in summary["failed"]:
+        print(f"❌ {failure['output']}: {failure['error']}")
@@ -1,14 +1,7 @@
-import requests
-import os
 from pathlib import Path
-from dotenv import load_dotenv
+from azure_client import AzureTTSClient, AzureTTSError
 
-# Load environment variables
-load_dotenv()
-
-# 🔁 Azure Speech resource values from environment variables
-AZURE_KEY = os.getenv("AZURE_KEY")
-AZURE_REGION = os.getenv("AZURE_REGION", "centralindia")
+# 🔁 Azure Speech resource values come from the environment (see azure_client.py)
 VOICE_NAME = "en-US-AriaNeural"
 
 # 💬 SSML Text
@@ -23,23 +16,12 @@ ssml = """
 
 """
 
-# 🌐 Azure TTS Endpoint
-endpoint = f"https://{AZURE_REGION}.tts.speech.microsoft.com/cognitiveservices/v1"
-
-# 📤 Make the request
-headers = {
-    "Ocp-Apim-Subscription-Key": AZURE_KEY,
-    "Content-Type": "application/ssml+xml",
-    "X-Microsoft-OutputFormat": "audio-16khz-128kbitrate-mono-mp3",
-    "User-Agent": "MotivationAppClient"
-}
-
-response = requests.post(endpoint, headers=headers, data=ssml.encode("utf-8"))
-
-# 💾 Save output
+# 📤 Make the request (pooled session, retries on 429/5xx)
 output_path = Path("azure_sample.mp3")
-if response.status_code == 200:
-    output_path.write_bytes(response.content)
-    print(f"✅ Audio saved to {output_path.resolve()}")
-else:
-    print(f"❌ Error {response.status_code}: {response.text}")
+with AzureTTSClient() as client:
+    try:
+        # 💾 Save output
+        client.synthesize(ssml, output_path)
+        print(f"✅ Audio saved to {output_path.resolve()}")
+    except AzureTTSError as e:
+        print(f"❌ {e}")
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import pickle
+
+import requests
+
+from azure_client import AZURE_KEY, AZURE_REGION, USER_AGENT, write_atomic
+
+VOICES_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "azure-voices.json")
+INDEX_VERSION = 1
+
+# Fields callers actually read; the rest of the dump stays in the JSON file
+VOICE_FIELDS = ("ShortName", "DisplayName", "LocalName", "Locale", "LocaleName", "Gender",
+                "VoiceType", "SampleRateHertz", "StyleList", "SecondaryLocaleList")
+
+
+def voices_endpoint(region):
+    """Build the voices list endpoint for an Azure region"""
+    return f"https://{region}.tts.speech.microsoft.com/cognitiveservices/voices/list"
+
+
+def build_index(voices):
+    """Build compact voice records plus lookup tables keyed by lowercase values"""
+    records = []
+    by_short_name, by_locale, by_gender, by_style = {}, {}, {}, {}
+    for voice in voices:
+        record = {field: voice[field] for field in VOICE_FIELDS if field in voice}
+        idx = len(records)
+        records.append(record)
+        by_short_name[record["ShortName"].lower()] = idx
+        by_locale.setdefault(record.get("Locale", "").lower(), []).append(idx)
+        by_gender.setdefault(record.get("Gender", "").lower(), []).append(idx)
+        for style in record.get("StyleList", []):
+            by_style.setdefault(style.lower(), []).append(idx)
+    return {
+        "version": INDEX_VERSION,
+        "voices": records,
+        "by_short_name": by_short_name,
+        "by_locale": by_locale,
+        "by_gender": by_gender,
+        "by_style": by_style,
+    }
+
+
+class VoiceCatalog:
+    """Azure voice catalog backed by a pickled index sidecar next to the JSON dump"""
+
+    def __init__(self, json_path=VOICES_JSON, index_path=None):
+        self.json_path = json_path
+        self.index_path = index_path or os.path.splitext(json_path)[0] + ".idx.pkl"
+        self.index = None
+        self.load()
+
+    def _source_signature(self):
+        try:
+            st = os.stat(self.json_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def load(self):
+        """Load the sidecar if it matches the JSON dump, otherwise rebuild it"""
+        signature = self._source_signature()
+        previous = {}
+        try:
+            with open(self.index_path, "rb") as f:
+                index = pickle.load(f)
+            if index.get("version") == INDEX_VERSION and (signature is None or index.get("source") == signature):
+                self.index = index
+                return
+            # An older index format built from this same dump may still ask refresh() for a 304. Validators
+            # from an edited or replaced dump would make the service vouch for a catalog it never sent
+            if index.get("source") == signature:
+                previous = index
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+
+        with open(self.json_path, "r", encoding="utf-8") as f:
+            voices = json.load(f)
+        self.index = build_index(voices)
+        self.index["etag"] = previous.get("etag")
+        self.index["last_modified"] = previous.get("last_modified")
+        self._save_index()
+
+    def _save_index(self):
+        self.index["source"] = self._source_signature()
+        write_atomic(self.index_path, pickle.dumps(self.index, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def refresh(self, key=None, region=None, endpoint=None, timeout=30):
+        """Re-fetch the catalog only if the service reports a change; returns True when updated"""
+        headers = {"Ocp-Apim-Subscription-Key": key or AZURE_KEY or "", "User-Agent": USER_AGENT}
+        if self.index.get("etag"):
+            headers["If-None-Match"] = self.index["etag"]
+        if self.index.get("last_modified"):
+            headers["If-Modified-Since"] = self.index["last_modified"]
+
+        response = requests.get(endpoint or voices_endpoint(region or AZURE_REGION), headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+
+        voices = response.json()
+        write_atomic(self.json_path, json.dumps(voices, indent=2, ensure_ascii=False).encode("utf-8"))
+        self.index = build_index(voices)
+        self.index["etag"] = response.headers.get("ETag")
+        self.index["last_modified"] = response.headers.get("Last-Modified")
+        self._save_index()
+        return True
+
+    def __len__(self):
+        return len(self.index["voices"])
+
+    def get(self, short_name):
+        """Return the voice record for a short name (case-insensitive), or None"""
+        idx = self.index["by_short_name"].get(short_name.lower())
+        return None if idx is None else self.index["voices"][idx]
+
+    def find(self, locale=None, gender=None, style=None):
+        """Return voices matching every given filter"""
+        selected = None
+        for table, value in (("by_locale", locale), ("by_gender", gender), ("by_style", style)):
+            if value is None:
+                continue
+            matches = set(self.index[table].get(value.lower(), ()))
+            selected = matches if selected is None else selected & matches
+        if selected is None:
+            return list(self.index["voices"])
+        return [self.index["voices"][idx] for idx in sorted(selected)]
+
+    def locales(self):
+        return sorted({voice["Locale"] for voice in self.index["voices"]})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query or refresh the Azure voice catalog")
+    parser.add_argument("--voices_json", default=VOICES_JSON)
+    parser.add_argument("--refresh", action="store_true", help="Conditionally re-fetch the voices list")
+    parser.add_argument("--endpoint", help="Override the voices list endpoint")
+    parser.add_argument("--voice", help="Look up a voice by short name")
+    parser.add_argument("--locale")
+    parser.add_argument("--gender")
+    parser.add_argument("--style")
+    args = parser.parse_args()
+
+    catalog = VoiceCatalog(args.voices_json)
+    if args.refresh:
+        updated = catalog.refresh(endpoint=args.endpoint)
+        print(f"✅ Voice catalog {'updated' if updated else 'unchanged'} ({len(catalog)} voices)")
+
+    if args.voice:
+        voice = catalog.get(args.voice)
+        print(json.dumps(voice, indent=2, ensure_ascii=False) if voice else f"❌ Unknown voice: {args.voice}")
+    elif args.locale or args.gender or args.style:
+        for voice in catalog.find(args.locale, args.gender, args.style):
+            styles = ", ".join(voice.get("StyleList", []))
+            print(f"{voice['ShortName']}\t{voice.get('Gender', '')}\t{styles}")
@@ -0,0 +1,159 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+MANIFEST_NAME = "cache_manifest.json"
+
+_tokenizer = None
+_cache_path = None
+
+
+def load_training_config(model, finetune=None, speakers=()):
+    """Import the config defined by train_vits.py / train_glowtts.py, as train_vits.py --finetune/--speakers changes it"""
+    if model == "glowtts":
+        from train_glowtts import config
+        return config
+    from train_vits import config, speaker_datasets
+
+    if finetune:
+        from finetune import finetune_config, resolve_checkpoint
+
+        # The pretrained tokenizer gets its own cache path (finetune_config)
+        config = finetune_config(resolve_checkpoint(finetune), config)
+    if speakers:
+        config.datasets = speaker_datasets(speakers)
+    return config
+
+
+def cache_file_name(audio_unique_name):
+    """Cache file name Coqui's PhonemeDataset uses for a sample (see TTS.tts.datasets.dataset.string2filename)"""
+    return base64.urlsafe_b64encode(audio_unique_name.encode("utf-8")).decode("utf-8", "ignore") + "_phoneme.npy"
+
+
+def read_metadata(dataset_path, meta_file, dataset_name=""):
+    """Yield (audio_unique_name, text) rows the way the ljspeech formatter reads them"""
+    with open(os.path.join(dataset_path, meta_file), "r", encoding="utf-8") as f:
+        for line in f:
+            cols = line.split("|")
+            if len(cols) < 3:
+                continue
+            # load_tts_samples names samples "<dataset_name>#<path relative to root, no extension>"
+            yield f"{dataset_name}#wavs/{cols[0]}", cols[2]
+
+
+def tokenizer_signature(config):
+    """Everything besides the text that changes the cached token ids"""
+    return json.dumps({
+        "use_phonemes": config.use_phonemes,
+        "phoneme_language": config.phoneme_language,
+        "text_cleaner": config.text_cleaner,
+        "add_blank": config.add_blank,
+        "enable_eos_bos_chars": config.enable_eos_bos_chars,
+        "characters": config.characters.to_dict() if config.characters else None,
+    }, sort_keys=True, default=str)
+
+
+def text_hash(text, signature):
+    return hashlib.sha1((signature + "\0" + text).encode("utf-8")).hexdigest()
+
+
+def _init_worker(model, finetune, cache_path):
+    global _tokenizer, _cache_path
+    from TTS.tts.utils.text.tokenizer import TTSTokenizer
+
+    _tokenizer, _ = TTSTokenizer.init_from_config(load_training_config(model, finetune))
+    _cache_path = cache_path
+
+
+def _phonemize(job):
+    name, text, language, digest = job
+    ids = np.asarray(_tokenizer.text_to_ids(text, language=language))
+    path = os.path.join(_cache_path, name)
+    # np.save appends .npy when missing, so keep the suffix on the temp name
+    tmp_path = path[:-len(".npy")] + f".tmp{os.getpid()}.npy"
+    np.save(tmp_path, ids)
+    os.replace(tmp_path, path)
+    return name, digest, len(ids)
+
+
+def load_manifest(cache_path):
+    try:
+        with open(os.path.join(cache_path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(cache_path, manifest):
+    path = os.path.join(cache_path, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def build_phoneme_cache(model="vits", workers=None, chunksize=16, finetune=None, speakers=()):
+    """Phonemize every metadata row missing from (or stale in) the phoneme cache"""
+    from TTS.tts.utils.text.tokenizer import TTSTokenizer
+
+    config = load_training_config(model, finetune, speakers)
+    _, config = TTSTokenizer.init_from_config(config)
+    cache_path = config.phoneme_cache_path
+    os.makedirs(cache_path, exist_ok=True)
+    signature = tokenizer_signature(config)
+    manifest = load_manifest(cache_path)
+
+    jobs = []
+    total = 0
+    for dataset in config.datasets:
+        language = dataset.language
+        for audio_unique_name, text in read_metadata(dataset.path, dataset.meta_file_train, dataset.dataset_name):
+            total += 1
+            name = cache_file_name(audio_unique_name)
+            digest = text_hash(text, signature)
+            if manifest.get(name) == digest and os.path.exists(os.path.join(cache_path, name)):
+                continue
+            jobs.append((name, text, language, digest))
+
+    print(f"Phoneme cache: {cache_path}")
+    print(f"{total} rows, {total - len(jobs)} up to date, {len(jobs)} to phonemize")
+    if not jobs:
+        return
+
+    start = time.perf_counter()
+    tokens = 0
+    with Pool(workers, initializer=_init_worker, initargs=(model, finetune, cache_path)) as pool:
+        for done, (name, digest, n_tokens) in enumerate(pool.imap_unordered(_phonemize, jobs, chunksize), 1):
+            manifest[name] = digest
+            tokens += n_tokens
+            if done % 1000 == 0:
+                save_manifest(cache_path, manifest)
+                print(f"  {done}/{len(jobs)} rows")
+    save_manifest(cache_path, manifest)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Phonemized {len(jobs)} rows in {elapsed:.1f}s "
+          f"({len(jobs) / elapsed:.1f} rows/s, {tokens / elapsed:.0f} tokens/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the phoneme cache before training")
+    parser.add_argument("--model", choices=["vits", "glowtts"], default="vits",
+                        help="Training script whose config (cleaner, phoneme language, cache path) to use")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--finetune", default=None,
+                        help="Warm the cache a train_vits.py --finetune run uses (hi-female, hi-male or a checkpoint path)")
+    parser.add_argument("--speakers", default="",
+                        help="Phonemize the per-speaker datasets of a multi-speaker run (same value as train_vits.py --speakers)")
+    args = parser.parse_args()
+    if args.model != "vits" and (args.finetune or args.speakers):
+        parser.error("--finetune and --speakers apply to --model vits")
+
+    speakers = [entry for entry in args.speakers.split(",") if entry]
+    build_phoneme_cache(args.model, args.workers, args.chunksize, args.finetune, speakers)
@@ -1,11 +1,12 @@
 import torch
 import numpy as np
-import librosa
 import soundfile as sf
-import matplotlib.pyplot as plt
 from TTS.tts.configs.vits_config import VitsConfig
 from TTS.tts.models.vits import Vits
 
+from audio_analysis import analyze_files, plot_audio, plot_files
+from checkpoint_reader import CheckpointReader
+
 def analyze_audio_files():
     """Analyze training audio files"""
     paths = [
@@ -14,38 +15,28 @@ def analyze_audio_files():
         "/var/www/clients/client1/web63/web/tts-backend/workspace/tts-dataset/wavs/00003.wav"
     ]
     
-    fig, axes = plt.subplots(3, 2, figsize=(15, 10))
+    # Statistics for all files in one batched pass; the plot is a separate, slower stage
+    columns, errors = analyze_files(paths)
     for idx, path in enumerate(paths):
-        y, sr = librosa.load(path, sr=16000)
-        
-        # Plot waveform
-        axes[idx, 0].plot(y)
-        axes[idx, 0].set_title(f'Waveform {idx+1}')
-        
-        # Plot mel spectrogram
-        mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=80)
-        mel_db = librosa.power_to_db(mel, ref=np.max)
-        librosa.display.specshow(mel_db, sr=sr, ax=axes[idx, 1])
-        axes[idx, 1].set_title(f'Mel Spectrogram {idx+1}')
-        
+        if path in errors:
+            print(f"\nAudio {idx+1}: {errors[path]}")
+            continue
         print(f"\nAudio {idx+1} stats:")
-        print(f"Duration: {len(y)/sr:.2f}s")
-        print(f"Range: {y.min():.3f} to {y.max():.3f}")
-        print(f"Mean: {y.mean():.3f}")
-        print(f"Std: {y.std():.3f}")
+        print(f"Duration: {columns['duration'][idx]:.2f}s")
+        print(f"Range: {columns['min'][idx]:.3f} to {columns['max'][idx]:.3f}")
+        print(f"Mean: {columns['mean'][idx]:.3f}")
+        print(f"Std: {columns['std'][idx]:.3f}")
     
-    plt.tight_layout()
-    plt.savefig('audio_analysis.png')
-    plt.close()
+    plot_files([p for p in paths if p not in errors], 'audio_analysis.png',
+               titles=[str(idx + 1) for idx, p in enumerate(paths) if p not in errors])
 
 def test_model_output():
     """Test model generation"""
     config = VitsConfig()
     config.load_json("/var/www/clients/client1/web63/web/tts-backend/workspace/tts-dataset/training_config_xtts.json")
-    checkpoint = torch.load("/var/www/clients/client1/web63/web/tts-backend/workspace/my-vits-checkpoints/vits_test-April-15-2025_02+18AM-0000000/best_model_21.pth", map_location='cpu')
-    
     model = Vits.init_from_config(config)
-    model.load_state_dict(checkpoint["model"])
+    with CheckpointReader("/var/www/clients/client1/web63/web/tts-backend/workspace/my-vits-checkpoints/vits_test-April-15-2025_02+18AM-0000000/best_model_21.pth") as checkpoint:
+        model.load_state_dict(checkpoint.state_dict())
     model.eval()
     
     # Print model info safely
@@ -150,21 +141,7 @@ def test_model_output():
                     wav_np = wav.squeeze().numpy()
                     
                     # Plot more detailed analysis
-                    plt.figure(figsize=(15, 10))
-                    plt.subplot(2, 1, 1)
-                    plt.plot(wav_np)
-                    plt.title('Generated Waveform')
-                    
-                    plt.subplot(2, 1, 2)
-                    mel = librosa.feature.melspectrogram(y=wav_np, sr=16000, n_mels=80)
-                    mel_db = librosa.power_to_db(mel, ref=np.max)
-                    librosa.display.specshow(mel_db, sr=16000, y_axis='mel')
-                    plt.colorbar(format='%+2.0f dB')
-                    plt.title('Generated Mel Spectrogram')
-                    
-                    plt.tight_layout()
-                    plt.savefig('generated_analysis.png')
-                    plt.close()
+                    plot_audio([wav_np], 16000, 'generated_analysis.png', ['(generated)'])
                     
                     sf.write('test_output.wav', wav_np, 16000)
                 else:
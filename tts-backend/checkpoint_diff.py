@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from checkpoint_reader import CheckpointReader
+from param_stats import CHUNK, component
+
+STEP_RE = re.compile(r"_(\d+)\.pth$")
+SUMS = ("numel", "dot", "norm_a", "norm_b", "norm_diff", "flips", "max_change")
+
+
+def _pair_sums(a, b):
+    """Raw sums for one tensor pair, streamed in float64 blocks over the memory-mapped data"""
+    a, b = a.reshape(-1), b.reshape(-1)
+    acc = dict.fromkeys(SUMS, 0.0)
+    acc["numel"] = a.size
+    for start in range(0, a.size, CHUNK):
+        x = a[start:start + CHUNK].astype(np.float64)
+        y = b[start:start + CHUNK].astype(np.float64)
+        d = y - x
+        acc["dot"] += np.dot(x, y)
+        acc["norm_a"] += np.dot(x, x)
+        acc["norm_b"] += np.dot(y, y)
+        acc["norm_diff"] += np.dot(d, d)
+        # Weights that crossed zero; exact zeros on either side are not flips
+        acc["flips"] += int(np.count_nonzero(x * y < 0))
+        acc["max_change"] = max(acc["max_change"], float(np.abs(d).max()) if d.size else 0.0)
+    return acc
+
+
+def _finish(acc):
+    norm_a, norm_b = np.sqrt(acc["norm_a"]), np.sqrt(acc["norm_b"])
+    return {
+        "numel": int(acc["numel"]),
+        "rel_l2": float(np.sqrt(acc["norm_diff"]) / norm_a) if norm_a else float("inf" if acc["norm_diff"] else 0.0),
+        "cosine": float(acc["dot"] / (norm_a * norm_b)) if norm_a and norm_b else float("nan"),
+        "sign_flips": acc["flips"] / acc["numel"] if acc["numel"] else 0.0,
+        "max_change": float(acc["max_change"]),
+        "norm_a": float(norm_a),
+        "norm_b": float(norm_b),
+    }
+
+
+def diff_readers(old, new):
+    """Per-tensor and per-component drift from checkpoint old to new, plus keys that do not line up
+
+    Only one tensor pair is mapped at a time, so memory stays flat however
+    large the checkpoints are.
+    """
+    refs_a, refs_b = old.refs(), new.refs()
+    tensors, components, total = {}, {}, dict.fromkeys(SUMS, 0.0)
+    mismatched = {}
+    for name, ref_a in refs_a.items():
+        ref_b = refs_b.get(name)
+        if ref_b is None:
+            continue
+        if ref_a.shape != ref_b.shape:
+            mismatched[name] = {"old": list(ref_a.shape), "new": list(ref_b.shape)}
+            continue
+        acc = _pair_sums(ref_a.numpy(), ref_b.numpy())
+        ref_a.release()
+        ref_b.release()
+        tensors[name] = _finish(acc)
+        comp = components.setdefault(component(name), dict.fromkeys(SUMS, 0.0))
+        for target in (comp, total):
+            for key in SUMS:
+                target[key] = max(target[key], acc[key]) if key == "max_change" else target[key] + acc[key]
+    return {
+        "old": old.path,
+        "new": new.path,
+        "tensors": tensors,
+        "components": {name: _finish(acc) for name, acc in components.items()},
+        "total": _finish(total),
+        "shape_mismatches": mismatched,
+        "only_old": sorted(refs_a.keys() - refs_b.keys()),
+        "only_new": sorted(refs_b.keys() - refs_a.keys()),
+    }
+
+
+def diff_checkpoints(old_path, new_path):
+    with CheckpointReader(old_path) as old, CheckpointReader(new_path) as new:
+        return diff_readers(old, new)
+
+
+def diff_series(paths, baseline="previous"):
+    """Diffs along a checkpoint series, each against the previous one or the first
+
+    Each checkpoint is opened once; nothing but the current tensor pair is held in memory.
+    """
+    diffs = []
+    first = previous = CheckpointReader(paths[0])
+    try:
+        for path in paths[1:]:
+            current = CheckpointReader(path)
+            diffs.append(diff_readers(first if baseline == "first" else previous, current))
+            if previous is not first:
+                previous.close()
+            previous = current
+    finally:
+        previous.close()
+        first.close()
+    return diffs
+
+
+def series_paths(run_dir):
+    """checkpoint_*/best_model_* files of a run folder in step order"""
+    found = [(int(m.group(1)), os.path.join(run_dir, name)) for name in os.listdir(run_dir)
+             for m in [STEP_RE.search(name)] if m]
+    return [path for _, path in sorted(found)]
+
+
+def print_diff(diff, top=10):
+    print(f"\n{os.path.basename(diff['old'])} -> {os.path.basename(diff['new'])}")
+    print(f"  {'component':<20} {'params':>12} {'rel L2':>9} {'cosine':>9} {'flips':>7} {'max Δ':>9}")
+    for name, s in list(diff["components"].items()) + [("total", diff["total"])]:
+        print(f"  {name:<20} {s['numel']:>12,} {s['rel_l2']:>9.4f} {s['cosine']:>9.5f} "
+              f"{s['sign_flips']:>6.2%} {s['max_change']:>9.4f}")
+    moved = sorted(diff["tensors"].items(), key=lambda item: -item[1]["rel_l2"])[:top]
+    if moved:
+        print(f"  Largest relative changes:")
+        for name, s in moved:
+            print(f"    {name:<60} rel L2 {s['rel_l2']:.4f}, cosine {s['cosine']:.4f}, flips {s['sign_flips']:.2%}")
+    for name, shapes in diff["shape_mismatches"].items():
+        print(f"  ❌ {name}: shape {shapes['old']} -> {shapes['new']}")
+    for key, label in (("only_old", "only in old"), ("only_new", "only in new")):
+        if diff[key]:
+            print(f"  ⚠️ {len(diff[key])} tensors {label}: {', '.join(diff[key][:5])}"
+                  + (" ..." if len(diff[key]) > 5 else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weight drift between checkpoints, streamed tensor by tensor")
+    parser.add_argument("checkpoints", nargs="+", help="Two or more checkpoints in order, or one run folder")
+    parser.add_argument("--baseline", choices=["previous", "first"], default="previous",
+                        help="Compare each checkpoint with the one before it or with the first")
+    parser.add_argument("--top", type=int, default=10, help="Tensors with the largest change to list per pair")
+    parser.add_argument("--json", default=None, help="Also write every diff to this JSON file")
+    args = parser.parse_args()
+
+    paths = args.checkpoints
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        paths = series_paths(paths[0])
+    if len(paths) < 2:
+        parser.error("need at least two checkpoints")
+
+    start = time.perf_counter()
+    diffs = diff_series(paths, args.baseline)
+    for diff in diffs:
+        print_diff(diff, args.top)
+    print(f"\n{len(diffs)} diffs over {len(paths)} checkpoints in {time.perf_counter() - start:.1f}s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(diffs, f, indent=1)
+    if any(diff["shape_mismatches"] for diff in diffs):
+        print("⚠️ Shape mismatches: these checkpoints come from different architectures")
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import time
+
+from checkpoint_reader import CheckpointReader, TensorRef
+from param_stats import parameter_stats
+
+SUMMARY_SUFFIX = ".summary.json"
+INDEX_NAME = "checkpoint_index.json"
+INDEX_VERSION = 1
+
+
+def stat_key(path):
+    """Identity of a checkpoint file; a rewritten file gets a new key"""
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _plain(value):
+    """JSON-safe copy of a loss value: numbers and nested dicts/lists of them, tensors as scalars"""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, TensorRef):
+        return float(value.numpy().reshape(-1)[0]) if value.numel == 1 else None
+    if hasattr(value, "item") and getattr(value, "ndim", 0) == 0:
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return None
+
+
+def summarize(data):
+    """Step, epoch, losses, learning rates and per-component parameter statistics of a checkpoint
+
+    data is the saved dict, either as written (torch tensors) or as
+    CheckpointReader.raw() returns it (TensorRefs).
+    """
+    model = data["model"] if "model" in data else data
+    losses = data.get("model_loss")
+    if losses is not None and not isinstance(losses, dict):
+        losses = {"loss": losses}
+    optimizers = data.get("optimizer") or []
+    lrs = [group.get("lr") for optimizer in (optimizers if isinstance(optimizers, list) else [optimizers])
+           for group in optimizer.get("param_groups", [])]
+    summary = {
+        "step": data.get("step"),
+        "epoch": data.get("epoch"),
+        "date": data.get("date"),
+        "losses": _plain(losses),
+        "lr": _plain(lrs),
+    }
+    history = data.get("loss_history")
+    if isinstance(history, dict):
+        # Only the endpoints; the sidecar stays small whatever the run length
+        summary["loss_history"] = {key: [_plain(values[0]), _plain(values[-1])]
+                                   for key, values in history.items() if isinstance(values, (list, tuple)) and values}
+    stats = parameter_stats(model)
+    summary["components"] = stats["components"]
+    summary["total"] = stats["total"]
+    return summary
+
+
+def write_summary(path, state=None):
+    """Write path's sidecar, from the in-memory state when given (CheckpointWriter.on_saved) or the file"""
+    if state is None:
+        with CheckpointReader(path) as checkpoint:
+            summary = summarize(checkpoint.raw())
+    else:
+        summary = summarize(state)
+    summary["key"] = stat_key(path)
+    sidecar = path + SUMMARY_SUFFIX
+    try:
+        with open(sidecar + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+        os.replace(sidecar + ".tmp", sidecar)
+    except OSError as e:
+        # A read-only run folder still gets its summary, just not cached
+        print(f"⚠️ Could not write {sidecar}: {e}")
+    return summary
+
+
+def read_summary(path, compute=True):
+    """path's summary from its sidecar while size and mtime still match, else computed (or None)"""
+    try:
+        with open(path + SUMMARY_SUFFIX, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        if summary.get("key") == stat_key(path):
+            return summary
+    except (FileNotFoundError, ValueError):
+        pass
+    return write_summary(path) if compute else None
+
+
+def _checkpoint_files(directory):
+    """(name, path, key) of each *.pth in directory; hard links (best_model.pth) are listed once"""
+    found, inodes = [], set()
+    entries = sorted((e for e in os.scandir(directory) if e.name.endswith(".pth") and e.is_file()),
+                     key=lambda e: (e.name == "best_model.pth", e.name))
+    for entry in entries:
+        st = entry.stat()
+        if (st.st_dev, st.st_ino) in inodes:
+            continue
+        inodes.add((st.st_dev, st.st_ino))
+        found.append((entry.name, entry.path, {"size": st.st_size, "mtime_ns": st.st_mtime_ns}))
+    return found
+
+
+def build_index(directory, compute=True):
+    """Summaries of every checkpoint in directory, sorted by step, cached in INDEX_NAME
+
+    Unchanged checkpoints cost one stat each; new or rewritten ones are read
+    from their sidecar, or summarized when compute is set.
+    """
+    index_path = os.path.join(directory, INDEX_NAME)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        cached = index["checkpoints"] if index.get("version") == INDEX_VERSION else {}
+    except (FileNotFoundError, ValueError):
+        cached = {}
+
+    checkpoints, changed = {}, False
+    for name, path, key in _checkpoint_files(directory):
+        summary = cached.get(name)
+        if summary is None or summary.get("key") != key:
+            summary = read_summary(path, compute)
+            changed = True
+            if summary is None:
+                continue
+        checkpoints[name] = summary
+    changed = changed or checkpoints.keys() != cached.keys()
+
+    if changed:
+        try:
+            with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "checkpoints": checkpoints}, f)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError as e:
+            print(f"⚠️ Could not write {index_path}: {e}")
+    entries = [dict(summary, file=name) for name, summary in checkpoints.items()]
+    return sorted(entries, key=lambda s: (s["step"] is None, s["step"] or 0, s["file"]))
+
+
+def loss_of(summary, metric):
+    losses = summary.get("losses") or {}
+    value = losses.get(metric, losses.get("loss"))
+    return value if isinstance(value, (int, float)) else None
+
+
+def rank(entries, metric="eval_loss"):
+    """Entries that report metric, best (lowest) first"""
+    return sorted((s for s in entries if loss_of(s, metric) is not None), key=lambda s: loss_of(s, metric))
+
+
+def _fmt(value, spec=".4f"):
+    return format(value, spec) if isinstance(value, (int, float)) else "-"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List and rank the checkpoints of a run from their summaries")
+    parser.add_argument("run_dir")
+    parser.add_argument("--sort", choices=["step", "eval_loss", "train_loss"], default="step")
+    parser.add_argument("--top", type=int, default=None, help="Only show the first N")
+    parser.add_argument("--no_compute", action="store_true",
+                        help="Skip checkpoints that have no up-to-date sidecar instead of reading them")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    entries = build_index(args.run_dir, compute=not args.no_compute)
+    if args.sort != "step":
+        entries = rank(entries, args.sort)
+    entries = entries[:args.top] if args.top else entries
+    if args.json:
+        print(json.dumps(entries, indent=1))
+    else:
+        print(f"{'checkpoint':<28} {'step':>8} {'epoch':>5} {'train_loss':>10} {'eval_loss':>10} {'lr':>10} {'abs max':>8}")
+        for s in entries:
+            lr = s["lr"][-1] if s["lr"] else None
+            print(f"{s['file']:<28} {_fmt(s['step'], 'd'):>8} {_fmt(s['epoch'], 'd'):>5} "
+                  f"{_fmt(loss_of(s, 'train_loss')):>10} {_fmt(loss_of(s, 'eval_loss')):>10} "
+                  f"{_fmt(lr, '.2e'):>10} {_fmt(s['total']['abs_max'], '.2f'):>8}")
+        print(f"{len(entries)} checkpoints in {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,360 @@
+import argparse
+import json
+import os
+import pickle
+import struct
+import sys
+import time
+import zipfile
+from collections.abc import Mapping
+
+import numpy as np
+
+# Element types of the storages torch.save writes; bfloat16 has no numpy type and is read as its raw bits
+STORAGE_DTYPES = {
+    "DoubleStorage": "float64",
+    "FloatStorage": "float32",
+    "HalfStorage": "float16",
+    "BFloat16Storage": "bfloat16",
+    "LongStorage": "int64",
+    "IntStorage": "int32",
+    "ShortStorage": "int16",
+    "CharStorage": "int8",
+    "ByteStorage": "uint8",
+    "UntypedStorage": "uint8",
+    "BoolStorage": "bool",
+    "ComplexFloatStorage": "complex64",
+    "ComplexDoubleStorage": "complex128",
+}
+NUMPY_DTYPES = {"bfloat16": np.uint16}
+ZIP_LOCAL_HEADER = struct.Struct("<4s22xHH")
+
+
+class TensorRef:
+    """A tensor of a checkpoint that has not been read: dtype and shape now, data on demand"""
+
+    __slots__ = ("storage", "offset", "shape", "stride", "dtype")
+
+    def __init__(self, storage, offset, shape, stride):
+        self.storage = storage
+        self.offset = offset
+        self.shape = tuple(shape)
+        self.stride = tuple(stride)
+        self.dtype = storage.dtype
+
+    @property
+    def numel(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        return self.numel * np.dtype(NUMPY_DTYPES.get(self.dtype, self.dtype)).itemsize
+
+    def _view(self):
+        base = self.storage.array()
+        if not self.numel:
+            return np.zeros(self.shape, dtype=base.dtype)
+        itemsize = base.dtype.itemsize
+        return np.lib.stride_tricks.as_strided(base[self.offset:], self.shape, [s * itemsize for s in self.stride])
+
+    def numpy(self):
+        """Memory-mapped array (bfloat16 is widened to a float32 copy)"""
+        view = self._view()
+        if self.dtype == "bfloat16":
+            return (view.astype(np.uint32) << 16).view(np.float32)
+        return view
+
+    def tensor(self):
+        """Memory-mapped torch tensor; pages are read from disk when first touched"""
+        import torch
+
+        view = self._view()
+        if self.dtype == "bfloat16":
+            return torch.from_numpy(view.view(np.int16)).view(torch.bfloat16)
+        return torch.from_numpy(view)
+
+    def release(self):
+        """Unmap the storage so its touched pages leave this process; it is mapped again when needed"""
+        self.storage._array = None
+
+    def __repr__(self):
+        return f"TensorRef({self.dtype}, {list(self.shape)})"
+
+
+class _Storage:
+    def __init__(self, reader, key, dtype):
+        self.reader = reader
+        self.key = key
+        self.dtype = dtype
+        self._array = None
+
+    def array(self):
+        if self._array is None:
+            self._array = self.reader._map(self.key, np.dtype(NUMPY_DTYPES.get(self.dtype, self.dtype)))
+        return self._array
+
+
+class _StorageType:
+    def __init__(self, name):
+        if name not in STORAGE_DTYPES:
+            raise pickle.UnpicklingError(f"Unsupported storage type torch.{name}")
+        self.dtype = STORAGE_DTYPES[name]
+
+
+def _rebuild_tensor(storage, storage_offset, size, stride, *args):
+    return TensorRef(storage, storage_offset, size, stride)
+
+
+def _rebuild_parameter(data, *args):
+    return data
+
+
+class _LazyUnpickler(pickle.Unpickler):
+    """Unpickles data.pkl of a torch.save archive into TensorRefs instead of reading the storages"""
+
+    def __init__(self, file, reader):
+        super().__init__(file)
+        self.reader = reader
+        self.storages = {}
+
+    def find_class(self, module, name):
+        if module == "torch._utils" and name in ("_rebuild_tensor", "_rebuild_tensor_v2"):
+            return _rebuild_tensor
+        if module == "torch._utils" and name in ("_rebuild_parameter", "_rebuild_parameter_with_state"):
+            return _rebuild_parameter
+        if module == "torch" and name.endswith("Storage"):
+            return _StorageType(name)
+        if module == "torch" and name == "Size":
+            return tuple
+        return super().find_class(module, name)
+
+    def persistent_load(self, pid):
+        kind, storage_type, key, _location, _numel = pid
+        if kind != "storage":
+            raise pickle.UnpicklingError(f"Unknown persistent id {kind!r}")
+        # Views of one storage (e.g. a tied weight) share its mapping
+        if key not in self.storages:
+            self.storages[key] = _Storage(self.reader, key, storage_type.dtype)
+        return self.storages[key]
+
+
+def _resolve(value, convert):
+    if isinstance(value, TensorRef):
+        return convert(value)
+    if isinstance(value, dict):
+        return type(value)((k, _resolve(v, convert)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return type(value)(_resolve(v, convert) for v in value)
+    return value
+
+
+def _walk(value, prefix=""):
+    """(dotted path, TensorRef) for every tensor in a nested value"""
+    if isinstance(value, TensorRef):
+        yield prefix, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _walk(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            yield from _walk(item, f"{prefix}.{index}" if prefix else str(index))
+
+
+class CheckpointReader(Mapping):
+    """Lazy view of a torch.save checkpoint (the zip format torch has written since 1.6)
+
+    Opening only unpickles the small data.pkl record: configs, steps and losses
+    come back as they were saved and every tensor as a TensorRef. Tensors are
+    memory-mapped from the file when asked for, so reading the model weights
+    never touches the optimizer state stored next to them.
+
+        with CheckpointReader(path) as checkpoint:
+            step = checkpoint["step"]
+            model.load_state_dict(checkpoint["model"])
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not zipfile.is_zipfile(path):
+            raise ValueError(f"{path} is not a zip-format torch checkpoint (saved with torch < 1.6?); "
+                             f"use torch.load for it")
+        self._zip = zipfile.ZipFile(path)
+        records = [name for name in self._zip.namelist() if name.endswith("/data.pkl") or name == "data.pkl"]
+        if not records:
+            raise ValueError(f"{path} has no data.pkl record; not a torch checkpoint")
+        self._prefix = records[0][:-len("data.pkl")]
+        byteorder = self._prefix + "byteorder"
+        if byteorder in self._zip.namelist() and self._zip.read(byteorder).decode() != sys.byteorder:
+            raise ValueError(f"{path} was saved with {self._zip.read(byteorder).decode()}-endian byte order")
+        with self._zip.open(records[0]) as f:
+            unpickler = _LazyUnpickler(f, self)
+            self._data = unpickler.load()
+        self._storages = unpickler.storages
+        if not isinstance(self._data, dict):
+            raise ValueError(f"{path} holds a {type(self._data).__name__}, not a checkpoint dict")
+        self._resolved = {}
+
+    def _map(self, key, dtype):
+        info = self._zip.getinfo(f"{self._prefix}data/{key}")
+        count = info.file_size // dtype.itemsize
+        if not count:
+            return np.zeros(0, dtype=dtype)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return np.frombuffer(bytearray(self._zip.read(info)), dtype=dtype)
+        # torch.save stores records uncompressed, so the bytes sit in the file as they are
+        with open(self.path, "rb") as f:
+            f.seek(info.header_offset)
+            signature, name_length, extra_length = ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size))
+        if signature != b"PK\x03\x04":
+            raise ValueError(f"Corrupt zip entry for storage {key} in {self.path}")
+        offset = info.header_offset + ZIP_LOCAL_HEADER.size + name_length + extra_length
+        # Copy-on-write: torch wants writable arrays, and writes must never reach the checkpoint
+        return np.memmap(self.path, dtype=dtype, mode="c", offset=offset, shape=(count,))
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def raw(self, key=None):
+        """The saved value with TensorRefs in place of tensors (the whole checkpoint when key is None)"""
+        return self._data if key is None else self._data[key]
+
+    def __getitem__(self, key):
+        """The saved value with memory-mapped torch tensors, as torch.load(mmap=True) would return it"""
+        if key not in self._resolved:
+            self._resolved[key] = _resolve(self._data[key], TensorRef.tensor)
+        return self._resolved[key]
+
+    def refs(self, key="model"):
+        """name -> TensorRef of a state dict; a bare state dict (no "model" entry) is returned as is"""
+        if key == "model" and key not in self._data:
+            return dict(_walk(self._data))
+        return dict(_walk(self._data[key]))
+
+    def state_dict(self, key="model"):
+        """name -> memory-mapped tensor, for model.load_state_dict"""
+        return {name: ref.tensor() for name, ref in self.refs(key).items()}
+
+    def tensors(self, key=None):
+        """(dotted path, TensorRef) for every tensor under key, or in the whole checkpoint"""
+        return _walk(self.raw(key))
+
+    def summary(self):
+        """Tensor count, elements and bytes per top-level entry, without reading any tensor"""
+        sizes = {}
+        for key in self.keys():
+            refs = list(_walk(self._data[key]))
+            if refs:
+                sizes[key] = {"tensors": len(refs), "elements": sum(r.numel for _, r in refs),
+                              "bytes": sum(r.nbytes for _, r in refs)}
+        return sizes
+
+    def close(self):
+        """Close the archive and drop this reader's mappings; tensors already handed out keep their own"""
+        self._zip.close()
+        for storage in self._storages.values():
+            storage._array = None
+        self._resolved.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _peak_rss():
+    import resource
+
+    # Linux reports kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _warm_up():
+    import torch  # noqa: F401 (the import is part of the baseline, not the measurement)
+
+
+def _bench(path, lazy):
+    import torch
+
+    before = _peak_rss()
+    start = time.perf_counter()
+    checkpoint = CheckpointReader(path) if lazy else torch.load(path, map_location="cpu")
+    step = checkpoint.get("step")
+    model = checkpoint["model"]
+    opened = time.perf_counter() - start
+    max_abs = max(p.abs().max().item() for p in model.values() if torch.is_tensor(p) and p.numel())
+    return {"open": opened, "total": time.perf_counter() - start, "peak_rss": _peak_rss() - before,
+            "step": step, "max_abs": max_abs}
+
+
+def benchmark(path):
+    """Time and peak RSS of torch.load against CheckpointReader, each in a fresh process
+
+    Both read the step and take the max |weight| over the model, which is what the
+    diagnostic scripts do. peak_rss is the growth of the process high-water mark;
+    for the reader it counts the model pages touched through the mapping, which
+    the kernel can drop again under memory pressure.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    results = {}
+    for name, lazy in (("torch.load", False), ("reader", True)):
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            pool.submit(_warm_up).result()
+            results[name] = pool.submit(_bench, path, lazy).result()
+    return results
+
+
+def _mb(value):
+    return f"{value / 2 ** 20:.0f} MB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a checkpoint without loading it into memory")
+    parser.add_argument("checkpoint")
+    parser.add_argument("--tensors", nargs="?", const="model", default=None,
+                        help="List the tensors under this entry with shapes and dtypes (default: model)")
+    parser.add_argument("--json", action="store_true", help="Print the summary (or tensor list) as JSON")
+    parser.add_argument("--benchmark", action="store_true", help="Compare time and peak RSS with torch.load")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with CheckpointReader(args.checkpoint) as checkpoint:
+        if args.tensors:
+            tensors = {name: {"shape": list(ref.shape), "dtype": ref.dtype}
+                       for name, ref in checkpoint.refs(args.tensors).items()}
+            if args.json:
+                print(json.dumps(tensors, indent=1))
+            else:
+                for name, info in tensors.items():
+                    print(f"{name:<70} {info['dtype']:<9} {info['shape']}")
+        else:
+            summary = checkpoint.summary()
+            scalars = {key: checkpoint.raw(key) for key in checkpoint.keys()
+                       if isinstance(checkpoint.raw(key), (int, float, str)) and key not in summary}
+            if args.json:
+                print(json.dumps({"file_bytes": os.path.getsize(args.checkpoint), "entries": summary,
+                                  **scalars}, indent=1))
+            else:
+                print(f"{args.checkpoint} ({_mb(os.path.getsize(args.checkpoint))}, "
+                      f"opened in {time.perf_counter() - start:.2f}s)")
+                for key, value in scalars.items():
+                    print(f"  {key}: {value}")
+                for key, sizes in summary.items():
+                    print(f"  {key}: {sizes['tensors']} tensors, {sizes['elements']:,} elements, {_mb(sizes['bytes'])}")
+
+    if args.benchmark:
+        results = benchmark(args.checkpoint)
+        for name, result in results.items():
+            print(f"{name:<11} open {result['open']:.2f}s, with max |weight| {result['total']:.2f}s, "
+                  f"peak RSS +{_mb(result['peak_rss'])}")
+        baseline, lazy = results["torch.load"], results["reader"]
+        print(f"✅ Reader: {baseline['total'] / max(lazy['total'], 1e-9):.1f}x faster, "
+              f"{_mb(baseline['peak_rss'] - lazy['peak_rss'])} less peak memory")
@@ -0,0 +1,211 @@
+import datetime
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+import torch
+from trainer import Trainer
+
+from checkpoint_index import SUMMARY_SUFFIX, write_summary
+
+CHECKPOINT_RE = re.compile(r"^checkpoint_(\d+)\.pth$")
+BEST_RE = re.compile(r"^best_model_(\d+)\.pth$")
+
+
+def snapshot_state(obj):
+    """Deep copy of a (nested) state dict with every tensor cloned to CPU memory"""
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot_state(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot_state(value) for value in obj)
+    return obj
+
+
+def _state_dict(obj):
+    if obj is None:
+        return None
+    if isinstance(obj, list):
+        return [o.state_dict() for o in obj]
+    if isinstance(obj, dict):
+        return {key: o.state_dict() for key, o in obj.items()}
+    return obj.state_dict()
+
+
+def _steps(output_path, pattern):
+    """Sorted (step, path) pairs of files in output_path matching pattern"""
+    found = []
+    for name in os.listdir(output_path):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(output_path, name)))
+    return sorted(found)
+
+
+def latest_checkpoint(output_path):
+    """(step, path) of the newest checkpoint_*.pth or best_model_*.pth, or None"""
+    found = _steps(output_path, CHECKPOINT_RE) + _steps(output_path, BEST_RE)
+    return max(found) if found else None
+
+
+class CheckpointWriter:
+    """Serializes checkpoint snapshots on a background thread and prunes old ones
+
+    At most one snapshot waits while another is being written; a further save
+    blocks until the queue has room, so memory stays bounded when the disk
+    falls behind. Files appear under their final name only once complete.
+    """
+
+    def __init__(self, output_path, keep_last=5, keep_best=1):
+        self.output_path = output_path
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.on_saved = []  # callbacks(path, state) run on the writer thread after each save
+        self.stats = {"saved": 0, "blocked": 0.0, "snapshot": 0.0, "write": 0.0}
+        self.error = None
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, state, file_name, best=False):
+        """Snapshot state now and write it to output_path/file_name in the background"""
+        if self.error is not None:
+            raise RuntimeError(f"Checkpoint writer failed: {self.error}")
+        start = time.perf_counter()
+        state = snapshot_state(state)
+        snapshotted = time.perf_counter()
+        self._queue.put((state, file_name, best))
+        self.stats["snapshot"] += snapshotted - start
+        self.stats["blocked"] += time.perf_counter() - snapshotted
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                self._write(*job)
+            except Exception as e:
+                self.error = e
+                print(f"❌ Checkpoint write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, state, file_name, best):
+        start = time.perf_counter()
+        path = os.path.join(self.output_path, file_name)
+        tmp_path = path + ".tmp"
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+        if best:
+            # best_model.pth always points at the newest best; a hard link avoids copying gigabytes
+            shortcut_tmp = os.path.join(self.output_path, "best_model.pth.tmp")
+            if os.path.exists(shortcut_tmp):
+                os.remove(shortcut_tmp)
+            try:
+                os.link(path, shortcut_tmp)
+            except OSError:
+                shutil.copyfile(path, shortcut_tmp)
+            os.replace(shortcut_tmp, os.path.join(self.output_path, "best_model.pth"))
+        self.prune()
+        self.stats["write"] += time.perf_counter() - start
+        self.stats["saved"] += 1
+        for callback in self.on_saved:
+            callback(path, state)
+
+    def prune(self):
+        """Keep the newest keep_last checkpoints and keep_best best models"""
+        # Each best model beat every earlier one, so the newest K are also the K best
+        for pattern, keep in ((CHECKPOINT_RE, self.keep_last), (BEST_RE, self.keep_best)):
+            if keep is None or keep <= 0:
+                continue
+            for _, path in _steps(self.output_path, pattern)[:-keep]:
+                os.remove(path)
+                if os.path.exists(path + SUMMARY_SUFFIX):
+                    os.remove(path + SUMMARY_SUFFIX)
+
+    def wait(self):
+        """Block until every submitted checkpoint is on disk"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class AsyncCheckpointTrainer(Trainer):
+    """Trainer whose checkpoint and best-model saves go through a CheckpointWriter
+
+    The training loop only pays for copying the state dicts to CPU memory.
+    keep_best replaces the Trainer's save_all_best/save_best_after handling;
+    save_every_epoch adds a checkpoint after each training epoch (for async_eval.py).
+    """
+
+    def __init__(self, *args, keep_best=1, save_every_epoch=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkpoint_writer = CheckpointWriter(self.output_path, self.config.save_n_checkpoints, keep_best)
+        # Sidecar summaries (checkpoint_index.py) come from the snapshot already in memory
+        self.checkpoint_writer.on_saved.append(write_summary)
+        self.save_every_epoch = save_every_epoch
+
+    def _checkpoint_state(self, model_loss):
+        model = self.model.module if hasattr(self.model, "module") else self.model
+        return {
+            "config": self.config.to_dict(),
+            "model": model.state_dict(),
+            "optimizer": _state_dict(self.optimizer),
+            "scaler": _state_dict(self.scaler) if self.use_amp_scaler else None,
+            "step": self.total_steps_done,
+            "epoch": self.epochs_done,
+            "date": datetime.date.today().strftime("%B %d, %Y"),
+            "model_loss": model_loss,
+        }
+
+    def _current_loss(self):
+        return {
+            "train_loss": self._pick_target_avg_loss(self.keep_avg_train),
+            "eval_loss": self._pick_target_avg_loss(self.keep_avg_eval),
+        }
+
+    def save_checkpoint(self):
+        if self.args.rank not in (None, 0):
+            return
+        state = self._checkpoint_state(self._current_loss())
+        file_name = f"checkpoint_{self.total_steps_done}.pth"
+        print(f" > CHECKPOINT : {os.path.join(self.output_path, file_name)}")
+        self.checkpoint_writer.submit(state, file_name)
+
+    def save_best_model(self):
+        if self.args.rank not in (None, 0):
+            return
+        current = self._current_loss()
+        use_eval = current["eval_loss"] is not None and self.best_loss["eval_loss"] is not None
+        key = "eval_loss" if use_eval else "train_loss"
+        if current[key] is None or self.best_loss[key] is None or current[key] >= self.best_loss[key]:
+            return
+        file_name = f"best_model_{self.total_steps_done}.pth"
+        print(f" > BEST MODEL : {os.path.join(self.output_path, file_name)}")
+        self.checkpoint_writer.submit(self._checkpoint_state(current), file_name, best=True)
+        self.best_loss = current
+
+    def train_epoch(self):
+        super().train_epoch()
+        if self.save_every_epoch:
+            self.save_checkpoint()
+
+    def fit(self):
+        try:
+            super().fit()
+        finally:
+            self.checkpoint_writer.wait()
+            self.checkpoint_writer.close()
+            stats = self.checkpoint_writer.stats
+            if stats["saved"]:
+                print(f"✅ {stats['saved']} checkpoints written in the background ({stats['write']:.1f}s), "
+                      f"training thread spent {stats['snapshot']:.1f}s snapshotting and {stats['blocked']:.1f}s waiting")
@@ -0,0 +1,235 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from itertools import islice
+
+from training_profiler import summarize
+
+METRICS_DIR_ENV = "DDP_METRICS_DIR"
+
+
+def init_from_env():
+    """Join the gloo process group described by the launcher's environment
+
+    Returns (rank, world_size), or None when not started by this launcher.
+    """
+    world_size = int(os.environ.get("WORLD_SIZE", "1"))
+    if world_size <= 1:
+        return None
+    import torch
+    import torch.distributed as dist
+
+    rank = int(os.environ["RANK"])
+    torch.set_num_threads(int(os.environ.get("OMP_NUM_THREADS", "1")))
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    return rank, world_size
+
+
+def shard_samples(samples, rank, world_size):
+    """Every world_size-th sample; load_tts_samples splits with a fixed seed, so shards are disjoint"""
+    return samples[rank::world_size]
+
+
+def broadcast_parameters(model):
+    """Start every rank from rank 0's weights"""
+    import torch.distributed as dist
+
+    for tensor in model.state_dict().values():
+        dist.broadcast(tensor, 0)
+
+
+class EvenLengthSampler:
+    """Cuts a (batch) sampler to the shortest length across ranks
+
+    Shards filtered by Coqui's length limits, or packed by FrameBudgetBatchSampler,
+    give each rank a slightly different number of batches; a rank that runs an
+    extra step would block forever in the gradient all-reduce.
+    """
+
+    def __init__(self, sampler):
+        import torch
+        import torch.distributed as dist
+
+        self.sampler = sampler
+        length = torch.tensor([len(sampler)])
+        dist.all_reduce(length, op=dist.ReduceOp.MIN)
+        self.length = int(length.item())
+
+    def __iter__(self):
+        return islice(iter(self.sampler), self.length)
+
+    def __len__(self):
+        return self.length
+
+
+class DataParallelMixin:
+    """Model mixin averaging gradients across ranks right before each optimizer step
+
+    One flat all-reduce per optimizer covers every parameter it owns. Gradients are
+    clipped per rank before averaging, which keeps the averaged norm within the limit.
+
+    The all-reduce is collective, so every rank must call optimizer.step() for every
+    optimizer on every step. Coqui's Trainer only skips it under a grad scaler (on
+    inf/NaN gradients) or Accelerate; on_init_end refuses both. Without them NaN
+    gradients are stepped like any others, so ranks stay in lockstep.
+    """
+
+    data_parallel = False
+
+    def on_init_end(self, trainer):
+        if self.data_parallel and (trainer.use_amp_scaler or trainer.use_accelerate):
+            raise RuntimeError("Data-parallel training needs an optimizer step on every rank every step; a grad scaler "
+                               "or Accelerate may skip one and deadlock the others (set use_grad_scaler=False, "
+                               "no --use_accelerate)")
+        parent = getattr(super(), "on_init_end", None)
+        if parent is not None:
+            parent(trainer)
+
+    def _all_reduce_gradients(self, optimizer, args, kwargs):
+        import torch
+        import torch.distributed as dist
+
+        start = time.perf_counter()
+        params = [p for group in optimizer.param_groups for p in group["params"] if p.requires_grad]
+        if not params:
+            return
+        # One flag per parameter so a gradient missing on some ranks is averaged over the ranks that have it
+        flat = torch.cat([p.grad.detach().reshape(-1) if p.grad is not None else p.new_zeros(p.numel())
+                          for p in params] + [torch.tensor([float(p.grad is not None) for p in params])])
+        dist.all_reduce(flat)
+        flags = flat[-len(params):]
+        offset = 0
+        for p, flag in zip(params, flags.tolist()):
+            if flag:
+                grad = flat[offset:offset + p.numel()].view_as(p) / flag
+                if p.grad is None:
+                    p.grad = grad.clone()
+                else:
+                    p.grad.copy_(grad)
+            offset += p.numel()
+        profiler = getattr(self, "step_profiler", None)
+        if profiler is not None:
+            profiler.add("grad_sync", time.perf_counter() - start)
+
+    def get_optimizer(self):
+        optimizers = super().get_optimizer()
+        if self.data_parallel:
+            for optimizer in optimizers if isinstance(optimizers, (list, tuple)) else [optimizers]:
+                optimizer.register_step_pre_hook(self._all_reduce_gradients)
+        return optimizers
+
+
+def setup_data_parallel(model, config, train_samples, rank, world_size):
+    """Apply the per-rank training setup; returns this rank's training shard"""
+    model.data_parallel = True
+    broadcast_parameters(model)
+    if rank != 0:
+        # Rank 0 evaluates, logs and saves; the others only train
+        config.run_eval = False
+    metrics_dir = os.environ.get(METRICS_DIR_ENV)
+    if metrics_dir:
+        # Each rank writes its own file where the launcher's scaling report looks for it
+        file_name = f"step_metrics_rank{rank}.jsonl"
+        if getattr(model, "step_profiler", None) is None:
+            from training_profiler import StepProfiler
+
+            model.step_profiler = StepProfiler(metrics_dir, file_name=file_name)
+        else:
+            model.step_profiler.output_path = metrics_dir
+            model.step_profiler.file_name = file_name
+    return shard_samples(train_samples, rank, world_size)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch(script, script_args, nproc, threads, metrics_dir):
+    """Run nproc copies of a training script as one gloo process group; returns the exit code"""
+    os.makedirs(metrics_dir, exist_ok=True)
+    env = dict(os.environ, MASTER_ADDR="127.0.0.1", MASTER_PORT=str(_free_port()),
+               WORLD_SIZE=str(nproc), OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+    env[METRICS_DIR_ENV] = metrics_dir
+    processes = []
+    for rank in range(nproc):
+        env_rank = dict(env, RANK=str(rank), LOCAL_RANK=str(rank))
+        # The Trainer picks --rank up from argv like with its own trainer.distribute launcher
+        processes.append(subprocess.Popen([sys.executable, script, *script_args, f"--rank={rank}"], env=env_rank))
+
+    exit_code = 0
+    try:
+        while processes:
+            for process in list(processes):
+                code = process.poll()
+                if code is None:
+                    continue
+                processes.remove(process)
+                if code != 0:
+                    exit_code = code
+                    print(f"❌ Rank process {process.pid} exited with {code}, stopping the others")
+                    for other in processes:
+                        other.terminate()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        exit_code = 1
+    return exit_code
+
+
+def scaling_report(metrics_dir, nproc, baseline=None, skip=10):
+    """Aggregate throughput over the rank metrics and efficiency against a single-process run"""
+    ranks = []
+    for rank in range(nproc):
+        path = os.path.join(metrics_dir, f"step_metrics_rank{rank}.jsonl")
+        if os.path.exists(path):
+            ranks.append(summarize(path, skip))
+    ranks = [r for r in ranks if r and r["samples_per_sec"]]
+    if not ranks:
+        print("⚠️ No step metrics recorded")
+        return None
+
+    throughput = sum(r["samples_per_sec"] for r in ranks)
+    report = {"processes": len(ranks), "samples_per_sec": throughput,
+              "step_time": sum(r["step_time"] for r in ranks) / len(ranks)}
+    sync = [r["grad_sync"] for r in ranks if r.get("grad_sync") is not None]
+    if sync:
+        report["grad_sync_share"] = sum(sync) / len(sync) / report["step_time"]
+    print(f"Processes: {len(ranks)}, {throughput:.2f} samples/s total, step {report['step_time'] * 1000:.0f} ms")
+    if "grad_sync_share" in report:
+        print(f"Gradient all-reduce: {report['grad_sync_share']:.1%} of step time")
+    single = summarize(baseline, skip).get("samples_per_sec") if baseline else None
+    if baseline and not single:
+        print(f"⚠️ No usable steps in baseline {baseline}")
+    elif single:
+        report["speedup"] = throughput / single
+        report["efficiency"] = report["speedup"] / len(ranks)
+        print(f"Speedup vs 1 process: {report['speedup']:.2f}x, scaling efficiency {report['efficiency']:.0%}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run train_vits.py/train_glowtts.py as CPU data-parallel processes")
+    parser.add_argument("--nproc", type=int, default=2, help="Training processes")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Intra-op threads per process (default: cores // nproc)")
+    parser.add_argument("--metrics_dir", default=None, help="Where ranks write step metrics (default: ./ddp_metrics/<time>)")
+    parser.add_argument("--baseline", default=None,
+                        help="step_metrics.jsonl of a single-process run (--step_metrics) for scaling efficiency")
+    parser.add_argument("script", help="Training script")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="Arguments passed through to the script")
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.nproc)
+    metrics_dir = args.metrics_dir or os.path.join("ddp_metrics", time.strftime("%Y%m%d-%H%M%S"))
+    print(f"🚀 {args.nproc} processes x {threads} threads, metrics in {metrics_dir}")
+    start = time.perf_counter()
+    code = launch(args.script, args.script_args, args.nproc, threads, metrics_dir)
+    print(f"Wall time: {time.perf_counter() - start:.1f}s")
+    scaling_report(metrics_dir, args.nproc, args.baseline)
+    sys.exit(code)
@@ -5,6 +5,8 @@ from TTS.tts.models.vits import Vits
 from TTS.tts.utils.text.tokenizer import TTSTokenizer
 from TTS.utils.audio import AudioProcessor
 
+from checkpoint_reader import CheckpointReader
+
 # Define paths
 output_path = "/var/www/clients/client1/web63/web/tts-backend"
 model_path = "/var/www/clients/client1/web63/web/tts-backend/vits_ljspeech-April-15-2025_05+11PM-0000000/best_model_60.pth"
@@ -21,8 +23,8 @@ tokenizer, config = TTSTokenizer.init_from_config(config)
 
 # Load model
 model = Vits(config)
-checkpoint = torch.load(model_path, map_location=torch.device("cpu"))
-model.load_state_dict(checkpoint["model"], strict=False)  # Set strict to False
+with CheckpointReader(model_path) as checkpoint:
+    model.load_state_dict(checkpoint.state_dict(), strict=False)  # Set strict to False
 model.eval()
 
 # Inference
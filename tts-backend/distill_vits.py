@@ -0,0 +1,459 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import torch
+from trainer import TrainerArgs
+
+from TTS.tts.datasets import load_tts_samples
+from TTS.tts.utils.helpers import sequence_mask
+from TTS.tts.utils.text.tokenizer import TTSTokenizer
+from TTS.utils.audio import AudioProcessor
+
+from build_phoneme_cache import text_hash
+from checkpoint_writer import AsyncCheckpointTrainer, latest_checkpoint
+from finetune import (PRETRAINED, finetune_config, load_matching_weights, load_pretrained_weights, pretrained_config,
+                      resolve_checkpoint)
+from phoneme_store import use_packed_phonemes
+from train_vits import TrainVits
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "distill_cache")
+MANIFEST_NAME = "teacher_manifest.json"
+REPORT_NAME = "distill_report.json"
+
+# VitsArgs overrides for the student. hidden_channels stays at the teacher's width so
+# the posterior latents can be matched directly; the HiFi-GAN decoder, which dominates
+# CPU synthesis time, is where most of the savings come from.
+STUDENT_PRESETS = {
+    "small": {
+        "num_layers_text_encoder": 4,
+        "hidden_channels_ffn_text_encoder": 512,
+        "num_layers_posterior_encoder": 8,
+        "num_layers_flow": 2,
+        "use_sdp": False,
+        "resblock_type_decoder": "2",
+        "resblock_dilation_sizes_decoder": [[1, 3], [1, 3], [1, 3]],
+        "upsample_initial_channel_decoder": 256,
+    },
+    "tiny": {
+        "num_layers_text_encoder": 3,
+        "hidden_channels_ffn_text_encoder": 384,
+        "num_layers_posterior_encoder": 6,
+        "num_layers_flow": 2,
+        "use_sdp": False,
+        "resblock_type_decoder": "2",
+        "resblock_kernel_sizes_decoder": [3, 7],
+        "resblock_dilation_sizes_decoder": [[1, 3], [1, 3]],
+        "upsample_initial_channel_decoder": 128,
+    },
+}
+
+_teacher = None
+_cache_dir = None
+_latents = True
+
+
+def teacher_signature(checkpoint_path, latents):
+    stat = os.stat(checkpoint_path)
+    return json.dumps({"checkpoint": os.path.abspath(checkpoint_path), "size": stat.st_size,
+                       "mtime": int(stat.st_mtime), "latents": latents}, sort_keys=True)
+
+
+def cache_key(audio_unique_name):
+    """File name safe key of a sample; "<dataset>#wavs/<id>" keeps same-named clips of different datasets apart"""
+    return re.sub(r"[^\w-]", "_", audio_unique_name)
+
+
+def teacher_wav_path(cache_dir, key):
+    # The prefix keeps teacher clips apart from the recordings when the cache is loaded as a dataset
+    return os.path.join(cache_dir, "wavs", f"teacher_{key}.wav")
+
+
+def build_teacher(checkpoint_path, config):
+    from TTS.tts.models.vits import Vits
+
+    model = Vits.init_from_config(config)
+    load_pretrained_weights(model, checkpoint_path)
+    model.eval()
+    return model
+
+
+def _init_worker(checkpoint_path, config_dict, cache_dir, latents):
+    global _teacher, _cache_dir, _latents
+    from extract_chars import config_from_dict
+
+    torch.set_num_threads(1)
+    _teacher = build_teacher(checkpoint_path, config_from_dict(config_dict))
+    _cache_dir = cache_dir
+    _latents = latents
+
+
+def _teach(job):
+    """Synthesize one clip with the teacher and save its waveform, token durations and posterior means"""
+    import soundfile as sf
+    from TTS.tts.models.vits import wav_to_spec
+
+    key, text, language, digest = job
+    audio = _teacher.config.audio
+    # Same seed per clip, so a rebuilt cache reproduces the same targets
+    torch.manual_seed(int(digest[:8], 16))
+    tokens = torch.LongTensor(_teacher.tokenizer.text_to_ids(text, language=language))[None]
+    with torch.no_grad():
+        outputs = _teacher.inference(tokens)
+        wav = outputs["model_outputs"][0, 0].clamp(-1, 1)
+        durations = outputs["durations"][0, 0].numpy().astype(np.int16)
+        if _latents:
+            spec = wav_to_spec(wav[None, None], audio.fft_size, audio.hop_length, audio.win_length)
+            _, m_q, _, _ = _teacher.posterior_encoder(spec, torch.LongTensor([spec.shape[-1]]))
+
+    path = teacher_wav_path(_cache_dir, key)
+    sf.write(path + ".tmp.wav", wav.numpy(), audio.sample_rate, subtype="PCM_16")
+    os.replace(path + ".tmp.wav", path)
+    np.save(os.path.join(_cache_dir, "durations", key + ".npy"), durations)
+    if _latents:
+        np.save(os.path.join(_cache_dir, "latents", key + ".npy"), m_q[0].numpy().astype(np.float16))
+    return key, digest, len(wav) / audio.sample_rate
+
+
+def _load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _update_metadata(cache_dir, rows):
+    """Keep an ljspeech metadata.csv over the cached clips, so the cache doubles as a dataset (train_vits.py --speakers)"""
+    path = os.path.join(cache_dir, "metadata.csv")
+    texts = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                cols = line.rstrip("\n").split("|")
+                if len(cols) >= 3:
+                    texts[cols[0]] = cols[2]
+    texts.update(rows)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        for name, text in sorted(texts.items()):
+            f.write(f"{name}|{text}|{text}\n")
+    os.replace(path + ".tmp", path)
+
+
+def build_teacher_cache(samples, checkpoint_path, config, cache_dir, latents=True, workers=None):
+    """Run the teacher once over samples; returns the samples pointing at the teacher's audio
+
+    Clips whose text, teacher checkpoint and latent setting are unchanged since the
+    last run are reused.
+    """
+    for sub in ("wavs", "durations", "latents"):
+        os.makedirs(os.path.join(cache_dir, sub), exist_ok=True)
+    signature = teacher_signature(checkpoint_path, latents)
+    manifest = _load_manifest(cache_dir)
+
+    jobs = []
+    student_samples = []
+    for sample in samples:
+        key = cache_key(sample["audio_unique_name"])
+        digest = text_hash(sample["text"], signature)
+        if manifest.get(key) != digest or not os.path.exists(teacher_wav_path(cache_dir, key)):
+            jobs.append((key, sample["text"], sample.get("language") or None, digest))
+        student_samples.append(dict(sample, audio_file=teacher_wav_path(cache_dir, key)))
+
+    print(f"Teacher cache: {cache_dir}")
+    print(f"{len(samples)} clips, {len(samples) - len(jobs)} up to date, {len(jobs)} to synthesize")
+    if jobs:
+        start = time.perf_counter()
+        seconds = 0.0
+        initargs = (checkpoint_path, config.to_dict(), cache_dir, latents)
+        with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            for done, (key, digest, duration) in enumerate(pool.imap_unordered(_teach, jobs), 1):
+                manifest[key] = digest
+                seconds += duration
+                if done % 100 == 0:
+                    _save_manifest(cache_dir, manifest)
+                    print(f"  {done}/{len(jobs)} clips")
+        _save_manifest(cache_dir, manifest)
+        elapsed = time.perf_counter() - start
+        print(f"✅ Synthesized {seconds / 3600:.2f} h of teacher audio in {elapsed:.0f}s")
+    _update_metadata(cache_dir, {f"teacher_{cache_key(s['audio_unique_name'])}": s["text"] for s in samples})
+    return student_samples
+
+
+def init_from_teacher(student, checkpoint_path):
+    """Start every tensor the student shares with the teacher (embeddings, early layers, discriminator) from it"""
+    copied, own = load_matching_weights(student, checkpoint_path)
+    print(f"Initialized {copied} of {own} student tensors from the teacher")
+
+
+class DistillVits(TrainVits):
+    """TrainVits learning from cached teacher outputs on top of the usual VITS losses
+
+    The teacher's audio replaces the recordings, so the adversarial and mel losses
+    already pull the student towards the teacher. The teacher's token durations
+    supervise the duration predictor and its posterior means the student's
+    posterior encoder.
+    """
+
+    # cache directory written by build_teacher_cache, or None to train without distillation losses
+    teacher_cache = None
+    duration_weight = 1.0
+    latent_weight = 1.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._log_durations = None
+        if not self.args.use_sdp:
+            # The deterministic predictor returns log durations; the stochastic one only its NLL
+            self.duration_predictor.register_forward_hook(self._capture_durations)
+
+    def _capture_durations(self, module, inputs, output):
+        self._log_durations = output
+
+    def _targets(self, kind, names, lengths, dtype):
+        """Padded teacher targets for a batch and a mask of the samples whose lengths match, or (None, None)"""
+        arrays = []
+        for name, length in zip(names, lengths.tolist()):
+            path = os.path.join(self.teacher_cache, kind, cache_key(name) + ".npy")
+            array = np.load(path) if os.path.exists(path) else None
+            arrays.append(array if array is not None and array.shape[-1] == length else None)
+        found = [a for a in arrays if a is not None]
+        if not found:
+            return None, None
+        padded = np.zeros((len(arrays), *found[0].shape[:-1], int(lengths.max())), dtype=np.float32)
+        for i, array in enumerate(arrays):
+            if array is not None:
+                padded[i, ..., :array.shape[-1]] = array
+        valid = torch.tensor([a is not None for a in arrays])
+        return torch.from_numpy(padded).to(dtype), valid
+
+    def distill_losses(self, batch):
+        names = batch["audio_unique_names"]
+        losses = {}
+        if self.duration_weight and self._log_durations is not None:
+            token_lens = batch["token_lens"]
+            target, valid = self._targets("durations", names, token_lens, self._log_durations.dtype)
+            if target is not None:
+                device = self._log_durations.device
+                mask = sequence_mask(token_lens, target.size(1)).unsqueeze(1).to(device) * valid.to(device)[:, None, None]
+                target = torch.log(target.to(device).unsqueeze(1) + 1e-6) * mask
+                error = (self._log_durations - target) ** 2 * mask
+                losses["loss_distill_duration"] = (error.sum() / mask.sum(), self.duration_weight)
+        if self.latent_weight and os.path.isdir(os.path.join(self.teacher_cache, "latents")):
+            m_q = self.model_outputs_cache["m_q"]
+            spec_lens = batch["spec_lens"]
+            target, valid = self._targets("latents", names, spec_lens, m_q.dtype)
+            if target is not None:
+                device = m_q.device
+                target = target[:, :, :m_q.size(2)].to(device)
+                mask = sequence_mask(spec_lens, m_q.size(2)).unsqueeze(1).to(device) * valid.to(device)[:, None, None]
+                error = (m_q - target).abs() * mask
+                losses["loss_distill_latent"] = (error.sum() / (mask.sum() * m_q.size(1)), self.latent_weight)
+        return losses
+
+    def train_step(self, batch, criterion, optimizer_idx):
+        outputs, loss_dict = super().train_step(batch, criterion, optimizer_idx)
+        if optimizer_idx == 1 and self.teacher_cache is not None:
+            for key, (loss, weight) in self.distill_losses(batch).items():
+                loss_dict[key] = loss
+                loss_dict["loss"] = loss_dict["loss"] + weight * loss
+        return outputs, loss_dict
+
+
+def split_samples(config):
+    """The same train/eval split train_vits.py uses"""
+    return load_tts_samples(
+        config.datasets,
+        eval_split=True,
+        eval_split_max_size=config.eval_split_max_size,
+        eval_split_size=0.3333333333333333,
+    )
+
+
+def student_config(checkpoint_path, training_config, preset):
+    """The teacher's config with the training script's data settings and a reduced model"""
+    config = finetune_config(checkpoint_path, training_config)
+    for key, value in STUDENT_PRESETS[preset].items():
+        setattr(config.model_args, key, value)
+    config.run_name = f"{training_config.run_name}_distill_{preset}"
+    return config
+
+
+def generator_parameters(model):
+    return sum(p.numel() for k, p in model.named_parameters() if not k.startswith("disc."))
+
+
+def _mfcc(wav, sample_rate, n_fft, hop_length):
+    import librosa
+
+    mel = librosa.feature.melspectrogram(y=wav, sr=sample_rate, n_fft=n_fft, hop_length=hop_length, n_mels=80)
+    log_mel = librosa.power_to_db(mel + 1e-10)
+    return log_mel, librosa.feature.mfcc(S=log_mel, n_mfcc=13)
+
+
+def _ratio(total, count):
+    return total / count if total is not None and count else None
+
+
+def _fmt(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def compare(student, teacher, texts, seed=0):
+    """Speed, size and objective distance of the student to the teacher on texts
+
+    RTF is synthesis time over audio duration. Mel L1 (dB) and MCD are measured with
+    the student following the teacher's durations, so frames line up without DTW;
+    duration error is the student's own per-token prediction against the teacher's.
+    """
+    audio = teacher.config.audio
+    totals = {"teacher_time": 0.0, "student_time": 0.0, "audio_seconds": 0.0, "mel_l1": 0.0, "mcd": 0.0,
+              "duration_error": 0.0}
+    with torch.no_grad():
+        for i, text in enumerate(texts):
+            tokens = torch.LongTensor(teacher.tokenizer.text_to_ids(text))[None]
+            torch.manual_seed(seed + i)
+            start = time.perf_counter()
+            reference = teacher.inference(tokens)
+            totals["teacher_time"] += time.perf_counter() - start
+            torch.manual_seed(seed + i)
+            start = time.perf_counter()
+            own = student.inference(tokens)
+            totals["student_time"] += time.perf_counter() - start
+            forced = student.inference(tokens, aux_input={"durations": reference["durations"][0]})
+
+            teacher_wav = reference["model_outputs"][0, 0].numpy()
+            student_wav = forced["model_outputs"][0, 0].numpy()
+            totals["audio_seconds"] += len(teacher_wav) / audio.sample_rate
+            teacher_mel, teacher_mfcc = _mfcc(teacher_wav, audio.sample_rate, audio.fft_size, audio.hop_length)
+            student_mel, student_mfcc = _mfcc(student_wav, audio.sample_rate, audio.fft_size, audio.hop_length)
+            frames = min(teacher_mel.shape[1], student_mel.shape[1])
+            totals["mel_l1"] += float(np.abs(teacher_mel[:, :frames] - student_mel[:, :frames]).mean())
+            diff = teacher_mfcc[1:, :frames] - student_mfcc[1:, :frames]
+            totals["mcd"] += float((10 / np.log(10)) * np.sqrt(2 * (diff ** 2).sum(axis=0)).mean())
+            totals["duration_error"] += float((own["durations"] - reference["durations"]).abs().mean())
+
+    # No texts, or only empty syntheses, leave these undefined; they are reported as null / n/a
+    report = {
+        "sentences": len(texts),
+        "teacher_parameters": generator_parameters(teacher),
+        "student_parameters": generator_parameters(student),
+        "teacher_rtf": _ratio(totals["teacher_time"], totals["audio_seconds"]),
+        "student_rtf": _ratio(totals["student_time"], totals["audio_seconds"]),
+        "mel_l1_db": _ratio(totals["mel_l1"], len(texts)),
+        "mcd_db": _ratio(totals["mcd"], len(texts)),
+        "duration_error_frames": _ratio(totals["duration_error"], len(texts)),
+    }
+    report["speedup"] = _ratio(report["teacher_rtf"], report["student_rtf"])
+    print(f"Parameters: teacher {report['teacher_parameters'] / 1e6:.1f}M, "
+          f"student {report['student_parameters'] / 1e6:.1f}M")
+    print(f"RTF: teacher {_fmt(report['teacher_rtf'], '.3f')}, student {_fmt(report['student_rtf'], '.3f')} "
+          f"({_fmt(report['speedup'], '.2f')}x faster)")
+    print(f"Against the teacher: mel L1 {_fmt(report['mel_l1_db'], '.2f')} dB, MCD {_fmt(report['mcd_db'], '.2f')} dB, "
+          f"duration error {_fmt(report['duration_error_frames'], '.2f')} frames/token")
+    return report
+
+
+def report_student(student_checkpoint, teacher_checkpoint, texts, threads=None):
+    """Load a trained student (config.json of its run folder) and compare it to the teacher"""
+    from TTS.config import load_config
+    from TTS.tts.models.vits import Vits
+
+    if threads:
+        torch.set_num_threads(threads)
+    config = load_config(os.path.join(os.path.dirname(student_checkpoint), "config.json"))
+    student = Vits.init_from_config(config)
+    load_pretrained_weights(student, student_checkpoint)
+    student.eval()
+    teacher = build_teacher(teacher_checkpoint, pretrained_config(teacher_checkpoint))
+    report = compare(student, teacher, texts)
+    report.update(student_checkpoint=student_checkpoint, teacher_checkpoint=teacher_checkpoint)
+    with open(os.path.join(os.path.dirname(student_checkpoint), REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(training_config, options):
+    teacher_checkpoint = resolve_checkpoint(options.teacher)
+    config = student_config(teacher_checkpoint, training_config, options.preset)
+    ap = AudioProcessor.init_from_config(config)
+    tokenizer, config = TTSTokenizer.init_from_config(config)
+    use_packed_phonemes(config.phoneme_cache_path)
+
+    train_samples, eval_samples = split_samples(config)
+    cache_dir = os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(teacher_checkpoint))[0])
+    teacher_config = pretrained_config(teacher_checkpoint)
+    # Student and teacher see the same text; the student learns to reproduce the teacher's audio
+    train_samples = build_teacher_cache(train_samples, teacher_checkpoint, teacher_config, cache_dir,
+                                        not options.no_latents, options.cache_workers)
+    eval_samples = build_teacher_cache(eval_samples, teacher_checkpoint, teacher_config, cache_dir,
+                                       not options.no_latents, options.cache_workers)
+    if options.cache_only:
+        return
+
+    model = DistillVits(config, ap, tokenizer, speaker_manager=None)
+    init_from_teacher(model, teacher_checkpoint)
+    model.teacher_cache = cache_dir
+    model.duration_weight = options.duration_weight
+    model.latent_weight = 0.0 if options.no_latents else options.latent_weight
+    print(f"Student ({options.preset}): {generator_parameters(model) / 1e6:.1f}M generator parameters")
+
+    trainer = AsyncCheckpointTrainer(
+        TrainerArgs(),
+        config,
+        config.output_path,
+        model=model,
+        train_samples=train_samples,
+        eval_samples=eval_samples,
+        keep_best=options.keep_best,
+    )
+    trainer.fit()
+
+    latest = latest_checkpoint(trainer.output_path)
+    if latest is not None:
+        texts = [s["text"] for s in eval_samples[:options.report_sentences]]
+        report_student(latest[1], teacher_checkpoint, texts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill a pretrained VITS voice into a smaller, faster student")
+    parser.add_argument("--teacher", default="hi-female", help=f"Teacher checkpoint ({', '.join(PRETRAINED)} or a path)")
+    parser.add_argument("--preset", choices=sorted(STUDENT_PRESETS), default="small", help="Student size")
+    parser.add_argument("--no_latents", action="store_true",
+                        help="Skip caching and matching the teacher's posterior latents (saves disk)")
+    parser.add_argument("--duration_weight", type=float, default=1.0)
+    parser.add_argument("--latent_weight", type=float, default=1.0)
+    parser.add_argument("--cache_workers", type=int, default=None,
+                        help="Processes synthesizing the teacher cache (default: all cores)")
+    parser.add_argument("--cache_only", action="store_true",
+                        help="Only synthesize the teacher cache (also usable as a train_vits.py --speakers dataset)")
+    parser.add_argument("--keep_best", type=int, default=1)
+    parser.add_argument("--report", default=None, metavar="STUDENT_CHECKPOINT",
+                        help="Only compare a trained student to the teacher, no training")
+    parser.add_argument("--report_sentences", type=int, default=20, help="Eval sentences used for the report")
+    parser.add_argument("--texts", default=None, help="Text file (one sentence per line) for --report")
+    options, sys.argv[1:] = parser.parse_known_args()
+
+    from train_vits import config as training_config
+
+    if options.report:
+        if options.texts:
+            with open(options.texts, "r", encoding="utf-8") as f:
+                texts = [line.strip() for line in f if line.strip()][:options.report_sentences]
+        else:
+            texts = [s["text"] for s in split_samples(training_config)[1][:options.report_sentences]]
+        report_student(options.report, resolve_checkpoint(options.teacher), texts)
+    else:
+        main(training_config, options)
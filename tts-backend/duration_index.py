@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import random
+import time
+
+import soundfile as sf
+
+from build_phoneme_cache import cache_file_name
+from feature_store import feature_key
+from phoneme_store import STORE_DIR, SUFFIX, PhonemeStore
+
+INDEX_NAME = "duration_index.json"
+
+
+def load_duration_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def build_duration_index(samples, index_path, phoneme_store=None):
+    """Record samples, sample rate and token length per clip from file headers only
+
+    Entries are keyed like the feature store (absolute path) and reused while the
+    file size and mtime are unchanged.
+    """
+    index = load_duration_index(index_path)
+    updated = 0
+    for sample in samples:
+        key = feature_key(sample["audio_file"])
+        st = os.stat(key)
+        entry = index.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            continue
+        info = sf.info(key)
+        tokens = None
+        if phoneme_store is not None and "audio_unique_name" in sample:
+            ids = phoneme_store.get(cache_file_name(sample["audio_unique_name"])[:-len(SUFFIX)])
+            tokens = None if ids is None else len(ids)
+        index[key] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "samples": info.frames,
+            "sample_rate": info.samplerate,
+            "duration": info.frames / info.samplerate,
+            # Character count stands in when phonemes haven't been packed yet
+            "tokens": tokens if tokens is not None else len(sample["text"].strip()),
+        }
+        updated += 1
+
+    if updated:
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+    return index, updated
+
+
+def sample_frames(samples, index, hop_length):
+    """Spectrogram frame count per sample, estimated from file size (16-bit PCM) if unindexed"""
+    frames = []
+    for sample in samples:
+        entry = index.get(feature_key(sample["audio_file"]))
+        n_samples = entry["samples"] if entry else os.path.getsize(sample["audio_file"]) // 2
+        frames.append(max(1, n_samples // hop_length))
+    return frames
+
+
+class FrameBudgetBatchSampler:
+    """Batch sampler grouping clips of similar length under a padded-frames budget
+
+    Batches are cut from length-sorted indices so that batch_size * longest clip
+    stays within max_frames; the batch order (and ties within a length bucket) is
+    reshuffled every epoch.
+    """
+
+    def __init__(self, lengths, max_frames, max_batch_size=None, shuffle=True, seed=0):
+        self.lengths = lengths
+        self.max_frames = max_frames
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.batches = self._make_batches(random.Random(seed))
+
+    def _make_batches(self, rng):
+        order = list(range(len(self.lengths)))
+        # Shuffle before the stable sort so equal-length clips land in different batches each epoch
+        rng.shuffle(order)
+        order.sort(key=lambda i: self.lengths[i])
+
+        batches, batch, longest = [], [], 0
+        for i in order:
+            longest_if_added = max(longest, self.lengths[i])
+            full = self.max_batch_size is not None and len(batch) >= self.max_batch_size
+            if batch and (longest_if_added * (len(batch) + 1) > self.max_frames or full):
+                batches.append(batch)
+                batch, longest_if_added = [], self.lengths[i]
+            batch.append(i)
+            longest = longest_if_added
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def padding_ratio(self, batches=None):
+        """Fraction of frames in the padded batches that are padding"""
+        batches = batches if batches is not None else self.batches
+        padded = sum(max(self.lengths[i] for i in b) * len(b) for b in batches)
+        real = sum(self.lengths[i] for b in batches for i in b)
+        return 1 - real / padded if padded else 0.0
+
+    def __iter__(self):
+        if self.shuffle:
+            rng = random.Random(self.seed + self.epoch)
+            self.batches = self._make_batches(rng)
+            rng.shuffle(self.batches)
+        self.epoch += 1
+        return iter([list(b) for b in self.batches])
+
+    def __len__(self):
+        return len(self.batches)
+
+
+def fixed_batch_padding(lengths, batch_size):
+    """Padding ratio of consecutive fixed-size batches, for comparison"""
+    batches = [list(range(i, min(i + batch_size, len(lengths)))) for i in range(0, len(lengths), batch_size)]
+    padded = sum(max(lengths[i] for i in b) * len(b) for b in batches)
+    return 1 - sum(lengths) / padded if padded else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index clip durations/token lengths from WAV headers")
+    parser.add_argument("--max_frames", type=int, default=None,
+                        help="Also report batches and padding for this frames-per-batch budget")
+    args = parser.parse_args()
+
+    from TTS.tts.datasets import load_tts_samples
+    from train_vits import config
+
+    samples, _ = load_tts_samples(config.datasets, eval_split=False)
+    store_path = os.path.join(config.phoneme_cache_path, STORE_DIR)
+    store = PhonemeStore(store_path) if os.path.exists(os.path.join(store_path, "keys.json")) else None
+    index_path = os.path.join(config.datasets[0].path, INDEX_NAME)
+
+    start = time.perf_counter()
+    index, updated = build_duration_index(samples, index_path, store)
+    total = sum(index[feature_key(s["audio_file"])]["duration"] for s in samples)
+    print(f"✅ {len(samples)} clips ({total / 3600:.2f} h), {updated} re-read, in {time.perf_counter() - start:.1f}s")
+    print(f"Index: {index_path}")
+
+    if args.max_frames:
+        lengths = sample_frames(samples, index, config.audio.hop_length)
+        sampler = FrameBudgetBatchSampler(lengths, args.max_frames)
+        print(f"{len(sampler)} batches, padding {sampler.padding_ratio():.1%} "
+              f"(vs {fixed_batch_padding(lengths, config.batch_size):.1%} with batch_size={config.batch_size} unsorted)")
@@ -0,0 +1,201 @@
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+from azure_client import AzureTTSClient, load_manifest, percentile
+
+DEFAULT_POLICY = {
+    # Route to the preferred engine while its estimated latency stays under this (seconds)
+    "latency_target": 8.0,
+    # Engines failing more often than this over the window are avoided
+    "max_error_rate": 0.2,
+    # Number of recent requests per engine used for p95 and error rate
+    "window": 50,
+    "default_engine": "azure",
+    # Concurrent requests per engine; VITS inference is CPU-bound so it runs one at a time
+    "concurrency": {"vits": 1, "azure": 8},
+    # Latency assumed for an engine until it has served a request
+    "prior_latency": {"vits": 6.0, "azure": 1.5},
+    # Retry a failed routable request once on the other engine
+    "fallback": True,
+}
+
+
+class EngineStats:
+    """Sliding-window latency/error statistics and live queue depth for one engine"""
+
+    def __init__(self, window, prior_latency):
+        self.samples = deque(maxlen=window)
+        self.prior_latency = prior_latency
+        self.queued = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self):
+        with self._lock:
+            self.queued += 1
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.queued -= 1
+            self.samples.append((latency, ok))
+
+    def p95(self):
+        with self._lock:
+            latencies = [latency for latency, ok in self.samples if ok]
+        return percentile(latencies, 95) or self.prior_latency
+
+    def error_rate(self):
+        with self._lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def snapshot(self):
+        return {"queued": self.queued, "p95": self.p95(), "error_rate": self.error_rate(),
+                "served": len(self.samples)}
+
+
+def build_ssml(text, voice, language="en-US"):
+    """Wrap plain text in minimal SSML for Azure"""
+    return (f"<speak version='1.0' xml:lang={quoteattr(language)}>"
+            f"<voice name={quoteattr(voice)}>{escape(text)}</voice></speak>")
+
+
+def merge_policy(defaults, overrides):
+    """Overlay a policy on the defaults, merging per-engine tables key by key"""
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(defaults.get(key), dict):
+            value = dict(defaults[key], **value)
+        merged[key] = value
+    return merged
+
+
+class EngineRouter:
+    """Send each request to the engine most likely to meet the latency target"""
+
+    def __init__(self, engines, policy=None):
+        self.engines = engines
+        self.policy = merge_policy(DEFAULT_POLICY, policy or {})
+        self.stats = {
+            name: EngineStats(self.policy["window"], self.policy["prior_latency"].get(name, 1.0))
+            for name in engines
+        }
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=self.policy["concurrency"].get(name, 1))
+            for name in engines
+        }
+
+    def estimated_latency(self, name):
+        """p95 scaled by how many queue rounds a new request waits behind"""
+        stats = self.stats[name]
+        concurrency = self.policy["concurrency"].get(name, 1)
+        return stats.p95() * (1 + stats.queued // concurrency)
+
+    def choose(self, request):
+        """Pick an engine for a request; non-routable requests keep their engine"""
+        preferred = request.get("engine", self.policy["default_engine"])
+        if not request.get("routable"):
+            return preferred
+
+        healthy = [name for name in self.engines
+                   if self.stats[name].error_rate() <= self.policy["max_error_rate"]]
+        candidates = healthy or list(self.engines)
+        if preferred in candidates and self.estimated_latency(preferred) <= self.policy["latency_target"]:
+            return preferred
+        return min(candidates, key=self.estimated_latency)
+
+    def _run(self, name, request):
+        stats = self.stats[name]
+        start = time.perf_counter()
+        try:
+            result = self.engines[name](request)
+        except Exception:
+            stats.record(time.perf_counter() - start, False)
+            raise
+        stats.record(time.perf_counter() - start, True)
+        return result
+
+    def route(self, request):
+        """Synthesize a request synchronously and return (engine, result)"""
+        name = self.choose(request)
+        self.stats[name].enqueue()
+        try:
+            return name, self.pools[name].submit(self._run, name, request).result()
+        except Exception:
+            others = [other for other in self.engines if other != name]
+            if not (request.get("routable") and self.policy["fallback"] and others):
+                raise
+            fallback = min(others, key=self.estimated_latency)
+            self.stats[fallback].enqueue()
+            return fallback, self.pools[fallback].submit(self._run, fallback, request).result()
+
+    def snapshot(self):
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+
+
+def vits_engine(request):
+    """Adapter for run_vits_inference.generate_voice"""
+    # Imported lazily so Azure-only routers never load Coqui TTS
+    from run_vits_inference import generate_voice
+    generate_voice(request["text"], request["output"], request.get("vits_speaker", "p225"),
+                   request.get("language", "en"))
+    return request["output"]
+
+
+def azure_engine_for(client):
+    """Adapter for AzureTTSClient; WAV outputs request PCM so both engines produce the same container"""
+    def azure_engine(request):
+        ssml = request.get("ssml") or build_ssml(request["text"], request["azure_voice"],
+                                                 request.get("azure_language", "en-US"))
+        output_format = "riff-22050hz-16bit-mono-pcm" if request["output"].endswith(".wav") else None
+        client.synthesize(ssml, request["output"], output_format)
+        return request["output"]
+    return azure_engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render requests through the latency-aware engine router")
+    parser.add_argument("--manifest", required=True,
+                        help="JSON/JSONL of {text, output, routable, engine, vits_speaker, azure_voice} requests")
+    parser.add_argument("--policy", help="JSON file overriding DEFAULT_POLICY keys; per-engine tables merge with the defaults")
+    parser.add_argument("--endpoint", help="Override the Azure synthesis endpoint")
+    args = parser.parse_args()
+
+    policy = None
+    if args.policy:
+        with open(args.policy, "r", encoding="utf-8") as f:
+            policy = json.load(f)
+
+    requests_list = load_manifest(args.manifest)
+    client = AzureTTSClient(endpoint=args.endpoint)
+    router = EngineRouter({"vits": vits_engine, "azure": azure_engine_for(client)}, policy)
+
+    def handle(request):
+        try:
+            engine, _ = router.route(request)
+            return engine, None
+        except Exception as e:
+            return None, f"{request['output']}: {e}"
+
+    # Dispatch from enough threads to keep every engine's pool busy
+    with ThreadPoolExecutor(max_workers=sum(router.policy["concurrency"].values())) as dispatch:
+        results = list(dispatch.map(handle, requests_list))
+    router.close()
+    client.close()
+
+    for engine in router.engines:
+        count = sum(1 for name, _ in results if name == engine)
+        stats = router.stats[engine].snapshot()
+        print(f"✅ {engine}: {count} requests, p95 {stats['p95']:.2f}s, error rate {stats['error_rate']:.1%}")
+    for _, error in results:
+        if error:
+            print(f"❌ {error}")
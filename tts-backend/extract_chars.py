@@ -1,6 +1,197 @@
 # extract_chars.py
-with open("workspace/tts-dataset/metadata.csv", encoding="utf-8") as f:
-    lines = f.readlines()
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
 
-chars = sorted(set("".join([line.strip().split("|")[-1] for line in lines])))
-print("".join(chars))
+METADATA = "workspace/tts-dataset/metadata.csv"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocab_cache")
+
+_tokenizer = None
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_texts(path, column=-1):
+    """Yield (line number, text) one line at a time; lines without the column are skipped"""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            cols = line.strip().split("|")
+            if not cols[0] or not -len(cols) <= column < len(cols):
+                continue
+            yield number, cols[column]
+
+
+def _count(counts, first_seen, number, text):
+    counts.update(text)
+    for char in set(text) - first_seen.keys():
+        first_seen[char] = number
+
+
+def count_chars(path, column=-1):
+    """Raw character counts and the first line each character appears on"""
+    counts, first_seen = Counter(), {}
+    for number, text in iter_texts(path, column):
+        _count(counts, first_seen, number, text)
+    return counts, first_seen
+
+
+def config_from_dict(config_dict):
+    """Coqui config object for a saved config dict (config.json or checkpoint["config"])"""
+    from TTS.config import register_config
+
+    config = register_config(config_dict["model"].lower())()
+    config.from_dict(config_dict)
+    return config
+
+
+def _init_worker(config_dict):
+    global _tokenizer
+    from TTS.tts.utils.text.tokenizer import TTSTokenizer
+
+    _tokenizer, _ = TTSTokenizer.init_from_config(config_from_dict(config_dict))
+
+
+def _tokenizer_input(job):
+    """The symbol string the tokenizer encodes: cleaned text, phonemized when the model uses phonemes"""
+    number, text = job
+    if _tokenizer.text_cleaner is not None:
+        text = _tokenizer.text_cleaner(text)
+    if _tokenizer.use_phonemes:
+        text = _tokenizer.phonemizer.phonemize(text, separator="")
+    return number, text
+
+
+def count_tokens(path, config, column=-1, workers=None, chunksize=64):
+    """Counts of the symbols the model's tokenizer would see, streamed through worker processes"""
+    counts, first_seen = Counter(), {}
+    lines = iter_texts(path, column)
+    with Pool(workers, initializer=_init_worker, initargs=(config.to_dict(),)) as pool:
+        # Pool.imap drains its input eagerly, so feed it a bounded window at a time
+        while True:
+            window = list(islice(lines, chunksize * 64))
+            if not window:
+                break
+            for number, text in pool.imap(_tokenizer_input, window, chunksize):
+                _count(counts, first_seen, number, text)
+    return counts, first_seen
+
+
+def cached(kind, path, key_parts, compute, cache_dir=CACHE_DIR):
+    """compute() for path, reusing a result stored under the file's content hash and key_parts"""
+    key = hashlib.sha1(json.dumps([kind, file_hash(path), *key_parts], default=str).encode("utf-8")).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{kind}-{key}.json") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        return Counter(saved["counts"]), saved["first_seen"]
+
+    counts, first_seen = compute()
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"file": os.path.abspath(path), "counts": counts, "first_seen": first_seen}, f,
+                      ensure_ascii=False)
+        os.replace(cache_path + ".tmp", cache_path)
+    return counts, first_seen
+
+
+def load_model_config(model=None, config_path=None, checkpoint=None):
+    """Config whose characters to check against: a training script's, a config.json or a checkpoint's"""
+    if checkpoint:
+        from checkpoint_reader import CheckpointReader
+
+        with CheckpointReader(checkpoint) as reader:
+            return config_from_dict(reader["config"])
+    if config_path:
+        from TTS.config import load_config
+
+        return load_config(config_path)
+    from build_phoneme_cache import load_training_config
+
+    return load_training_config(model)
+
+
+def vocabulary(config):
+    """Symbols the model's tokenizer can encode (fills in the default characters like training does)"""
+    from TTS.tts.utils.text.tokenizer import TTSTokenizer
+
+    tokenizer, config = TTSTokenizer.init_from_config(config)
+    return set(tokenizer.characters.vocab), config
+
+
+def check_vocabulary(paths, config, column=-1, workers=None, cache_dir=CACHE_DIR):
+    """Map of path -> (symbol counts, unsupported symbols) for each text file; symbols are phonemes when the config uses them"""
+    from build_phoneme_cache import tokenizer_signature
+
+    vocab, config = vocabulary(config)
+    signature = tokenizer_signature(config)
+    results = {}
+    for path in paths:
+        counts, first_seen = cached("tokens", path, [column, signature],
+                                    lambda: count_tokens(path, config, column, workers), cache_dir)
+        missing = {symbol: (counts[symbol], first_seen[symbol]) for symbol in counts if symbol not in vocab}
+        results[path] = counts, missing
+    return results, vocab
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Character inventory of metadata/text files, optionally checked against a model's vocabulary")
+    parser.add_argument("files", nargs="*", default=[METADATA], help=f"Metadata or text files (default: {METADATA})")
+    parser.add_argument("--column", type=int, default=-1,
+                        help="'|'-separated column holding the text; plain text lines are a single column")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--model", choices=["vits", "glowtts"], default=None,
+                        help="Check against the config defined in train_vits.py / train_glowtts.py")
+    source.add_argument("--config", default=None, help="Check against a config.json")
+    source.add_argument("--checkpoint", default=None, help="Check against the config stored in a checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="Tokenizer worker processes (default: all cores)")
+    parser.add_argument("--counts", action="store_true", help="Print every character with its count")
+    parser.add_argument("--no_cache", action="store_true", help=f"Recount instead of reusing {CACHE_DIR}")
+    args = parser.parse_args()
+    cache_dir = None if args.no_cache else CACHE_DIR
+
+    start = time.perf_counter()
+    total = Counter()
+    for path in args.files:
+        counts, _ = cached("chars", path, [args.column], lambda: count_chars(path, args.column), cache_dir)
+        total.update(counts)
+    print("".join(sorted(total)))
+    if args.counts:
+        for char, count in total.most_common():
+            print(f"{char!r:>8} {count}")
+
+    if not (args.model or args.config or args.checkpoint):
+        sys.exit(0)
+
+    config = load_model_config(args.model, args.config, args.checkpoint)
+    results, vocab = check_vocabulary(args.files, config, args.column, args.workers, cache_dir)
+    kind = "phonemes" if config.use_phonemes else "characters"
+    seen = Counter()
+    unsupported = 0
+    for path, (counts, missing) in results.items():
+        seen.update(counts)
+        unsupported += len(missing)
+        for symbol, (count, line) in sorted(missing.items(), key=lambda item: -item[1][0]):
+            print(f"❌ {path}: {symbol!r} not in the model's {kind} ({count}x, first on line {line})")
+    unused = sorted(symbol for symbol in vocab if len(symbol) == 1 and symbol not in seen)
+    print(f"{len(seen)} distinct {kind} in {sum(seen.values())} symbols, vocabulary of {len(vocab)} "
+          f"({time.perf_counter() - start:.1f}s)")
+    if unused:
+        print(f"Unused in this text: {''.join(unused)}")
+    if unsupported:
+        print(f"⚠️ {unsupported} unsupported {kind} would be dropped by the tokenizer")
+        sys.exit(1)
+    print(f"✅ Every {kind[:-1]} is in the model's vocabulary")
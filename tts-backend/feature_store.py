@@ -0,0 +1,268 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+STORE_VERSION = 1
+DEFAULT_SHARD_MB = 1024
+
+_audio_config = None
+
+
+def audio_config_dict(audio_config):
+    """The VitsAudioConfig fields that determine the spectrograms"""
+    return {
+        "version": STORE_VERSION,
+        "sample_rate": audio_config.sample_rate,
+        "fft_size": audio_config.fft_size,
+        "win_length": audio_config.win_length,
+        "hop_length": audio_config.hop_length,
+        "num_mels": audio_config.num_mels,
+        "mel_fmin": audio_config.mel_fmin,
+        "mel_fmax": audio_config.mel_fmax,
+    }
+
+
+def config_hash(audio_config):
+    payload = json.dumps(audio_config_dict(audio_config), sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def store_path_for(root, audio_config):
+    """Stores live in <root>/<config hash>, so a changed audio config never reads stale features"""
+    return os.path.join(root, config_hash(audio_config))
+
+
+def feature_key(audio_file):
+    return os.path.normpath(os.path.abspath(audio_file))
+
+
+def file_signature(path):
+    """[size, mtime_ns] of an audio file; a clip rewritten in place (preprocess_dataset.py) gets a new one"""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def is_current(entry, key):
+    """True if an index entry [shard, offset, frames, size, mtime_ns] still matches the file at key"""
+    if entry is None or len(entry) < 5:
+        return False
+    try:
+        return entry[3:] == file_signature(key)
+    except FileNotFoundError:
+        return False
+
+
+def compute_features(audio_file, ac):
+    """Linear and mel spectrograms for one file, computed exactly as Vits.format_batch_on_device does"""
+    import torch
+    from TTS.tts.models.vits import load_audio, spec_to_mel, wav_to_spec
+
+    wav, _ = load_audio(audio_file)
+    with torch.no_grad():
+        spec = wav_to_spec(wav[:1], ac.fft_size, ac.hop_length, ac.win_length, center=False)
+        mel = spec_to_mel(spec=spec, n_fft=ac.fft_size, num_mels=ac.num_mels, sample_rate=ac.sample_rate,
+                          fmin=ac.mel_fmin, fmax=ac.mel_fmax)
+    # Stored frame-major so one utterance is a contiguous run of rows
+    return spec[0].T.numpy().astype(np.float16), mel[0].T.numpy().astype(np.float16)
+
+
+def _init_worker(audio_config):
+    global _audio_config
+    import torch
+
+    # Processes already fan out over cores; keep each one single-threaded
+    torch.set_num_threads(1)
+    _audio_config = audio_config
+
+
+def _compute(audio_file):
+    # Taken before reading, so a file changed meanwhile is recomputed on the next build
+    signature = file_signature(audio_file)
+    spec, mel = compute_features(audio_file, _audio_config)
+    return audio_file, spec, mel, signature
+
+
+def _open_shard(path, shard, index):
+    """Open a shard's files for appending, dropping bytes a crashed run wrote past the index"""
+    files = []
+    for kind, bins in (("spec", index["spec_bins"]), ("mel", index["num_mels"])):
+        f = open(os.path.join(path, f"shard_{shard:03d}.{kind}"), "ab")
+        f.truncate(index["shards"][shard] * bins * 2)
+        files.append(f)
+    return files
+
+
+class FeatureStore:
+    """Sharded, memory-mapped float16 spectrogram store for one audio config"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self._shards = {}
+        # VitsDataset batches carry bare file names in "audio_files", which repeat across
+        # datasets; their "audio_unique_names" ("<dataset>#<relative path>") do not
+        self._by_name = self.index.get("names", {})
+
+    @classmethod
+    def open_for(cls, root, audio_config):
+        """Open the store matching audio_config, or return None if it hasn't been built"""
+        path = store_path_for(root, audio_config)
+        if not os.path.exists(os.path.join(path, "index.json")):
+            return None
+        return cls(path)
+
+    def __len__(self):
+        return len(self.index["items"])
+
+    def _entry(self, audio_file):
+        key = self._by_name.get(audio_file)
+        key = key if key is not None else feature_key(audio_file)
+        entry = self.index["items"].get(key)
+        # One stat per lookup; features of a clip changed since the build are a miss, not stale data
+        return entry if is_current(entry, key) else None
+
+    def __contains__(self, audio_file):
+        return self._entry(audio_file) is not None
+
+    def _shard(self, shard, kind):
+        key = (shard, kind)
+        if key not in self._shards:
+            bins = self.index["spec_bins"] if kind == "spec" else self.index["num_mels"]
+            frames = self.index["shards"][shard]
+            self._shards[key] = np.memmap(os.path.join(self.path, f"shard_{shard:03d}.{kind}"),
+                                          dtype=np.float16, mode="r", shape=(frames, bins))
+        return self._shards[key]
+
+    def get(self, audio_file):
+        """(spec, mel) frame-major float16 views for one file (path or audio_unique_name), or None"""
+        entry = self._entry(audio_file)
+        if entry is None:
+            return None
+        shard, offset, frames = entry[:3]
+        return (self._shard(shard, "spec")[offset:offset + frames],
+                self._shard(shard, "mel")[offset:offset + frames])
+
+    def load_batch(self, audio_files):
+        """Padded (spec [B, bins, T], mel [B, mels, T], lengths [B]) float32 arrays, or None on any miss"""
+        features = [self.get(audio_file) for audio_file in audio_files]
+        if any(feature is None for feature in features):
+            return None
+        return pad_features(features)
+
+
+def pad_features(features):
+    """Padded (spec [B, bins, T], mel [B, mels, T], lengths [B]) float32 from frame-major (spec, mel) pairs"""
+    lengths = np.array([spec.shape[0] for spec, _ in features], dtype=np.int32)
+    max_len = int(lengths.max())
+    spec = np.zeros((len(features), features[0][0].shape[1], max_len), dtype=np.float32)
+    mel = np.zeros((len(features), features[0][1].shape[1], max_len), dtype=np.float32)
+    for i, (s, m) in enumerate(features):
+        spec[i, :, :s.shape[0]] = s.T
+        mel[i, :, :m.shape[0]] = m.T
+    return spec, mel, lengths
+
+
+def _write_index(index_path, index):
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(index_path + ".tmp", index_path)
+
+
+def build_feature_store(samples, audio_config, root, workers=None, shard_mb=DEFAULT_SHARD_MB, prune=False):
+    """Compute features for samples missing from the store for audio_config"""
+    path = store_path_for(root, audio_config)
+    os.makedirs(path, exist_ok=True)
+    index_path = os.path.join(path, "index.json")
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    else:
+        index = {"config": audio_config_dict(audio_config), "spec_bins": audio_config.fft_size // 2 + 1,
+                 "num_mels": audio_config.num_mels, "shards": [], "items": {}, "names": {}}
+    names = index.setdefault("names", {})
+
+    if prune:
+        for name in os.listdir(root):
+            stale = os.path.join(root, name)
+            if stale != path and os.path.isdir(stale):
+                shutil.rmtree(stale)
+                print(f"Removed store for old audio config: {stale}")
+
+    todo = sorted(key for key in {feature_key(s["audio_file"]) for s in samples}
+                  if not is_current(index["items"].get(key), key))
+    print(f"Feature store: {path}")
+    print(f"{len(samples)} samples, {len(todo)} to compute")
+    # load_tts_samples gives every sample an audio_unique_name; training batches look features up by it
+    new_names = {s["audio_unique_name"]: feature_key(s["audio_file"]) for s in samples}
+    new_names = {name: key for name, key in new_names.items() if names.get(name) != key}
+    if not todo:
+        if new_names:
+            names.update(new_names)
+            _write_index(index_path, index)
+        return path
+
+    frame_bytes = 2 * (index["spec_bins"] + index["num_mels"])
+    shard_frames = max(1, shard_mb * 1024 * 1024 // frame_bytes)
+    if not index["shards"] or index["shards"][-1] >= shard_frames:
+        index["shards"].append(0)
+    shard = len(index["shards"]) - 1
+    spec_file, mel_file = _open_shard(path, shard, index)
+
+    start = time.perf_counter()
+    total_frames = 0
+    try:
+        with Pool(workers, initializer=_init_worker, initargs=(audio_config,)) as pool:
+            results = pool.imap_unordered(_compute, todo, chunksize=4)
+            for done, (audio_file, spec, mel, signature) in enumerate(results, 1):
+                if index["shards"][shard] >= shard_frames:
+                    spec_file.close()
+                    mel_file.close()
+                    index["shards"].append(0)
+                    shard += 1
+                    spec_file, mel_file = _open_shard(path, shard, index)
+                spec_file.write(spec.tobytes())
+                mel_file.write(mel.tobytes())
+                index["items"][audio_file] = [shard, index["shards"][shard], spec.shape[0], *signature]
+                index["shards"][shard] += spec.shape[0]
+                total_frames += spec.shape[0]
+                if done % 500 == 0:
+                    print(f"  {done}/{len(todo)} files")
+    finally:
+        spec_file.close()
+        mel_file.close()
+        # The index only ever points at bytes already flushed to the shards
+        names.update((name, key) for name, key in new_names.items() if key in index["items"])
+        _write_index(index_path, index)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Stored {len(todo)} files ({total_frames} frames) in {elapsed:.1f}s ({len(todo) / elapsed:.1f} files/s)")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute VITS linear/mel spectrograms for training")
+    parser.add_argument("--store_dir", help="Root of the hash-keyed stores (default: train_vits.FEATURE_STORE_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--shard_mb", type=int, default=DEFAULT_SHARD_MB)
+    parser.add_argument("--prune", action="store_true", help="Delete stores built for other audio configs")
+    parser.add_argument("--speakers", default="",
+                        help="Build for the per-speaker datasets of a multi-speaker run (same value as train_vits.py --speakers)")
+    args = parser.parse_args()
+
+    from TTS.tts.datasets import load_tts_samples
+    from train_vits import FEATURE_STORE_DIR, config, speaker_datasets
+
+    speakers = [entry for entry in args.speakers.split(",") if entry]
+    if speakers:
+        # Batches look features up by audio_unique_name, which carries the dataset (speaker) name
+        config.datasets = speaker_datasets(speakers)
+    samples, _ = load_tts_samples(config.datasets, eval_split=False)
+    build_feature_store(samples, config.audio, args.store_dir or FEATURE_STORE_DIR,
+                        args.workers, args.shard_mb, args.prune)
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import time
+
+import torch
+
+from build_phoneme_cache import tokenizer_signature
+from checkpoint_reader import CheckpointReader
+
+REPORT_NAME = "finetune_report.json"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRETRAINED = {
+    "hi-female": os.path.join(BASE_DIR, "tts_vits_coquiai_HindiFemale", "hi_female_vits_30hrs.pt"),
+    "hi-male": os.path.join(BASE_DIR, "tts_vits_coquiai_HindiMale", "hi_male_vits_30hrs.pt"),
+}
+
+# Freezable groups -> parameter name prefixes; any other dotted module path
+# (e.g. waveform_decoder.ups.0) is frozen as given
+FREEZE_GROUPS = {
+    "text_encoder": ("text_encoder.", "emb_l."),
+    "duration_predictor": ("duration_predictor.",),
+    "flow": ("flow.",),
+    "posterior_encoder": ("posterior_encoder.",),
+    "waveform_decoder": ("waveform_decoder.",),
+}
+# VitsArgs flags for the same groups; Vits._freeze_layers re-applies them at every epoch start
+FREEZE_FLAGS = {
+    "text_encoder": "freeze_encoder",
+    "duration_predictor": "freeze_DP",
+    "flow": "freeze_flow_decoder",
+    "posterior_encoder": "freeze_PE",
+    "waveform_decoder": "freeze_waveform_decoder",
+}
+# Fields taken from the training script's config; everything else (architecture, characters,
+# audio) must match the pretrained checkpoint and comes from its config. The phoneme cache
+# path is derived from the pretrained tokenizer instead (finetune_config)
+TRAINING_FIELDS = (
+    "datasets", "output_path", "batch_size", "eval_batch_size", "batch_group_size",
+    "num_loader_workers", "num_eval_loader_workers", "run_eval", "test_delay_epochs", "epochs", "print_step",
+    "print_eval", "mixed_precision", "precision", "cudnn_benchmark", "use_grad_scaler",
+)
+# Per-parameter state tensors each optimizer keeps (Coqui VITS uses AdamW)
+OPTIMIZER_STATE = {"AdamW": 2, "Adam": 2, "RAdam": 2, "SGD": 1}
+
+
+def resolve_checkpoint(name_or_path):
+    path = PRETRAINED.get(name_or_path, name_or_path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Pretrained checkpoint not found: {path}")
+    return path
+
+
+def pretrained_config(checkpoint_path):
+    """Config of a released model: config.json next to the checkpoint (as run_vits_inference.py finds it), else the one inside it"""
+    from TTS.config import load_config
+
+    from extract_chars import config_from_dict
+
+    config_path = os.path.join(os.path.dirname(checkpoint_path), "config.json")
+    if os.path.exists(config_path):
+        return load_config(config_path)
+    with CheckpointReader(checkpoint_path) as checkpoint:
+        return config_from_dict(checkpoint["config"])
+
+
+def finetune_config(checkpoint_path, training_config):
+    """The pretrained model's config with the data, run and loader settings of training_config"""
+    config = pretrained_config(checkpoint_path)
+    for field in TRAINING_FIELDS:
+        setattr(config, field, getattr(training_config, field))
+    # Cached token ids are only valid for the tokenizer that made them; the pretrained
+    # model's characters and cleaners get their own cache next to the training one
+    signature = hashlib.sha1(tokenizer_signature(config).encode("utf-8")).hexdigest()[:12]
+    config.phoneme_cache_path = f"{training_config.phoneme_cache_path.rstrip(os.sep)}_{signature}"
+    config.run_name = f"{training_config.run_name}_finetune_{os.path.splitext(os.path.basename(checkpoint_path))[0]}"
+    return config
+
+
+def load_matching_weights(model, checkpoint_path):
+    """Copy every checkpoint tensor whose name and shape the model shares; returns (copied, model total)"""
+    own = model.state_dict()
+    with CheckpointReader(checkpoint_path) as checkpoint:
+        refs = checkpoint.refs()
+        # Shapes come from the archive's index, so mismatched tensors are never read
+        matched = {k: ref.tensor() for k, ref in refs.items() if k in own and tuple(own[k].shape) == ref.shape}
+    model.load_state_dict(matched, strict=False)
+    return len(matched), len(own)
+
+
+def load_pretrained_weights(model, checkpoint_path):
+    """Load generator (and discriminator, when saved) weights; released models sometimes drop the discriminator"""
+    with CheckpointReader(checkpoint_path) as checkpoint:
+        weights = {k: ref.tensor() for k, ref in checkpoint.refs().items() if "speaker_encoder" not in k}
+    result = model.load_state_dict(weights, strict=False)
+    missing = [k for k in result.missing_keys if not k.startswith("disc.")]
+    if missing or result.unexpected_keys:
+        raise RuntimeError(f"Checkpoint does not match the model: {len(missing)} missing keys "
+                           f"(e.g. {missing[:3]}), {len(result.unexpected_keys)} unexpected "
+                           f"(e.g. {result.unexpected_keys[:3]})")
+    if result.missing_keys:
+        print(f"⚠️ No discriminator weights in {os.path.basename(checkpoint_path)}, training it from scratch")
+
+
+def freeze_prefixes(model, names):
+    prefixes = []
+    for name in names:
+        if name == "disc" or name.startswith("disc."):
+            raise ValueError("The discriminator cannot be frozen; its loss has nothing else to train")
+        group = FREEZE_GROUPS.get(name, (name.rstrip(".") + ".",))
+        if not any(k.startswith(group) for k, _ in model.named_parameters()):
+            raise ValueError(f"No parameters under '{name}' (groups: {', '.join(FREEZE_GROUPS)})")
+        prefixes.extend(group)
+    return tuple(prefixes)
+
+
+def freeze(model, names):
+    """Stop gradients for the named modules; returns the frozen parameter count"""
+    prefixes = freeze_prefixes(model, names)
+    frozen = 0
+    for name, param in model.named_parameters():
+        if name.startswith(prefixes):
+            param.requires_grad = False
+            frozen += param.numel()
+    for name in names:
+        if name in FREEZE_FLAGS:
+            setattr(model.args, FREEZE_FLAGS[name], True)
+    trainable = sum(p.numel() for k, p in model.named_parameters() if p.requires_grad and not k.startswith("disc."))
+    if not trainable:
+        raise ValueError("Every generator parameter is frozen, nothing left to fine-tune")
+    return frozen
+
+
+def trainable_only(optimizers):
+    """Drop frozen parameters from the optimizers' groups so they get no state and no step"""
+    for optimizer in optimizers if isinstance(optimizers, (list, tuple)) else [optimizers]:
+        for group in optimizer.param_groups:
+            group["params"] = [p for p in group["params"] if p.requires_grad]
+    return optimizers
+
+
+def memory_saved(model, optimizer_name):
+    """Bytes of gradients and optimizer state the frozen parameters no longer need"""
+    frozen = sum(p.numel() * p.element_size() for p in model.parameters() if not p.requires_grad)
+    return frozen * (1 + OPTIMIZER_STATE.get(optimizer_name, 2))
+
+
+def time_train_steps(model, batch, steps=3):
+    """Median seconds of one training step's forward and backward passes (all optimizers) on batch"""
+    criterion = model.get_criterion()
+    model.train()
+    times = []
+    for _ in range(steps + 1):
+        start = time.perf_counter()
+        for idx in range(len(criterion)) if isinstance(criterion, list) else [None]:
+            if idx is None:
+                _, loss_dict = model.train_step(batch, criterion)
+            else:
+                _, loss_dict = model.train_step(batch, criterion, idx)
+            loss_dict["loss"].backward()
+        times.append(time.perf_counter() - start)
+        model.zero_grad(set_to_none=True)
+    # The first pass warms up allocators and kernels
+    return sorted(times[1:])[len(times[1:]) // 2]
+
+
+def first_batch(model, config, samples):
+    loader = model.get_data_loader(config=config, assets={}, is_eval=False, samples=samples, verbose=False,
+                                   num_gpus=0)
+    batch = next(iter(loader))
+    batch = model.format_batch(batch)
+    return model.format_batch_on_device(batch)
+
+
+def setup_finetune(model, config, checkpoint_path, names, train_samples=None, benchmark_steps=0, partial=False):
+    """Load pretrained weights and freeze the named modules, optionally timing a step before and after
+
+    partial loads only the tensors whose shapes match, for a model that extends the
+    pretrained one (e.g. a speaker embedding on top of a single-speaker voice).
+    """
+    if partial:
+        copied, own = load_matching_weights(model, checkpoint_path)
+        print(f"Loaded {copied} of {own} tensors from {os.path.basename(checkpoint_path)}, the rest start fresh")
+    else:
+        load_pretrained_weights(model, checkpoint_path)
+    total = sum(p.numel() for p in model.parameters())
+    # A handful of samples is enough for one batch and keeps the dataset setup cheap
+    batch = first_batch(model, config, train_samples[:config.batch_size]) if benchmark_steps and train_samples else None
+    before = time_train_steps(model, batch, benchmark_steps) if batch is not None else None
+
+    frozen = freeze(model, names) if names else 0
+    saved = memory_saved(model, config.optimizer)
+    report = {
+        "checkpoint": checkpoint_path,
+        "frozen": list(names),
+        "parameters": total,
+        "frozen_parameters": frozen,
+        "memory_saved_bytes": saved,
+    }
+    print(f"Fine-tuning from {checkpoint_path}")
+    print(f"Frozen: {', '.join(names) or 'nothing'} ({frozen / 1e6:.1f}M of {total / 1e6:.1f}M parameters), "
+          f"{saved / 2 ** 20:.0f} MB of gradients and optimizer state saved")
+    if batch is not None:
+        after = time_train_steps(model, batch, benchmark_steps)
+        report.update(step_time_full=before, step_time_frozen=after, speedup=before / after)
+        print(f"Step time on one batch: {before * 1000:.0f} ms -> {after * 1000:.0f} ms ({before / after:.2f}x)")
+    return report
+
+
+def write_report(report, output_path):
+    with open(os.path.join(output_path, REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
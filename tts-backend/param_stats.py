@@ -0,0 +1,139 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from checkpoint_reader import CheckpointReader, TensorRef
+
+# Component -> parameter name prefixes of Coqui's Vits; anything else lands in "other"
+COMPONENTS = {
+    "text_encoder": ("text_encoder.", "emb_l."),
+    "duration_predictor": ("duration_predictor.",),
+    "flow": ("flow.",),
+    "posterior_encoder": ("posterior_encoder.",),
+    "decoder": ("waveform_decoder.",),
+    "discriminator": ("disc.",),
+    "speaker_embedding": ("emb_g.", "speaker_encoder."),
+}
+CHUNK = 1 << 22  # elements per float64 block, so memory stays bounded for any tensor size
+SUMS = ("numel", "sum", "sumsq", "zeros", "nans", "infs")
+
+
+def _as_array(value):
+    """Flat numpy view of a TensorRef, torch tensor or array"""
+    if isinstance(value, TensorRef):
+        return value.numpy().reshape(-1)
+    if hasattr(value, "detach"):
+        value = value.detach().cpu()
+        return (value.float() if value.is_floating_point() else value).numpy().reshape(-1)
+    return np.asarray(value).reshape(-1)
+
+
+def _accumulate(array):
+    """Raw sums and extremes of one tensor, visiting each element once"""
+    acc = {key: 0 for key in SUMS}
+    acc.update(min=np.inf, max=-np.inf, abs_max=0.0)
+    acc["numel"] = array.size
+    for start in range(0, array.size, CHUNK):
+        block = array[start:start + CHUNK].astype(np.float64)
+        finite = np.isfinite(block)
+        bad = block.size - np.count_nonzero(finite)
+        if bad:
+            nans = int(np.count_nonzero(np.isnan(block)))
+            acc["nans"] += nans
+            acc["infs"] += bad - nans
+            block = block[finite]
+        if not block.size:
+            continue
+        acc["sum"] += block.sum()
+        acc["sumsq"] += np.dot(block, block)
+        acc["zeros"] += block.size - np.count_nonzero(block)
+        low, high = block.min(), block.max()
+        acc["min"] = min(acc["min"], low)
+        acc["max"] = max(acc["max"], high)
+        acc["abs_max"] = max(acc["abs_max"], -low, high)
+    return acc
+
+
+def _merge(total, acc):
+    for key in SUMS:
+        total[key] += acc[key]
+    total["min"] = min(total["min"], acc["min"])
+    total["max"] = max(total["max"], acc["max"])
+    total["abs_max"] = max(total["abs_max"], acc["abs_max"])
+    total["tensors"] += 1
+
+
+def _finish(acc):
+    """Moments and norm from the raw sums; std is unbiased like torch.std"""
+    finite = acc["numel"] - acc["nans"] - acc["infs"]
+    mean = acc["sum"] / finite if finite else float("nan")
+    var = (acc["sumsq"] - finite * mean * mean) / (finite - 1) if finite > 1 else float("nan")
+    stats = {
+        "numel": int(acc["numel"]),
+        "mean": float(mean),
+        "std": float(np.sqrt(max(var, 0.0))) if finite > 1 else float("nan"),
+        "min": float(acc["min"]) if finite else float("nan"),
+        "max": float(acc["max"]) if finite else float("nan"),
+        "abs_max": float(acc["abs_max"]),
+        "l2": float(np.sqrt(acc["sumsq"])),
+        "zeros": int(acc["zeros"]),
+        "nans": int(acc["nans"]),
+        "infs": int(acc["infs"]),
+    }
+    if "tensors" in acc:
+        stats["tensors"] = acc["tensors"]
+    return stats
+
+
+def component(name):
+    for comp, prefixes in COMPONENTS.items():
+        if name.startswith(prefixes):
+            return comp
+    return "other"
+
+
+def parameter_stats(state_dict):
+    """Per-tensor, per-component and total statistics of a state dict in one pass over the weights
+
+    Values may be TensorRefs (CheckpointReader.refs(), nothing is read beyond the
+    weights themselves), torch tensors or arrays. Non-finite values are counted
+    and left out of the moments.
+    """
+    empty = {key: 0 for key in SUMS}
+    empty.update(min=np.inf, max=-np.inf, abs_max=0.0, tensors=0)
+    tensors, components, total = {}, {}, dict(empty)
+    for name, value in state_dict.items():
+        acc = _accumulate(_as_array(value))
+        tensors[name] = _finish(acc)
+        _merge(components.setdefault(component(name), dict(empty)), acc)
+        _merge(total, acc)
+    return {
+        "tensors": tensors,
+        "components": {comp: _finish(acc) for comp, acc in components.items()},
+        "total": _finish(total),
+    }
+
+
+def print_components(stats):
+    print(f"{'component':<20} {'params':>12} {'mean':>9} {'std':>9} {'abs max':>9} {'l2':>9} {'zeros':>7} {'nan/inf':>7}")
+    for comp, s in list(stats["components"].items()) + [("total", stats["total"])]:
+        print(f"{comp:<20} {s['numel']:>12,} {s['mean']:>9.4f} {s['std']:>9.4f} {s['abs_max']:>9.3f} "
+              f"{s['l2']:>9.2f} {s['zeros'] / max(s['numel'], 1):>6.1%} {s['nans'] + s['infs']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter statistics of a checkpoint, by component")
+    parser.add_argument("checkpoint")
+    parser.add_argument("--json", action="store_true", help="Print every tensor's statistics as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with CheckpointReader(args.checkpoint) as checkpoint:
+        stats = parameter_stats(checkpoint.refs())
+    if args.json:
+        print(json.dumps(stats, indent=1))
+    else:
+        print_components(stats)
+        print(f"{len(stats['tensors'])} tensors in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,119 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from build_phoneme_cache import load_manifest
+
+STORE_DIR = "packed"
+SUFFIX = "_phoneme.npy"
+
+
+class PhonemeStore:
+    """Read-only packed phoneme cache: one memory-mapped token file plus an offset index"""
+
+    def __init__(self, store_path):
+        with open(os.path.join(store_path, "keys.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.keys = meta["keys"]
+        self.digests = meta.get("digests", {})
+        self.offsets = np.load(os.path.join(store_path, "offsets.npy"))
+        self.tokens = np.memmap(os.path.join(store_path, "tokens.bin"), dtype=meta["dtype"], mode="r")
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def get(self, key):
+        """Token ids for a cache key (the file name without _phoneme.npy), or None"""
+        i = self.positions.get(key)
+        if i is None:
+            return None
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]].astype(np.int64)
+
+    def drop_stale(self, manifest):
+        """Forget entries whose text changed in the per-file cache since packing"""
+        for key in list(self.positions):
+            packed = self.digests.get(key + SUFFIX)
+            if packed is not None and manifest.get(key + SUFFIX, packed) != packed:
+                del self.positions[key]
+
+
+def pack_phoneme_cache(cache_path, store_path=None):
+    """Concatenate every <name>_phoneme.npy in cache_path into a packed store"""
+    store_path = store_path or os.path.join(cache_path, STORE_DIR)
+    os.makedirs(store_path, exist_ok=True)
+    files = sorted(glob.glob(os.path.join(cache_path, "*" + SUFFIX)))
+
+    arrays = [np.load(path) for path in files]
+    max_id = max((int(ids.max()) for ids in arrays if ids.size), default=0)
+    dtype = "uint16" if max_id < 2 ** 16 else "int32"
+
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([ids.size for ids in arrays], out=offsets[1:])
+    tokens_tmp = os.path.join(store_path, "tokens.bin.tmp")
+    with open(tokens_tmp, "wb") as f:
+        for ids in arrays:
+            f.write(ids.astype(dtype).tobytes())
+
+    keys = [os.path.basename(path)[:-len(SUFFIX)] for path in files]
+    manifest = load_manifest(cache_path)
+    meta = {
+        "dtype": dtype,
+        "keys": keys,
+        "digests": {key + SUFFIX: manifest[key + SUFFIX] for key in keys if key + SUFFIX in manifest},
+    }
+
+    offsets_tmp = os.path.join(store_path, "offsets.tmp.npy")
+    np.save(offsets_tmp, offsets)
+    keys_tmp = os.path.join(store_path, "keys.json.tmp")
+    with open(keys_tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tokens_tmp, os.path.join(store_path, "tokens.bin"))
+    os.replace(offsets_tmp, os.path.join(store_path, "offsets.npy"))
+    os.replace(keys_tmp, os.path.join(store_path, "keys.json"))
+    return store_path, len(keys), int(offsets[-1])
+
+
+def use_packed_phonemes(cache_path, store_path=None):
+    """Serve Coqui's phoneme cache lookups from the packed store when one exists
+
+    Rows missing from the store, or re-phonemized by build_phoneme_cache.py since
+    packing, fall through to the regular per-file cache.
+    """
+    store_path = store_path or os.path.join(cache_path, STORE_DIR)
+    if not os.path.exists(os.path.join(store_path, "keys.json")):
+        return None
+
+    from TTS.tts.datasets.dataset import PhonemeDataset
+
+    store = PhonemeStore(store_path)
+    store.drop_stale(load_manifest(cache_path))
+    compute_or_load = PhonemeDataset.compute_or_load
+
+    def compute_or_load_packed(self, file_name, text, language):
+        ids = store.get(file_name)
+        if ids is None:
+            return compute_or_load(self, file_name, text, language)
+        return ids
+
+    PhonemeDataset.compute_or_load = compute_or_load_packed
+    print(f"Using packed phoneme store {store_path} ({len(store.positions)} entries)")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack the per-utterance phoneme cache into one memory-mapped store")
+    parser.add_argument("--cache_dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "phoneme_cache"))
+    parser.add_argument("--store_dir", help=f"Output directory (default: <cache_dir>/{STORE_DIR})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store_path, count, tokens = pack_phoneme_cache(args.cache_dir, args.store_dir)
+    print(f"✅ Packed {count} utterances ({tokens} tokens) into {store_path} in {time.perf_counter() - start:.1f}s")
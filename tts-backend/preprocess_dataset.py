@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+DATASET_PATH = "./workspace/tts-dataset"
+OUTPUT_PATH = "./workspace/tts-dataset-clean"
+MANIFEST_NAME = "preprocess_manifest.json"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def params_hash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def process_clip(source, output, params):
+    """Resample, trim, loudness-normalize and write one clip; returns its manifest entry"""
+    import librosa
+    import soundfile as sf
+
+    y, sr = sf.read(source, dtype="float32", always_2d=True)
+    y = y.mean(axis=1)
+    entry = {
+        "source_sha256": file_sha256(source),
+        "source_sample_rate": sr,
+        # Samples at full scale in the source mean the recording itself clipped
+        "clipped_ratio": float(np.mean(np.abs(y) >= params["clip_threshold"])),
+    }
+
+    if sr != params["sample_rate"]:
+        y = librosa.resample(y, orig_sr=sr, target_sr=params["sample_rate"])
+    _, (start, end) = librosa.effects.trim(y, top_db=params["top_db"])
+    pad = int(params["pad_ms"] * params["sample_rate"] / 1000)
+    untrimmed = len(y)
+    y = y[max(0, start - pad):min(len(y), end + pad)]
+
+    rms = float(np.sqrt(np.mean(np.square(y, dtype=np.float64)))) if len(y) else 0.0
+    gain_db = params["target_dbfs"] - 20 * np.log10(rms) if rms > 0 else 0.0
+    y = y * 10 ** (gain_db / 20)
+    # Never let normalization push peaks past the ceiling
+    peak = float(np.max(np.abs(y))) if len(y) else 0.0
+    ceiling = 10 ** (params["peak_dbfs"] / 20)
+    if peak > ceiling:
+        gain_db -= 20 * np.log10(peak / ceiling)
+        y = y * (ceiling / peak)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    tmp_output = output + ".tmp.wav"
+    sf.write(tmp_output, y, params["sample_rate"], subtype="PCM_16")
+    os.replace(tmp_output, output)
+
+    st = os.stat(source)
+    entry.update({
+        "source_size": st.st_size,
+        "source_mtime": st.st_mtime_ns,
+        "output_sha256": file_sha256(output),
+        "duration": len(y) / params["sample_rate"],
+        "trimmed_seconds": (untrimmed - len(y)) / params["sample_rate"],
+        "gain_db": float(gain_db),
+        "peak": float(np.max(np.abs(y))) if len(y) else 0.0,
+    })
+    return entry
+
+
+def load_manifest(output_path):
+    try:
+        with open(os.path.join(output_path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"params_hash": None, "files": {}}
+
+
+def is_current(entry, source):
+    """True if the source matches what was processed last time (size/mtime, else checksum)"""
+    if entry is None:
+        return False
+    st = os.stat(source)
+    if entry["source_size"] == st.st_size and entry["source_mtime"] == st.st_mtime_ns:
+        return True
+    if entry["source_size"] == st.st_size and entry["source_sha256"] == file_sha256(source):
+        # Touched but unchanged; remember the new mtime so the checksum isn't needed next time
+        entry["source_mtime"] = st.st_mtime_ns
+        return True
+    return False
+
+
+def discard_clip(manifest, name, output):
+    """Forget a clip and delete its clean copy, so a stale version is never listed"""
+    manifest["files"].pop(name, None)
+    for path in (output, output + ".tmp.wav"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def preprocess_dataset(dataset_path, output_path, params, workers=None, meta_file="metadata.csv"):
+    """Process every clip listed in the metadata file, skipping ones unchanged since the last run"""
+    manifest = load_manifest(output_path)
+    current_params = params_hash(params)
+    if manifest["params_hash"] != current_params:
+        # Different settings invalidate every clean copy
+        manifest = {"params_hash": current_params, "params": params, "files": {}}
+
+    with open(os.path.join(dataset_path, meta_file), "r", encoding="utf-8") as f:
+        rows = [line for line in f if line.strip()]
+
+    jobs = {}
+    missing = 0
+    for row in rows:
+        name = row.split("|")[0]
+        source = os.path.join(dataset_path, "wavs", name + ".wav")
+        output = os.path.join(output_path, "wavs", name + ".wav")
+        if not os.path.exists(source):
+            print(f"❌ Missing audio for {name}")
+            discard_clip(manifest, name, output)
+            missing += 1
+            continue
+        if is_current(manifest["files"].get(name), source) and os.path.exists(output):
+            continue
+        jobs[name] = (source, output)
+
+    print(f"{len(rows)} clips, {len(rows) - len(jobs) - missing} up to date, {len(jobs)} to process"
+          + (f", {missing} missing" if missing else ""))
+    start = time.perf_counter()
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_clip, source, output, params): name for name, (source, output) in jobs.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                manifest["files"][name] = future.result()
+            except Exception as e:
+                failed.append(name)
+                print(f"❌ {name}: {e}")
+                discard_clip(manifest, name, jobs[name][1])
+            if done % 500 == 0:
+                print(f"  {done}/{len(jobs)} clips")
+
+    os.makedirs(output_path, exist_ok=True)
+    with open(os.path.join(output_path, MANIFEST_NAME + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(os.path.join(output_path, MANIFEST_NAME + ".tmp"), os.path.join(output_path, MANIFEST_NAME))
+
+    # Metadata for the clean copy lists only clips that made it through
+    with open(os.path.join(output_path, meta_file), "w", encoding="utf-8") as f:
+        for row in rows:
+            if row.split("|")[0] in manifest["files"]:
+                f.write(row if row.endswith("\n") else row + "\n")
+
+    elapsed = time.perf_counter() - start
+    clipped = [name for name, entry in manifest["files"].items() if entry["clipped_ratio"] > params["max_clipped_ratio"]]
+    print(f"✅ Processed {len(jobs) - len(failed)} clips in {elapsed:.1f}s"
+          + (f" ({(len(jobs) - len(failed)) / elapsed:.1f} clips/s)" if jobs and elapsed else ""))
+    if clipped:
+        print(f"⚠️ {len(clipped)} source clips are clipped (> {params['max_clipped_ratio']:.2%} of samples at full scale):")
+        for name in clipped[:20]:
+            print(f"  - {name}: {manifest['files'][name]['clipped_ratio']:.2%}")
+    return manifest, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resample, trim and loudness-normalize the training dataset")
+    parser.add_argument("--dataset_path", default=DATASET_PATH)
+    parser.add_argument("--output_path", default=OUTPUT_PATH)
+    parser.add_argument("--sample_rate", type=int, default=22050, help="Training sample rate (VitsAudioConfig)")
+    parser.add_argument("--top_db", type=float, default=40, help="Silence threshold below peak for trimming")
+    parser.add_argument("--pad_ms", type=float, default=50, help="Silence kept around trimmed speech")
+    parser.add_argument("--target_dbfs", type=float, default=-23.0, help="Target RMS level")
+    parser.add_argument("--peak_dbfs", type=float, default=-1.0, help="Peak ceiling after normalization")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    params = {
+        "sample_rate": args.sample_rate,
+        "top_db": args.top_db,
+        "pad_ms": args.pad_ms,
+        "target_dbfs": args.target_dbfs,
+        "peak_dbfs": args.peak_dbfs,
+        "clip_threshold": 0.999,
+        "max_clipped_ratio": 0.001,
+    }
+    preprocess_dataset(args.dataset_path, args.output_path, params, args.workers)
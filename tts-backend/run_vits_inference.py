@@ -1,73 +1,162 @@
 import argparse
+import json
 import os
+import threading
 from TTS.api import TTS
 
+# One model trained with train_vits.py --speakers hi-female,hi-male serves both Hindi voices.
+# The folder holds the checkpoint, its config.json and the speakers.pth that config points to.
+MULTI_SPEAKER_DIR = 'tts_vits_coquiai_Hindi'
+MULTI_SPEAKER_MODEL = 'hi_vits_multispeaker.pth'
+HINDI_MODELS = {
+    'hi-female': ('tts_vits_coquiai_HindiFemale', 'hi_female_vits_30hrs.pt'),
+    'hi-male': ('tts_vits_coquiai_HindiMale', 'hi_male_vits_30hrs.pt'),
+}
+DEFAULT_MODEL = "tts_models/en/ljspeech/vits"
+BATCH_SIZE = 16
+SENTENCE_GAP = 10000  # Silence between sentences, in samples, as Coqui's Synthesizer inserts it
+
+_models = {}
+_models_lock = threading.RLock()
+
 def get_model_path(speaker_id, language='en'):
-    """Get the appropriate model path based on speaker and language"""
+    """Get the model and, for a multi-speaker model, the speaker name to use for a speaker and language"""
     base_dir = os.getcwd()
-    
-    if language in ['hi', 'hi-IN'] and speaker_id in ['hi-female', 'hi-male']:
-        if speaker_id == 'hi-female':
-            model_path = os.path.join(base_dir, 'tts_vits_coquiai_HindiFemale', 'hi_female_vits_30hrs.pt')
-        else:  # hi-male
-            model_path = os.path.join(base_dir, 'tts_vits_coquiai_HindiMale', 'hi_male_vits_30hrs.pt')
-        
+
+    if language in ['hi', 'hi-IN'] and speaker_id in HINDI_MODELS:
+        # Prefer the merged model: one set of weights in memory for both voices
+        multi_path = os.path.join(base_dir, MULTI_SPEAKER_DIR, MULTI_SPEAKER_MODEL)
+        if os.path.exists(multi_path):
+            return multi_path, speaker_id
+        model_path = os.path.join(base_dir, *HINDI_MODELS[speaker_id])
         if os.path.exists(model_path):
-            return model_path
-    
+            return model_path, None
+
     # Default to English VITS model
-    return "tts_models/en/ljspeech/vits"
+    return DEFAULT_MODEL, None
+
+def find_config(model_path):
+    model_dir = os.path.dirname(model_path)
+    config_path = os.path.join(model_dir, 'config.json')
+    if os.path.exists(config_path):
+        return config_path
+    # Try looking for any .json config file
+    json_files = [f for f in os.listdir(model_dir) if f.endswith('.json')]
+    return os.path.join(model_dir, json_files[0]) if json_files else None
+
+def load_model(model_name_or_path):
+    """Cached (TTS, lock) for a model name or local checkpoint; each model is loaded once per process"""
+    with _models_lock:
+        if model_name_or_path in _models:
+            return _models[model_name_or_path]
+        if os.path.exists(model_name_or_path):
+            config_path = find_config(model_name_or_path)
+            if config_path is None:
+                # Fallback to default VITS model if no config found
+                print(f"Warning: No config found for local model, falling back to default")
+                entry = load_model(DEFAULT_MODEL)
+            else:
+                print(f"Loading local model: {model_name_or_path}")
+                print(f"Config: {config_path}")
+                tts = TTS(model_path=model_name_or_path, config_path=config_path, progress_bar=False, gpu=False)
+                entry = (tts, threading.Lock())
+        else:
+            # Standard model name
+            entry = (TTS(model_name=model_name_or_path, progress_bar=False, gpu=False), threading.Lock())
+        _models[model_name_or_path] = entry
+        return entry
 
 def generate_voice(text, output_path, speaker_id='p225', language='en', length_scale=1.1, noise_scale=0.667, noise_scale_w=0.8):
-    model_name_or_path = get_model_path(speaker_id, language)
-    
+    model_name_or_path, speaker = get_model_path(speaker_id, language)
+
     print(f"Using model: {model_name_or_path}")
     print(f"Speaker: {speaker_id}, Language: {language}")
-    
-    # Check if it's a local model path or a model name
-    if os.path.exists(model_name_or_path):
-        # Local model file - need to find config
-        model_dir = os.path.dirname(model_name_or_path)
-        config_path = os.path.join(model_dir, 'config.json')
-        
-        if not os.path.exists(config_path):
-            # Try looking for any .json config file
-            json_files = [f for f in os.listdir(model_dir) if f.endswith('.json')]
-            if json_files:
-                config_path = os.path.join(model_dir, json_files[0])
-            else:
-                # Fallback to default VITS model if no config found
-                print(f"Warning: No config found for local model, falling back to default")
-                tts = TTS(model_name="tts_models/en/ljspeech/vits", progress_bar=False, gpu=False)
-                tts.tts_to_file(
-                    text=text,
-                    file_path=output_path,
-                    length_scale=length_scale,
-                    noise_scale=noise_scale,
-                    noise_scale_w=noise_scale_w
-                )
-                return
-        
-        print(f"Loading local model: {model_name_or_path}")
-        print(f"Config: {config_path}")
-        tts = TTS(model_path=model_name_or_path, config_path=config_path, progress_bar=False, gpu=False)
-    else:
-        # Standard model name
-        tts = TTS(model_name=model_name_or_path, progress_bar=False, gpu=False)
-    
-    tts.tts_to_file(
-        text=text,
-        file_path=output_path,
-        length_scale=length_scale,
-        noise_scale=noise_scale,
-        noise_scale_w=noise_scale_w
-    )
+
+    tts, lock = load_model(model_name_or_path)
+    # Synthesis settings live on the shared model, so one request at a time per model
+    with lock:
+        tts.tts_to_file(
+            text=text,
+            speaker=speaker,
+            file_path=output_path,
+            length_scale=length_scale,
+            noise_scale=noise_scale,
+            noise_scale_w=noise_scale_w
+        )
+
+def synthesize_batch(tts, items, length_scale=1.1, noise_scale=0.667, noise_scale_w=0.8):
+    """Waveforms for (text, speaker name) items of one multi-speaker VITS model, sentences batched across items"""
+    import numpy as np
+    import torch
+
+    synthesizer = tts.synthesizer
+    model = synthesizer.tts_model
+    if model.speaker_manager is None:
+        raise ValueError("Batched synthesis needs a multi-speaker model with a speaker map (speakers.pth)")
+    sentences = []
+    for index, (text, speaker) in enumerate(items):
+        speaker_id = model.speaker_manager.name_to_id[speaker]
+        for sentence in synthesizer.split_into_sentences(text):
+            sentences.append((index, model.tokenizer.text_to_ids(sentence), speaker_id))
+
+    hop_length = model.config.audio.hop_length
+    pad_id = model.tokenizer.pad_id or 0
+    # Similar lengths share a batch, so little compute goes into padding
+    order = sorted(range(len(sentences)), key=lambda i: len(sentences[i][1]))
+    waveforms = [None] * len(sentences)
+    saved = (model.length_scale, model.inference_noise_scale, model.inference_noise_scale_dp)
+    model.length_scale, model.inference_noise_scale, model.inference_noise_scale_dp = (
+        length_scale, noise_scale, noise_scale_w)
+    try:
+        for start in range(0, len(order), BATCH_SIZE):
+            chunk = order[start:start + BATCH_SIZE]
+            lengths = torch.LongTensor([len(sentences[i][1]) for i in chunk])
+            tokens = torch.full((len(chunk), int(lengths.max())), pad_id, dtype=torch.long)
+            for row, i in enumerate(chunk):
+                tokens[row, :lengths[row]] = torch.LongTensor(sentences[i][1])
+            speaker_ids = torch.LongTensor([sentences[i][2] for i in chunk])
+            with torch.no_grad():
+                outputs = model.inference(tokens, aux_input={"x_lengths": lengths, "speaker_ids": speaker_ids})
+            wav_lengths = outputs["y_mask"].sum(dim=(1, 2)).long() * hop_length
+            for row, i in enumerate(chunk):
+                waveforms[i] = outputs["model_outputs"][row, 0, :wav_lengths[row]].numpy()
+    finally:
+        model.length_scale, model.inference_noise_scale, model.inference_noise_scale_dp = saved
+
+    results = [[] for _ in items]
+    for (index, _, _), waveform in zip(sentences, waveforms):
+        if results[index]:
+            results[index].append(np.zeros(SENTENCE_GAP, dtype=waveform.dtype))
+        results[index].append(waveform)
+    return [np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32) for parts in results]
+
+def generate_batch(requests, length_scale=1.1, noise_scale=0.667, noise_scale_w=0.8):
+    """Render {text, output, speaker, language} requests; voices of one multi-speaker model share forward passes"""
+    groups = {}
+    for request in requests:
+        model_name_or_path, speaker = get_model_path(request.get('speaker', 'p225'), request.get('language', 'en'))
+        groups.setdefault((model_name_or_path, speaker is not None), []).append((request, speaker))
+
+    for (model_name_or_path, multi_speaker), members in groups.items():
+        if not multi_speaker:
+            for request, _ in members:
+                generate_voice(request['text'], request['output'], request.get('speaker', 'p225'),
+                               request.get('language', 'en'), length_scale, noise_scale, noise_scale_w)
+            continue
+        tts, lock = load_model(model_name_or_path)
+        with lock:
+            waveforms = synthesize_batch(tts, [(request['text'], speaker) for request, speaker in members],
+                                         length_scale, noise_scale, noise_scale_w)
+            for (request, _), waveform in zip(members, waveforms):
+                tts.synthesizer.save_wav(waveform, request['output'])
+        print(f"Batched {len(members)} requests on {model_name_or_path}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--text", help="Text to convert to speech")
     parser.add_argument("--text_file", help="Path to text file instead of direct text")
-    parser.add_argument("--output", required=True, help="Output WAV file path")
+    parser.add_argument("--output", help="Output WAV file path")
+    parser.add_argument("--batch", help="JSONL of {text, output, speaker, language} requests to render together")
     parser.add_argument("--speaker", default="p225", help="Speaker ID (p225, p227, hi-female, hi-male)")
     parser.add_argument("--language", default="en", help="Language code (en, hi, hi-IN)")
     parser.add_argument("--length_scale", type=float, default=1.1)
@@ -75,6 +164,14 @@ if __name__ == "__main__":
     parser.add_argument("--noise_scale_w", type=float, default=0.8)
     args = parser.parse_args()
 
+    if args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            batch_requests = [json.loads(line) for line in f if line.strip()]
+        generate_batch(batch_requests, args.length_scale, args.noise_scale, args.noise_scale_w)
+        raise SystemExit(0)
+    if not args.output:
+        raise ValueError("--output is required unless --batch is given.")
+
     if args.text_file:
         with open(args.text_file, 'r', encoding='utf-8') as f:
             text = f.read()
@@ -84,11 +181,11 @@ if __name__ == "__main__":
         raise ValueError("Either --text or --text_file must be provided.")
 
     generate_voice(
-        text, 
-        args.output, 
-        args.speaker, 
+        text,
+        args.output,
+        args.speaker,
         args.language,
-        args.length_scale, 
-        args.noise_scale, 
+        args.length_scale,
+        args.noise_scale,
         args.noise_scale_w
     )
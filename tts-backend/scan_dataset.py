@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+import numpy as np
+
+DATASET_PATH = "./workspace/tts-dataset"
+REPORT_DIR = "./analysis_outputs"
+
+COLUMNS = ("duration", "sample_rate", "channels", "peak", "rms", "dc_offset", "clipping_ratio", "silence_ratio")
+
+# Outlier thresholds; RMS additionally uses a robust z-score across the dataset
+LIMITS = {
+    "min_duration": 0.5,
+    "max_duration": 20.0,
+    "min_peak": 0.1,
+    "max_clipping_ratio": 0.001,
+    "max_dc_offset": 0.01,
+    "max_silence_ratio": 0.5,
+    "rms_z": 3.5,
+}
+CLIP_LEVEL = 0.999
+SILENCE_DBFS = -50.0
+FRAME_SECONDS = 0.02
+
+
+def clip_stats(path):
+    """All statistics for one clip from a single read; vectorized over samples and frames"""
+    import soundfile as sf
+
+    y, sr = sf.read(path, dtype="float32", always_2d=True)
+    channels = y.shape[1]
+    y = y.mean(axis=1)
+    if not len(y):
+        return (0.0, sr, channels, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+    abs_y = np.abs(y)
+    frame = max(1, int(sr * FRAME_SECONDS))
+    n_frames = max(1, len(y) // frame)
+    frames = y[:n_frames * frame].reshape(n_frames, frame) if len(y) >= frame else y[None, :]
+    frame_rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    silence_level = 10 ** (SILENCE_DBFS / 20)
+    return (
+        len(y) / sr,
+        sr,
+        channels,
+        float(abs_y.max()),
+        float(np.sqrt(np.mean(np.square(y, dtype=np.float64)))),
+        float(y.mean(dtype=np.float64)),
+        float(np.mean(abs_y >= CLIP_LEVEL)),
+        float(np.mean(frame_rms < silence_level)),
+    )
+
+
+def _scan_one(path):
+    try:
+        return path, clip_stats(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def scan_clips(paths, workers=None, chunksize=8):
+    """Columnar statistics for every path; each worker holds one clip at a time"""
+    columns = {name: np.zeros(len(paths), dtype=np.float64) for name in COLUMNS}
+    errors = {}
+    position = {path: i for i, path in enumerate(paths)}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, stats, error in pool.map(_scan_one, paths, chunksize=chunksize):
+            if error:
+                errors[path] = error
+                continue
+            for name, value in zip(COLUMNS, stats):
+                columns[name][position[path]] = value
+    return columns, errors
+
+
+def find_outliers(paths, columns, limits=LIMITS):
+    """Map of reason -> list of paths breaking that limit"""
+    rms = columns["rms"]
+    median = np.median(rms)
+    mad = np.median(np.abs(rms - median)) or 1e-9
+    rms_z = 0.6745 * (rms - median) / mad
+    rate_values, rate_counts = np.unique(columns["sample_rate"], return_counts=True)
+    common_rate = rate_values[np.argmax(rate_counts)] if len(rate_values) else 0
+
+    masks = {
+        "too_short": columns["duration"] < limits["min_duration"],
+        "too_long": columns["duration"] > limits["max_duration"],
+        "too_quiet": columns["peak"] < limits["min_peak"],
+        "clipped": columns["clipping_ratio"] > limits["max_clipping_ratio"],
+        "dc_offset": np.abs(columns["dc_offset"]) > limits["max_dc_offset"],
+        "mostly_silence": columns["silence_ratio"] > limits["max_silence_ratio"],
+        "loudness": np.abs(rms_z) > limits["rms_z"],
+        "sample_rate": columns["sample_rate"] != common_rate,
+    }
+    return {reason: [paths[i] for i in np.flatnonzero(mask)] for reason, mask in masks.items() if mask.any()}
+
+
+def plot_report(columns, output_path):
+    """Histograms of the main columns; matplotlib is only imported when plots are requested"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(2, 3, figsize=(15, 8))
+    for ax, name in zip(axes.flat, ("duration", "peak", "rms", "dc_offset", "clipping_ratio", "silence_ratio")):
+        ax.hist(columns[name], bins=50)
+        ax.set_title(name)
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close(fig)
+
+
+def scan_dataset(dataset_path, report_dir, workers=None, plot=False):
+    paths = sorted(glob(os.path.join(dataset_path, "**/*.wav"), recursive=True))
+    if not paths:
+        print("❌ No audio files found!")
+        return None
+
+    start = time.perf_counter()
+    columns, errors = scan_clips(paths, workers)
+    ok = [i for i, path in enumerate(paths) if path not in errors]
+    good_paths = [paths[i] for i in ok]
+    columns = {name: values[ok] for name, values in columns.items()}
+    outliers = find_outliers(good_paths, columns)
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, "dataset_scan.npz")
+    np.savez(report_path, path=np.array(good_paths), **columns)
+    with open(os.path.join(report_dir, "dataset_outliers.json"), "w", encoding="utf-8") as f:
+        json.dump({"limits": LIMITS, "errors": errors, "outliers": outliers}, f, indent=2)
+    if plot:
+        plot_report(columns, os.path.join(report_dir, "dataset_scan.png"))
+
+    print(f"✅ Scanned {len(paths)} clips in {elapsed:.1f}s ({len(paths) / elapsed:.0f} clips/s)")
+    print(f"Total duration: {columns['duration'].sum() / 3600:.2f} h, "
+          f"sample rates: {sorted(set(int(r) for r in columns['sample_rate']))}")
+    print(f"Report: {report_path}")
+    for reason, flagged in outliers.items():
+        print(f"⚠️ {reason}: {len(flagged)} clips")
+    for path, error in errors.items():
+        print(f"❌ {path}: {error}")
+    return columns, outliers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan every clip in the dataset for level, clipping and silence issues")
+    parser.add_argument("--dataset_path", default=DATASET_PATH)
+    parser.add_argument("--report_dir", default=REPORT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--plot", action="store_true", help="Also save histograms (dataset_scan.png)")
+    args = parser.parse_args()
+
+    scan_dataset(args.dataset_path, args.report_dir, args.workers, args.plot)
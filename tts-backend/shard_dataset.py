@@ -0,0 +1,354 @@
+import argparse
+import io
+import json
+import os
+import random
+import tarfile
+import time
+
+import numpy as np
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from build_phoneme_cache import cache_file_name, load_manifest, text_hash, tokenizer_signature
+from feature_store import audio_config_dict, pad_features
+from phoneme_store import STORE_DIR, SUFFIX, PhonemeStore
+
+INDEX_NAME = "shards.json"
+DEFAULT_SHARD_MB = 256
+DEFAULT_BUFFER = 1000
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def _add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _cached_tokens(sample, cache_path, store, manifest, signature):
+    """Token ids from the phoneme cache if they were computed for this exact text and tokenizer"""
+    file_name = cache_file_name(sample["audio_unique_name"])
+    if manifest.get(file_name) != text_hash(sample["text"], signature):
+        return None
+    ids = store.get(file_name[:-len(SUFFIX)]) if store is not None else None
+    if ids is None and os.path.exists(os.path.join(cache_path, file_name)):
+        ids = np.load(os.path.join(cache_path, file_name))
+    return None if ids is None else ids.astype(np.int32)
+
+
+def coqui_audio_length(audio_file):
+    """Audio length as VitsDataset measures it for min/max_audio_len: file bytes as 16-bit samples, header included"""
+    return os.path.getsize(audio_file) / 16 * 8
+
+
+def _audio_length(record):
+    """coqui_audio_length of a packed record (shards packed before it was recorded fall back to the source file)"""
+    if "audio_length" in record:
+        return record["audio_length"]
+    try:
+        return coqui_audio_length(record["audio_file"])
+    except OSError:
+        # Source audio gone: the frame count is only the 44-byte header (22 "samples") short
+        return record["samples"]
+
+
+def pack_shards(samples, output_dir, config, shard_mb=DEFAULT_SHARD_MB, feature_store=None, seed=0):
+    """Write samples into tar shards of ~shard_mb each plus a shards.json index
+
+    Each sample is stored as consecutive members <key>.wav (the original file bytes)
+    and, when available, <key>.tokens.npy, <key>.spec.npy and <key>.mel.npy. Samples
+    are shuffled once at pack time so every shard is a mix of the whole dataset.
+    """
+    import soundfile as sf
+
+    os.makedirs(output_dir, exist_ok=True)
+    signature = tokenizer_signature(config)
+    cache_path = config.phoneme_cache_path
+    manifest = load_manifest(cache_path)
+    store_path = os.path.join(cache_path, STORE_DIR)
+    store = PhonemeStore(store_path) if os.path.exists(os.path.join(store_path, "keys.json")) else None
+
+    order = list(samples)
+    random.Random(seed).shuffle(order)
+    shard_bytes = shard_mb * 1024 * 1024
+    shards, records = [], []
+    tar, shard_path, written = None, None, 0
+    start = time.perf_counter()
+    tokens_found = 0
+    for i, sample in enumerate(order):
+        if tar is None:
+            shard_path = os.path.join(output_dir, f"shard-{len(shards):05d}.tar")
+            tar = tarfile.open(shard_path + ".tmp", "w")
+            records, written = [], 0
+
+        key = f"{i:08d}"
+        with open(sample["audio_file"], "rb") as f:
+            wav_bytes = f.read()
+        _add_member(tar, key + ".wav", wav_bytes)
+        written += len(wav_bytes)
+        tokens = _cached_tokens(sample, cache_path, store, manifest, signature) if config.use_phonemes else None
+        if tokens is not None:
+            _add_member(tar, key + ".tokens.npy", _npy_bytes(tokens))
+            tokens_found += 1
+        features = feature_store.get(sample["audio_file"]) if feature_store is not None else None
+        if features is not None:
+            for kind, array in zip(("spec", "mel"), features):
+                data = _npy_bytes(np.ascontiguousarray(array))
+                _add_member(tar, f"{key}.{kind}.npy", data)
+                written += len(data)
+
+        info = sf.info(sample["audio_file"])
+        records.append({
+            "key": key,
+            "text": sample["text"],
+            "speaker_name": sample.get("speaker_name"),
+            "language": sample.get("language"),
+            "audio_file": sample["audio_file"],
+            "audio_unique_name": sample["audio_unique_name"],
+            "samples": info.frames,
+            "audio_length": coqui_audio_length(sample["audio_file"]),
+            "tokens": tokens is not None,
+            "features": features is not None,
+        })
+
+        if written >= shard_bytes or i == len(order) - 1:
+            tar.close()
+            os.replace(shard_path + ".tmp", shard_path)
+            shards.append({"file": os.path.basename(shard_path), "bytes": os.path.getsize(shard_path),
+                           "items": records})
+            tar = None
+            print(f"  {os.path.basename(shard_path)}: {len(records)} samples, {written / 1e6:.0f} MB")
+
+    index = {
+        "version": 1,
+        "tokenizer_signature": signature,
+        "feature_config": feature_store.index["config"] if feature_store is not None else None,
+        "shards": shards,
+    }
+    with open(os.path.join(output_dir, INDEX_NAME + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(os.path.join(output_dir, INDEX_NAME + ".tmp"), os.path.join(output_dir, INDEX_NAME))
+    # Shards from an earlier, larger pack would otherwise linger unreferenced
+    for name in os.listdir(output_dir):
+        if name.startswith("shard-") and name.endswith(".tar") and name not in {s["file"] for s in shards}:
+            os.remove(os.path.join(output_dir, name))
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Packed {len(order)} samples into {len(shards)} shards in {elapsed:.1f}s "
+          f"({tokens_found} with cached phonemes)")
+    return index
+
+
+def read_shard(path):
+    """Yield (key, {extension: bytes}) per sample, reading the tar strictly front to back"""
+    key, members = None, {}
+    with tarfile.open(path, "r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            member_key, ext = member.name.split(".", 1)
+            if member_key != key and members:
+                yield key, members
+                members = {}
+            key = member_key
+            members[ext] = tar.extractfile(member).read()
+    if members:
+        yield key, members
+
+
+class ShardStream(IterableDataset):
+    """Streaming VITS training samples from packed shards
+
+    Shards are dealt out to DDP ranks and DataLoader workers in a per-epoch
+    shuffled order, read sequentially, and mixed through a shuffle buffer.
+    Items match VitsDataset.__getitem__, so VitsDataset.collate_fn batches them.
+    """
+
+    def __init__(self, shard_dir, config, tokenizer, exclude=(), buffer_size=DEFAULT_BUFFER, seed=0,
+                 rank=0, world_size=1, num_workers=0):
+        with open(os.path.join(shard_dir, INDEX_NAME), "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.shard_dir = shard_dir
+        # Shards packed from other datasets would train on the wrong speakers and miss the
+        # held-out samples, whose audio_unique_names ("<dataset>#...") would not match
+        packed = {record["audio_unique_name"].split("#", 1)[0]
+                  for shard in self.index["shards"] for record in shard["items"]}
+        expected = {dataset.dataset_name for dataset in config.datasets}
+        if packed != expected:
+            raise ValueError(f"Shards in {shard_dir} were packed from datasets {sorted(packed)}, training uses "
+                             f"{sorted(expected)}; repack them with shard_dataset.py (same --speakers as training)")
+        self.tokenizer = tokenizer
+        self.pad_id = tokenizer.characters.pad_id
+        self.use_cached_tokens = self.index["tokenizer_signature"] == tokenizer_signature(config)
+        # Spectrograms packed for another audio config would silently train on the wrong features
+        feature_config = self.index.get("feature_config")
+        self.use_packed_features = feature_config == audio_config_dict(config.audio)
+        if feature_config is not None and not self.use_packed_features:
+            print("⚠️ Shards were packed with spectrograms for a different audio config; computing them per step")
+        self.buffer_size = buffer_size
+        self.seed = seed
+        self.epoch = 0
+        self.rank = rank
+        self.world_size = world_size
+        self.num_workers = num_workers
+        self.batch_size = config.batch_size
+
+        exclude = set(exclude)
+        self.keep = {}
+        for shard in self.index["shards"]:
+            for record in shard["items"]:
+                if record["audio_unique_name"] in exclude:
+                    continue
+                # Same measures and limits as VitsDataset.preprocess_samples (raw text in characters,
+                # audio by file size), so shard and file-list training keep the same samples
+                if not config.min_text_len <= len(record["text"]) <= config.max_text_len:
+                    continue
+                if not config.min_audio_len <= _audio_length(record) <= config.max_audio_len:
+                    continue
+                self.keep[(shard["file"], record["key"])] = record
+
+    def _slot(self):
+        """This reader's slot among all (rank, worker) readers, and the slot count"""
+        worker = get_worker_info()
+        workers, worker_id = (worker.num_workers, worker.id) if worker is not None else (1, 0)
+        return self.rank * workers + worker_id, self.world_size * workers
+
+    def _assignment(self, slot, slots, epoch):
+        """(shard files, item stride or None) read by one slot in an epoch"""
+        files = [shard["file"] for shard in self.index["shards"]]
+        random.Random(self.seed + epoch).shuffle(files)
+        if len(files) >= slots:
+            return files[slot::slots], None
+        # Too few shards to give every reader its own: all read everything, each keeps a stride
+        return files, (slot, slots)
+
+    def _slot_items(self, slot, slots, epoch):
+        files, stride = self._assignment(slot, slots, epoch)
+        keys = [(file, record["key"]) for file in files for record in self._shard_items(file)]
+        return keys if stride is None else keys[stride[0]::stride[1]]
+
+    def _shard_items(self, file):
+        for shard in self.index["shards"]:
+            if shard["file"] == file:
+                return [r for r in shard["items"] if (file, r["key"]) in self.keep]
+        return []
+
+    def _limit(self, slots, epoch):
+        """Items each slot may yield so every rank runs the same number of full batches, or None"""
+        if self.world_size <= 1:
+            return None
+        shortest = min(len(self._slot_items(slot, slots, epoch)) for slot in range(slots))
+        return shortest // self.batch_size * self.batch_size
+
+    def __len__(self):
+        slots = self.world_size * max(1, self.num_workers)
+        limit = self._limit(slots, self.epoch)
+        if limit is not None:
+            return limit * max(1, self.num_workers)
+        return len(self.keep)
+
+    def _items(self, slot, slots):
+        files, stride = self._assignment(slot, slots, self.epoch)
+        position = -1
+        for file in files:
+            for key, members in read_shard(os.path.join(self.shard_dir, file)):
+                record = self.keep.get((file, key))
+                if record is None:
+                    continue
+                position += 1
+                if stride is not None and position % stride[1] != stride[0]:
+                    continue
+                yield self._item(record, members)
+
+    def _item(self, record, members):
+        import soundfile as sf
+        import torch
+
+        wav, _ = sf.read(io.BytesIO(members["wav"]), dtype="float32", always_2d=True)
+        if "tokens.npy" in members and self.use_cached_tokens:
+            token_ids = np.load(io.BytesIO(members["tokens.npy"]))
+        else:
+            token_ids = np.array(self.tokenizer.text_to_ids(record["text"]), dtype=np.int32)
+        item = {
+            "raw_text": record["text"],
+            "token_ids": token_ids,
+            "token_len": len(token_ids),
+            "wav": torch.from_numpy(wav.mean(axis=1)[None, :]),
+            "wav_file": os.path.basename(record["audio_file"]),
+            "speaker_name": record["speaker_name"],
+            "language_name": record["language"],
+            "audio_unique_name": record["audio_unique_name"],
+        }
+        if "spec.npy" in members and self.use_packed_features:
+            item["features"] = (np.load(io.BytesIO(members["spec.npy"])), np.load(io.BytesIO(members["mel.npy"])))
+        return item
+
+    def __iter__(self):
+        slot, slots = self._slot()
+        limit = self._limit(slots, self.epoch)
+        rng = random.Random(f"{self.seed}-{self.epoch}-{slot}")
+        buffer, count = [], 0
+        for item in self._items(slot, slots):
+            if len(buffer) < self.buffer_size:
+                buffer.append(item)
+                continue
+            if limit is not None and count >= limit:
+                return
+            i = rng.randrange(len(buffer))
+            yield buffer[i]
+            count += 1
+            buffer[i] = item
+        rng.shuffle(buffer)
+        for item in buffer:
+            if limit is not None and count >= limit:
+                return
+            yield item
+            count += 1
+
+    def collate_fn(self, items):
+        from TTS.tts.models.vits import VitsDataset
+
+        # VitsDataset.collate_fn only reads self.pad_id
+        batch = VitsDataset.collate_fn(self, items)
+        if all("features" in item for item in items):
+            batch["features"] = pad_features([item["features"] for item in items])
+        return batch
+
+    def loader(self):
+        return DataLoader(self, batch_size=self.batch_size, collate_fn=self.collate_fn,
+                          num_workers=self.num_workers, pin_memory=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack the training dataset into large sequential-read tar shards")
+    parser.add_argument("--output_dir", default=None, help="Shard directory (default: train_vits.SHARD_DIR)")
+    parser.add_argument("--shard_mb", type=int, default=DEFAULT_SHARD_MB)
+    parser.add_argument("--features", action="store_true",
+                        help="Include spectrograms from the feature store (feature_store.py) when built")
+    parser.add_argument("--speakers", default="",
+                        help="Pack the per-speaker datasets of a multi-speaker run (same value as train_vits.py --speakers)")
+    args = parser.parse_args()
+
+    from TTS.tts.datasets import load_tts_samples
+    from TTS.tts.utils.text.tokenizer import TTSTokenizer
+
+    from feature_store import FeatureStore
+    from train_vits import FEATURE_STORE_DIR, SHARD_DIR, config, label_speakers, speaker_datasets
+
+    speakers = [entry for entry in args.speakers.split(",") if entry]
+    if speakers:
+        config.datasets = speaker_datasets(speakers)
+    # The tokenizer fills in config.characters, which is part of the phoneme signature
+    _, config = TTSTokenizer.init_from_config(config)
+    samples, _ = load_tts_samples(config.datasets, eval_split=False)
+    if speakers:
+        label_speakers(samples)
+    feature_store = FeatureStore.open_for(FEATURE_STORE_DIR, config.audio) if args.features else None
+    if args.features and feature_store is None:
+        print("⚠️ No feature store for this audio config, packing audio and text only")
+    pack_shards(samples, args.output_dir or SHARD_DIR, config, args.shard_mb, feature_store)
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from azure_cache import SynthesisCache, cache_key, canonicalize_ssml
+
+FORMAT = "riff-24khz-16bit-mono-pcm"
+
+
+def ssml(body, voice="en-US-AriaNeural"):
+    return (f'<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">'
+            f'<voice name="{voice}">{body}</voice></speak>')
+
+
+class CanonicalizeTest(unittest.TestCase):
+    def test_space_between_elements_is_kept(self):
+        spaced = ssml("<emphasis>a</emphasis> <emphasis>b</emphasis>")
+        joined = ssml("<emphasis>a</emphasis><emphasis>b</emphasis>")
+        self.assertNotEqual(cache_key(spaced, FORMAT), cache_key(joined, FORMAT))
+
+    def test_whitespace_runs_collapse(self):
+        self.assertEqual(canonicalize_ssml(ssml("<emphasis>a</emphasis> \n\t <emphasis>b</emphasis>")),
+                         canonicalize_ssml(ssml("<emphasis>a</emphasis> <emphasis>b</emphasis>")))
+        self.assertEqual(canonicalize_ssml(ssml("hello   big\n world")), canonicalize_ssml(ssml("hello big world")))
+
+    def test_layout_whitespace_is_ignored(self):
+        pretty = """
+            <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">
+                <voice name="Microsoft Server Speech Text to Speech Voice (en-US, AriaNeural)">
+                    Hello <emphasis>there</emphasis>
+                </voice>
+                <voice name="en-US-GuyNeural">  Bye  </voice>
+            </speak>
+        """
+        compact = ('<speak xml:lang="en-US" version="1.0" xmlns="http://www.w3.org/2001/10/synthesis">'
+                   '<voice name="en-US-AriaNeural">Hello <emphasis>there</emphasis></voice>'
+                   '<voice name="en-us-guyneural">Bye</voice></speak>')
+        self.assertEqual(canonicalize_ssml(pretty), canonicalize_ssml(compact))
+
+    def test_inner_edge_of_inline_element_is_kept(self):
+        self.assertNotEqual(canonicalize_ssml(ssml("a<emphasis> b</emphasis>")),
+                            canonicalize_ssml(ssml("a<emphasis>b</emphasis>")))
+
+    def test_output_format_is_part_of_the_key(self):
+        self.assertNotEqual(cache_key(ssml("a"), FORMAT), cache_key(ssml("a"), "audio-16khz-32kbitrate-mono-mp3"))
+
+
+class SynthesisCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SynthesisCache(tmp, max_bytes=250)
+            for name in "abc":
+                cache.put(name * 8, name.encode() * 100)
+            self.assertIsNone(cache.get("a" * 8))
+            self.assertEqual(cache.get("c" * 8), b"c" * 100)
+            self.assertFalse(os.path.exists(cache._path("a" * 8)))
+
+
+if __name__ == "__main__":
+    unittest.main()
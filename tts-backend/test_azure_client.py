@@ -0,0 +1,134 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import azure_client
+from azure_client import AzureTTSClient, AzureTTSError
+
+AUDIO = b"RIFF" + bytes(range(256)) * 64
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Azure stand-in; the SSML body picks the behaviour"""
+
+    throttle_first = 0  # requests answered 429 before the stub starts succeeding
+    retry_after = "2"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        with server.lock:
+            server.seen += 1
+            throttled = server.seen <= self.throttle_first
+        if throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", self.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif b"bad" in body:
+            message = b"unsupported voice"
+            self.send_response(400)
+            self.send_header("Content-Length", str(len(message)))
+            self.end_headers()
+            self.wfile.write(message)
+        elif b"truncate" in body:
+            # Promise the full clip, send a fraction, then drop the connection
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(AUDIO)))
+            self.end_headers()
+            self.wfile.write(AUDIO[:1000])
+            self.wfile.flush()
+            self.close_connection = True
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/riff")
+            self.send_header("Content-Length", str(len(AUDIO)))
+            self.end_headers()
+            self.wfile.write(AUDIO)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServerTest(unittest.TestCase):
+    handler = StubHandler
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.server.lock = threading.Lock()
+        self.server.seen = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = AzureTTSClient(key="test", endpoint=f"http://127.0.0.1:{self.server.server_port}/",
+                                     max_retries=3, backoff_base=0.0, timeout=5)
+        self.addCleanup(self.client.close)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+
+class RetryTest(StubServerTest):
+    class handler(StubHandler):
+        throttle_first = 2
+
+    def test_retry_after_is_honoured(self):
+        with mock.patch.object(azure_client.time, "sleep") as sleep:
+            audio = self.client.synthesize("<speak>hello</speak>")
+        self.assertEqual(audio, AUDIO)
+        self.assertEqual(self.server.seen, 3)
+        self.assertEqual(self.client.stats["requests"], 3)
+        self.assertEqual(self.client.stats["retries"], 2)
+        self.assertEqual(self.client.stats["throttled"], 2)
+        # backoff_base=0 leaves no jitter: every wait is exactly the server's Retry-After
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [2.0, 2.0])
+
+    def test_gives_up_after_max_retries(self):
+        self.client.max_retries = 1
+        with mock.patch.object(azure_client.time, "sleep"):
+            with self.assertRaises(AzureTTSError) as raised:
+                self.client.synthesize("<speak>hello</speak>")
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(self.client.stats["retries"], 1)
+
+
+class ManifestTest(StubServerTest):
+    def jobs(self):
+        return [
+            {"ssml": "<speak>one</speak>", "output": os.path.join(self.tmp, "one.wav")},
+            {"ssml": "<speak>bad</speak>", "output": os.path.join(self.tmp, "bad.wav")},
+            {"ssml": "<speak>truncate</speak>", "output": os.path.join(self.tmp, "truncate.wav")},
+            {"ssml": "<speak>two</speak>", "output": os.path.join(self.tmp, "two.wav")},
+        ]
+
+    def check_outputs(self, summary):
+        self.assertEqual(summary["succeeded"], 2)
+        self.assertEqual(sorted(os.path.basename(f["output"]) for f in summary["failed"]),
+                         ["bad.wav", "truncate.wav"])
+        # Only complete clips on disk: no partial output and no leftover temp files
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["one.wav", "two.wav"])
+        for name in ("one.wav", "two.wav"):
+            with open(os.path.join(self.tmp, name), "rb") as f:
+                self.assertEqual(f.read(), AUDIO)
+
+    def test_buffered_outputs_are_atomic(self):
+        self.check_outputs(self.client.run_manifest(self.jobs(), workers=2))
+
+    def test_streamed_outputs_are_atomic(self):
+        self.check_outputs(self.client.run_manifest(self.jobs(), workers=2, stream=True))
+
+    def test_existing_outputs_are_skipped(self):
+        jobs = self.jobs()[:1]
+        self.client.run_manifest(jobs)
+        summary = self.client.run_manifest(jobs)
+        self.assertEqual(summary["skipped"], 1)
+        self.assertEqual(self.server.seen, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
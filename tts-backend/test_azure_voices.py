@@ -0,0 +1,126 @@
+import json
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from azure_voices import INDEX_VERSION, VoiceCatalog
+
+ETAG = '"catalog-v2"'
+LAST_MODIFIED = "Mon, 05 Oct 2026 10:00:00 GMT"
+OLD_VOICES = [{"ShortName": "en-US-AriaNeural", "Locale": "en-US", "Gender": "Female", "StyleList": ["cheerful"]}]
+NEW_VOICES = OLD_VOICES + [{"ShortName": "hi-IN-SwaraNeural", "Locale": "hi-IN", "Gender": "Female"}]
+
+
+class VoicesHandler(BaseHTTPRequestHandler):
+    """Voices list stand-in that answers 304 when either validator matches"""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        body = json.dumps(NEW_VOICES).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), VoicesHandler)
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}/voices/list"
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.json_path = os.path.join(tmp.name, "azure-voices.json")
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(OLD_VOICES, f)
+
+    def refresh(self, catalog):
+        return catalog.refresh(key="test", endpoint=self.endpoint, timeout=5)
+
+    def test_first_fetch_stores_validators(self):
+        catalog = VoiceCatalog(self.json_path)
+        self.assertTrue(self.refresh(catalog))
+        self.assertNotIn("If-None-Match", self.server.requests[0])
+        self.assertEqual(len(catalog), 2)
+        self.assertEqual(catalog.index["etag"], ETAG)
+        self.assertEqual(catalog.index["last_modified"], LAST_MODIFIED)
+        with open(self.json_path, "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), NEW_VOICES)
+
+    def test_not_modified_keeps_cached_index(self):
+        self.refresh(VoiceCatalog(self.json_path))
+        catalog = VoiceCatalog(self.json_path)
+        index = catalog.index
+        self.assertFalse(self.refresh(catalog))
+        self.assertEqual(self.server.requests[-1]["If-None-Match"], ETAG)
+        self.assertEqual(self.server.requests[-1]["If-Modified-Since"], LAST_MODIFIED)
+        self.assertIs(catalog.index, index)
+        self.assertEqual(catalog.get("HI-in-swaraneural")["Locale"], "hi-IN")
+
+    def test_rewritten_dump_drops_validators(self):
+        self.refresh(VoiceCatalog(self.json_path))
+        # A hand-edited dump no longer matches the sidecar's validators, so refresh must fetch it in full
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(OLD_VOICES, f)
+        catalog = VoiceCatalog(self.json_path)
+        self.assertIsNone(catalog.index["etag"])
+        self.assertEqual(len(catalog), 1)
+        self.assertTrue(self.refresh(catalog))
+        self.assertNotIn("If-None-Match", self.server.requests[-1])
+        self.assertNotIn("If-Modified-Since", self.server.requests[-1])
+        self.assertEqual(len(catalog), 2)
+
+    def test_touched_dump_drops_validators(self):
+        self.refresh(VoiceCatalog(self.json_path))
+        st = os.stat(self.json_path)
+        os.utime(self.json_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        catalog = VoiceCatalog(self.json_path)
+        self.assertIsNone(catalog.index["etag"])
+        self.assertIsNone(catalog.index["last_modified"])
+        self.assertTrue(self.refresh(catalog))
+        self.assertNotIn("If-None-Match", self.server.requests[-1])
+
+    def test_old_index_version_keeps_validators(self):
+        self.refresh(VoiceCatalog(self.json_path))
+        # Same dump, older index format: rebuilt, but it still describes what the service sent
+        catalog = VoiceCatalog(self.json_path)
+        catalog.index["version"] = INDEX_VERSION - 1
+        with open(catalog.index_path, "wb") as f:
+            pickle.dump(catalog.index, f)
+        catalog = VoiceCatalog(self.json_path)
+        self.assertEqual(catalog.index["version"], INDEX_VERSION)
+        self.assertEqual(catalog.index["etag"], ETAG)
+        self.assertFalse(self.refresh(catalog))
+        self.assertEqual(self.server.requests[-1]["If-None-Match"], ETAG)
+        self.assertEqual(self.server.requests[-1]["If-Modified-Since"], LAST_MODIFIED)
+        self.assertEqual(len(catalog), 2)
+
+    def test_lookups(self):
+        catalog = VoiceCatalog(self.json_path)
+        self.assertEqual([v["ShortName"] for v in catalog.find(locale="EN-us", style="Cheerful")],
+                         ["en-US-AriaNeural"])
+        self.assertIsNone(catalog.get("hi-IN-SwaraNeural"))
+
+
+if __name__ == "__main__":
+    unittest.main()
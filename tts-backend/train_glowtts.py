@@ -1,8 +1,12 @@
+import argparse
 import os
+import sys
+
+from torch.utils.data import RandomSampler, SequentialSampler
 
 # Trainer: Where the ✨️ happens.
 # TrainingArgs: Defines the set of arguments of the Trainer.
-from trainer import Trainer, TrainerArgs
+from trainer import TrainerArgs
 
 # GlowTTSConfig: all model related values for training, validating and testing.
 from TTS.tts.configs.glow_tts_config import GlowTTSConfig
@@ -14,6 +18,12 @@ from TTS.tts.models.glow_tts import GlowTTS
 from TTS.tts.utils.text.tokenizer import TTSTokenizer
 from TTS.utils.audio import AudioProcessor
 
+from async_eval import DEFAULT_SUBSET_SIZE, SUBSET_NAME, load_eval_subset, start_eval_worker
+from checkpoint_writer import AsyncCheckpointTrainer
+from ddp_cpu import DataParallelMixin, EvenLengthSampler, init_from_env, setup_data_parallel
+from phoneme_store import use_packed_phonemes
+from training_profiler import StepProfiler, StepProfilerMixin
+
 # we use the same path as this script as our training folder.
 output_path = os.path.dirname(os.path.abspath(__file__))
 
@@ -46,40 +56,108 @@ config = GlowTTSConfig(
     datasets=[dataset_config],
 )
 
-# INITIALIZE THE AUDIO PROCESSOR
-# Audio processor is used for feature extraction and audio I/O.
-# It mainly serves to the dataloader and the training loggers.
-ap = AudioProcessor.init_from_config(config)
-
-# INITIALIZE THE TOKENIZER
-# Tokenizer is used to convert text to sequences of token IDs.
-# If characters are not defined in the config, default characters are passed to the config
-tokenizer, config = TTSTokenizer.init_from_config(config)
-
-# LOAD DATA SAMPLES
-# Each sample is a list of ```[text, audio_file_path, speaker_name]```
-# You can define your custom sample loader returning the list of samples.
-# Or define your custom formatter and pass it to the `load_tts_samples`.
-# Check `TTS.tts.datasets.load_tts_samples` for more details.
-train_samples, eval_samples = load_tts_samples(
-    dataset_config,
-    eval_split=True,
-    eval_split_max_size=config.eval_split_max_size,
-    eval_split_size= 0.3333333333333333,
-)
 
-# INITIALIZE THE MODEL
-# Models take a config object and a speaker manager as input
-# Config defines the details of the model like the number of layers, the size of the embedding, etc.
-# Speaker manager is used by multi-speaker models.
-model = GlowTTS(config, ap, tokenizer, speaker_manager=None)
-
-# INITIALIZE THE TRAINER
-# Trainer provides a generic API to train all the 🐸TTS models with all its perks like mixed-precision training,
-# distributed training, etc.
-trainer = Trainer(
-    TrainerArgs(), config, output_path, model=model, train_samples=train_samples, eval_samples=eval_samples
-)
+class TrainGlowTTS(DataParallelMixin, StepProfilerMixin, GlowTTS):
+    """GlowTTS with optional per-step timing (training_profiler.py) and CPU data parallelism (ddp_cpu.py)"""
+
+    _loading_eval = False
+
+    def get_data_loader(self, config, assets, is_eval, samples, verbose, num_gpus, rank=None):
+        # BaseTTS.get_sampler isn't told which loader it is building
+        self._loading_eval = is_eval
+        return super().get_data_loader(config, assets, is_eval, samples, verbose, num_gpus, rank)
+
+    def get_sampler(self, config, dataset, num_gpus=1):
+        sampler = super().get_sampler(config, dataset, num_gpus)
+        if self.data_parallel and not self._loading_eval:
+            if sampler is None:
+                sampler = RandomSampler(dataset) if config.shuffle else SequentialSampler(dataset)
+            sampler = EvenLengthSampler(sampler)
+        return sampler
+
+
+def main(config, options):
+    # INITIALIZE THE AUDIO PROCESSOR
+    # Audio processor is used for feature extraction and audio I/O.
+    # It mainly serves to the dataloader and the training loggers.
+    ap = AudioProcessor.init_from_config(config)
+
+    # INITIALIZE THE TOKENIZER
+    # Tokenizer is used to convert text to sequences of token IDs.
+    # If characters are not defined in the config, default characters are passed to the config
+    tokenizer, config = TTSTokenizer.init_from_config(config)
+
+    # Serve cached phonemes from the packed store (phoneme_store.py) when it has been built
+    use_packed_phonemes(config.phoneme_cache_path)
+
+    # LOAD DATA SAMPLES
+    # Each sample is a list of ```[text, audio_file_path, speaker_name]```
+    # You can define your custom sample loader returning the list of samples.
+    # Or define your custom formatter and pass it to the `load_tts_samples`.
+    # Check `TTS.tts.datasets.load_tts_samples` for more details.
+    train_samples, eval_samples = load_tts_samples(
+        dataset_config,
+        eval_split=True,
+        eval_split_max_size=config.eval_split_max_size,
+        eval_split_size= 0.3333333333333333,
+    )
+
+    # INITIALIZE THE MODEL
+    # Models take a config object and a speaker manager as input
+    # Config defines the details of the model like the number of layers, the size of the embedding, etc.
+    # Speaker manager is used by multi-speaker models.
+    model = TrainGlowTTS(config, ap, tokenizer, speaker_manager=None)
+    data_parallel = init_from_env()
+    if options.step_metrics or options.profile_every:
+        # Before setup_data_parallel, which points it at this rank's metrics file, and before the
+        # Trainer builds the optimizer so its steps get timed
+        model.step_profiler = StepProfiler(profile_every=options.profile_every, profile_steps=options.profile_steps)
+    if data_parallel:
+        # Started by ddp_cpu.py: train on this rank's shard with gradients averaged across ranks
+        train_samples = setup_data_parallel(model, config, train_samples, *data_parallel)
+    main_process = not data_parallel or data_parallel[0] == 0
+    subset_path = os.path.join(dataset_config.path, SUBSET_NAME)
+    if (options.eval_subset or options.async_eval) and main_process:
+        # A small fixed stratified slice of the eval split instead of all of it
+        eval_samples = load_eval_subset(subset_path, eval_samples, options.eval_subset or DEFAULT_SUBSET_SIZE)
+    if options.async_eval:
+        # Evaluation moves to a separate process watching the checkpoints saved after each epoch
+        config.run_eval = False
+
+    # INITIALIZE THE TRAINER
+    # Trainer provides a generic API to train all the 🐸TTS models with all its perks like mixed-precision training,
+    # distributed training, etc.
+    # Checkpoints are snapshotted to CPU and written in the background (checkpoint_writer.py)
+    trainer = AsyncCheckpointTrainer(
+        TrainerArgs(), config, output_path, model=model, train_samples=train_samples, eval_samples=eval_samples,
+        keep_best=options.keep_best, save_every_epoch=options.async_eval,
+    )
+
+    if options.async_eval and main_process:
+        start_eval_worker(trainer.output_path, "glowtts", subset_path)
+
+    # AND... 3,2,1... 🚀
+    try:
+        trainer.fit()
+    finally:
+        if model.step_profiler is not None:
+            model.step_profiler.close()
+
 
-# AND... 3,2,1... 🚀
-trainer.fit()
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--step_metrics", action="store_true",
+                        help="Write per-step loader/forward/backward/optimizer times to step_metrics.jsonl in the run folder")
+    parser.add_argument("--profile_every", type=int, default=0,
+                        help="Capture a torch.profiler trace every N steps (implies --step_metrics)")
+    parser.add_argument("--profile_steps", type=int, default=3, help="Steps per torch.profiler trace")
+    parser.add_argument("--keep_best", type=int, default=1,
+                        help="Best models to keep (the last config.save_n_checkpoints checkpoints are always kept)")
+    parser.add_argument("--eval_subset", type=int, default=0,
+                        help="Evaluate on a fixed stratified subset of this many eval clips (eval_subset.json)")
+    parser.add_argument("--async_eval", action="store_true",
+                        help=f"Evaluate each epoch's checkpoint in a separate process (async_eval.py) on the subset "
+                             f"(default {DEFAULT_SUBSET_SIZE} clips) instead of in the training loop")
+    # Anything we don't recognise is left for the Trainer's own argument parsing
+    options, sys.argv[1:] = parser.parse_known_args()
+    main(config, options)
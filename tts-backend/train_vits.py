@@ -1,14 +1,29 @@
+import argparse
 import os
+import sys
 
-from trainer import Trainer, TrainerArgs
+import torch
+from torch.utils.data import BatchSampler
+from trainer import TrainerArgs
 
 from TTS.tts.configs.shared_configs import BaseDatasetConfig
 from TTS.tts.configs.vits_config import VitsConfig
 from TTS.tts.datasets import load_tts_samples
 from TTS.tts.models.vits import Vits, VitsAudioConfig
+from TTS.tts.utils.speakers import SpeakerManager
 from TTS.tts.utils.text.tokenizer import TTSTokenizer
 from TTS.utils.audio import AudioProcessor
 
+from async_eval import DEFAULT_SUBSET_SIZE, SUBSET_NAME, load_eval_subset, start_eval_worker
+from checkpoint_writer import AsyncCheckpointTrainer
+from ddp_cpu import DataParallelMixin, EvenLengthSampler, init_from_env, setup_data_parallel
+from duration_index import INDEX_NAME, FrameBudgetBatchSampler, build_duration_index, sample_frames
+from feature_store import FeatureStore
+from finetune import PRETRAINED, finetune_config, resolve_checkpoint, setup_finetune, trainable_only, write_report
+from phoneme_store import use_packed_phonemes
+from shard_dataset import ShardStream
+from training_profiler import StepProfiler, StepProfilerMixin
+
 output_path = os.path.dirname(os.path.abspath(__file__))
 dataset_config = BaseDatasetConfig(
     formatter="ljspeech", meta_file_train="metadata.csv", path=os.path.join(output_path, "workspace/tts-dataset/")
@@ -43,38 +58,249 @@ config = VitsConfig(
     use_grad_scaler=False  # Disabled grad scaler
 )
 
-# INITIALIZE THE AUDIO PROCESSOR
-# Audio processor is used for feature extraction and audio I/O.
-# It mainly serves to the dataloader and the training loggers.
-ap = AudioProcessor.init_from_config(config)
-
-# INITIALIZE THE TOKENIZER
-# Tokenizer is used to convert text to sequences of token IDs.
-# config is updated with the default characters if not defined in the config.
-tokenizer, config = TTSTokenizer.init_from_config(config)
-
-# LOAD DATA SAMPLES
-# Each sample is a list of ```[text, audio_file_path, speaker_name]```
-# You can define your custom sample loader returning the list of samples.
-# Or define your custom formatter and pass it to the `load_tts_samples`.
-# Check `TTS.tts.datasets.load_tts_samples` for more details.
-train_samples, eval_samples = load_tts_samples(
-    dataset_config,
-    eval_split=True,
-    eval_split_max_size=config.eval_split_max_size,
-    eval_split_size= 0.3333333333333333,
-)
+# Per-speaker datasets (ljspeech layout) for --speakers; the dataset name becomes the speaker name
+SPEAKER_DATASETS = {
+    "hi-female": os.path.join(output_path, "workspace/hi-female-dataset/"),
+    "hi-male": os.path.join(output_path, "workspace/hi-male-dataset/"),
+}
 
-# init model
-model = Vits(config, ap, tokenizer, speaker_manager=None)
-
-# init the trainer and 🚀
-trainer = Trainer(
-    TrainerArgs(),
-    config,
-    output_path,
-    model=model,
-    train_samples=train_samples,
-    eval_samples=eval_samples,
-)
-trainer.fit()
+FEATURE_STORE_DIR = os.path.join(output_path, "feature_cache")
+SHARD_DIR = os.path.join(output_path, "shards")
+
+
+def speaker_datasets(speakers):
+    """Dataset configs for "name" (from SPEAKER_DATASETS) or "name=path" entries"""
+    datasets = []
+    for entry in speakers:
+        name, _, path = entry.partition("=")
+        datasets.append(BaseDatasetConfig(
+            formatter="ljspeech", meta_file_train="metadata.csv", path=path or SPEAKER_DATASETS[name], dataset_name=name
+        ))
+    return datasets
+
+
+def label_speakers(samples):
+    """Name each sample's speaker after its dataset (the ljspeech formatter calls every speaker "ljspeech")"""
+    for sample in samples:
+        sample["speaker_name"] = sample["audio_unique_name"].split("#", 1)[0]
+    return samples
+
+
+class TrainVits(DataParallelMixin, StepProfilerMixin, Vits):
+    """Vits with the optional training-time data paths used by this repo"""
+
+    # feature_store.FeatureStore with precomputed spectrograms, or None to compute them per step
+    feature_store = None
+    # duration_index entries plus a frames-per-batch budget enable length-bucketed batches
+    duration_index = None
+    max_frames_per_batch = None
+    # shard_dataset.ShardStream replacing the per-file training loader, or None
+    shard_stream = None
+    _loading_eval = False
+
+    def get_data_loader(self, config, assets, is_eval, samples, verbose, num_gpus, rank=None):
+        if self.shard_stream is not None and not is_eval:
+            return self.shard_stream.loader()
+        # Vits.get_data_loader doesn't pass is_eval on to get_sampler
+        self._loading_eval = is_eval
+        return super().get_data_loader(config, assets, is_eval, samples, verbose, num_gpus, rank)
+
+    def on_train_epoch_start(self, trainer):
+        if self.shard_stream is not None:
+            # The Trainer keeps one loader for the whole run; workers pick the epoch up on each new iterator
+            self.shard_stream.epoch = trainer.epochs_done
+        parent = getattr(super(), "on_train_epoch_start", None)
+        if parent is not None:
+            parent(trainer)
+
+    def get_sampler(self, config, dataset, num_gpus=1, is_eval=False):
+        is_eval = is_eval or self._loading_eval
+        if self.duration_index is None or not self.max_frames_per_batch or num_gpus > 1:
+            sampler = super().get_sampler(config, dataset, num_gpus, is_eval)
+        else:
+            # dataset.samples is what survives Coqui's length filtering, so indices line up
+            lengths = sample_frames(dataset.samples, self.duration_index, config.audio.hop_length)
+            sampler = FrameBudgetBatchSampler(lengths, self.max_frames_per_batch, max_batch_size=config.batch_size * 4)
+            print(f"Length-bucketed batches: {len(sampler)} batches, padding {sampler.padding_ratio():.1%}")
+        if self.data_parallel and not is_eval:
+            # Without Coqui's own DDP path the loader takes this as a batch sampler
+            if sampler is None:
+                sampler = BatchSampler(range(len(dataset)), config.batch_size, drop_last=False)
+            sampler = EvenLengthSampler(sampler)
+        return sampler
+
+    def get_optimizer(self):
+        # Parameters frozen for fine-tuning (finetune.py) carry no optimizer state
+        return trainable_only(super().get_optimizer())
+
+    def format_batch_on_device(self, batch):
+        # Streamed shards may carry their spectrograms along with the audio
+        features = batch.pop("features", None)
+        if features is None and self.feature_store is not None and not self.args.encoder_sample_rate:
+            features = self.feature_store.load_batch(batch["audio_unique_names"])
+        if features is None:
+            return super().format_batch_on_device(batch)
+
+        spec, mel, lengths = features
+        device = batch["waveform"].device
+        batch["spec"] = torch.from_numpy(spec).to(device)
+        batch["mel"] = torch.from_numpy(mel).to(device)
+        batch["spec_lens"] = torch.from_numpy(lengths).to(device)
+        batch["mel_lens"] = batch["spec_lens"]
+        return batch
+
+
+def main(config, options):
+    checkpoint = resolve_checkpoint(options.finetune) if options.finetune else None
+    if checkpoint:
+        # Architecture, characters and audio settings have to match the pretrained weights
+        config = finetune_config(checkpoint, config)
+    speakers = [entry for entry in options.speakers.split(",") if entry] if options.speakers else []
+    if speakers:
+        # One model for several voices, told apart by a learned speaker embedding
+        config.datasets = speaker_datasets(speakers)
+        config.model_args.use_speaker_embedding = True
+
+    # INITIALIZE THE AUDIO PROCESSOR
+    # Audio processor is used for feature extraction and audio I/O.
+    # It mainly serves to the dataloader and the training loggers.
+    ap = AudioProcessor.init_from_config(config)
+
+    # INITIALIZE THE TOKENIZER
+    # Tokenizer is used to convert text to sequences of token IDs.
+    # config is updated with the default characters if not defined in the config.
+    tokenizer, config = TTSTokenizer.init_from_config(config)
+
+    # Serve cached phonemes from the packed store (phoneme_store.py) when it has been built
+    use_packed_phonemes(config.phoneme_cache_path)
+
+    # LOAD DATA SAMPLES
+    # Each sample is a list of ```[text, audio_file_path, speaker_name]```
+    # You can define your custom sample loader returning the list of samples.
+    # Or define your custom formatter and pass it to the `load_tts_samples`.
+    # Check `TTS.tts.datasets.load_tts_samples` for more details.
+    train_samples, eval_samples = load_tts_samples(
+        config.datasets,
+        eval_split=True,
+        eval_split_max_size=config.eval_split_max_size,
+        eval_split_size= 0.3333333333333333,
+    )
+    # The whole eval split stays out of training, even when only a subset of it is evaluated
+    held_out = {s["audio_unique_name"] for s in eval_samples}
+
+    speaker_manager = None
+    if speakers:
+        label_speakers(train_samples + eval_samples)
+        speaker_manager = SpeakerManager.init_from_config(config, train_samples + eval_samples)
+        config.model_args.num_speakers = speaker_manager.num_speakers
+        print(f"Speakers: {speaker_manager.name_to_id}")
+
+    # init model
+    model = TrainVits(config, ap, tokenizer, speaker_manager=speaker_manager)
+    data_parallel = init_from_env()
+    main_process = not data_parallel or data_parallel[0] == 0
+    finetune_report = None
+    if checkpoint:
+        # Every rank loads and freezes the same way; only the main process times the speedup
+        names = [name for name in options.freeze.split(",") if name] if options.freeze else []
+        benchmark_steps = options.freeze_benchmark if main_process else 0
+        # A single-speaker checkpoint has no speaker embedding or conditioning layers yet
+        finetune_report = setup_finetune(model, config, checkpoint, names, train_samples, benchmark_steps,
+                                         partial=bool(speakers))
+    if options.step_metrics or options.profile_every:
+        # Before setup_data_parallel, which points it at this rank's metrics file, and before the
+        # Trainer builds the optimizers so their steps get timed
+        model.step_profiler = StepProfiler(profile_every=options.profile_every, profile_steps=options.profile_steps)
+    if data_parallel:
+        # Started by ddp_cpu.py: train on this rank's shard with gradients averaged across ranks
+        train_samples = setup_data_parallel(model, config, train_samples, *data_parallel)
+    subset_path = os.path.join(config.datasets[0].path, SUBSET_NAME)
+    if (options.eval_subset or options.async_eval) and main_process:
+        # A small fixed stratified slice of the eval split instead of all of it
+        eval_samples = load_eval_subset(subset_path, eval_samples, options.eval_subset or DEFAULT_SUBSET_SIZE)
+    if options.async_eval:
+        # Evaluation moves to a separate process watching the checkpoints saved after each epoch
+        config.run_eval = False
+    if options.use_feature_store:
+        # The store is keyed by the audio config hash, so a changed config finds nothing here
+        model.feature_store = FeatureStore.open_for(FEATURE_STORE_DIR, config.audio)
+        if model.feature_store is None:
+            print("⚠️ No feature store for this audio config, computing spectrograms per step (run feature_store.py)")
+        else:
+            missing = sum(1 for s in train_samples if s["audio_unique_name"] not in model.feature_store)
+            if missing:
+                print(f"⚠️ {missing} training samples are not in the feature store; batches with them compute "
+                      f"spectrograms per step (run feature_store.py)")
+    if options.max_frames_per_batch:
+        # Header-only scan; clips unchanged since the last run are not reopened
+        model.duration_index, _ = build_duration_index(
+            train_samples + eval_samples, os.path.join(config.datasets[0].path, INDEX_NAME)
+        )
+        model.max_frames_per_batch = options.max_frames_per_batch
+    if options.shards:
+        # Sequential reads from packed shards (shard_dataset.py) instead of one random file per sample
+        rank, world_size = data_parallel or (0, 1)
+        model.shard_stream = ShardStream(
+            SHARD_DIR, config, tokenizer, exclude=held_out,
+            buffer_size=options.shuffle_buffer, rank=rank, world_size=world_size,
+            num_workers=config.num_loader_workers,
+        )
+        print(f"Streaming {len(model.shard_stream.keep)} training samples from {SHARD_DIR}")
+
+    # init the trainer and 🚀
+    # Checkpoints are snapshotted to CPU and written in the background (checkpoint_writer.py)
+    trainer = AsyncCheckpointTrainer(
+        TrainerArgs(),
+        config,
+        output_path,
+        model=model,
+        train_samples=train_samples,
+        eval_samples=eval_samples,
+        keep_best=options.keep_best,
+        save_every_epoch=options.async_eval,
+    )
+    if finetune_report and main_process:
+        write_report(finetune_report, trainer.output_path)
+    if options.async_eval and main_process:
+        start_eval_worker(trainer.output_path, "vits", subset_path)
+    try:
+        trainer.fit()
+    finally:
+        if model.step_profiler is not None:
+            model.step_profiler.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--use_feature_store", action="store_true",
+                        help="Read spectrograms precomputed by feature_store.py")
+    parser.add_argument("--max_frames_per_batch", type=int, default=None,
+                        help="Batch clips of similar length under this padded spectrogram-frame budget")
+    parser.add_argument("--shards", action="store_true",
+                        help="Stream training samples from shards packed by shard_dataset.py (with the same --speakers)")
+    parser.add_argument("--shuffle_buffer", type=int, default=1000, help="Samples held for shuffling when streaming")
+    parser.add_argument("--step_metrics", action="store_true",
+                        help="Write per-step loader/forward/backward/optimizer times to step_metrics.jsonl in the run folder")
+    parser.add_argument("--profile_every", type=int, default=0,
+                        help="Capture a torch.profiler trace every N steps (implies --step_metrics)")
+    parser.add_argument("--profile_steps", type=int, default=3, help="Steps per torch.profiler trace")
+    parser.add_argument("--keep_best", type=int, default=1,
+                        help="Best models to keep (the last config.save_n_checkpoints checkpoints are always kept)")
+    parser.add_argument("--eval_subset", type=int, default=0,
+                        help="Evaluate on a fixed stratified subset of this many eval clips (eval_subset.json)")
+    parser.add_argument("--async_eval", action="store_true",
+                        help=f"Evaluate each epoch's checkpoint in a separate process (async_eval.py) on the subset "
+                             f"(default {DEFAULT_SUBSET_SIZE} clips) instead of in the training loop")
+    parser.add_argument("--finetune", default=None,
+                        help=f"Start from a pretrained checkpoint ({', '.join(PRETRAINED)} or a path) using its model config")
+    parser.add_argument("--freeze", default="",
+                        help="Comma-separated modules to freeze when fine-tuning: text_encoder, duration_predictor, flow, "
+                             "posterior_encoder, waveform_decoder or a dotted path such as waveform_decoder.ups.0")
+    parser.add_argument("--freeze_benchmark", type=int, default=0,
+                        help="Time this many steps on one batch before and after freezing and report the speedup")
+    parser.add_argument("--speakers", default="",
+                        help=f"Train one multi-speaker model on comma-separated speakers: names from SPEAKER_DATASETS "
+                             f"({', '.join(SPEAKER_DATASETS)}) or name=<ljspeech dataset path>")
+    # Anything we don't recognise is left for the Trainer's own argument parsing
+    options, sys.argv[1:] = parser.parse_known_args()
+    main(config, options)
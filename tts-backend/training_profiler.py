@@ -0,0 +1,230 @@
+import json
+import os
+import time
+
+METRICS_NAME = "step_metrics.jsonl"
+
+
+class StepProfiler:
+    """Per-step timing split into loader wait, forward, backward and optimizer time
+
+    Forward covers model.train_step (including loss computation); backward runs
+    from the end of the forward to the optimizer step, so it includes gradient
+    clipping. Models with several optimizers (VITS) sum their passes per step.
+    """
+
+    def __init__(self, output_path=None, profile_every=0, profile_steps=3, file_name=METRICS_NAME):
+        self.output_path = output_path
+        self.file_name = file_name
+        self.profile_every = profile_every
+        self.profile_steps = profile_steps
+        self._file = None
+        self._profiler = None
+        self._last_step_end = None
+        self._in_step = False
+        self._reset()
+
+    def _reset(self):
+        self.forward = self.backward = self.optimizer = 0.0
+        self.samples = 0
+        self.padded_ratio = None
+        self.extra = {}
+        self._mark = None
+        self._excluded = 0.0
+
+    def step_start(self):
+        now = time.perf_counter()
+        self.loader_wait = now - self._last_step_end if self._last_step_end is not None else None
+        self._step_start = now
+        self._in_step = True
+        self._reset()
+
+    def forward_start(self, batch):
+        if not self._in_step:
+            return
+        if not self.samples:
+            self.samples, self.padded_ratio = batch_shape_stats(batch)
+        self._mark = time.perf_counter()
+
+    def forward_end(self):
+        if not self._in_step or self._mark is None:
+            return
+        now = time.perf_counter()
+        self.forward += now - self._mark
+        self._mark = now
+
+    def add(self, phase, seconds):
+        """Account time spent inside an optimizer step hook (e.g. gradient all-reduce) to its own phase"""
+        if not self._in_step:
+            return
+        self.extra[phase] = self.extra.get(phase, 0.0) + seconds
+        self._excluded += seconds
+
+    def _optimizer_pre_hook(self, optimizer, args, kwargs):
+        if not self._in_step:
+            return
+        now = time.perf_counter()
+        if self._mark is not None:
+            self.backward += now - self._mark
+        self._mark = now
+
+    def _optimizer_post_hook(self, optimizer, args, kwargs):
+        if not self._in_step or self._mark is None:
+            return
+        now = time.perf_counter()
+        self.optimizer += now - self._mark - self._excluded
+        self._excluded = 0.0
+        self._mark = now
+
+    def watch_optimizers(self, optimizers):
+        """Attach step hooks to one optimizer or a list of them"""
+        for optimizer in optimizers if isinstance(optimizers, (list, tuple)) else [optimizers]:
+            optimizer.register_step_pre_hook(self._optimizer_pre_hook)
+            optimizer.register_step_post_hook(self._optimizer_post_hook)
+        return optimizers
+
+    def step_end(self, step, output_path=None):
+        if not self._in_step:
+            return
+        now = time.perf_counter()
+        self._in_step = False
+        step_time = now - self._step_start
+        total = step_time + (self.loader_wait or 0.0)
+        record = {
+            "step": step,
+            "time": time.time(),
+            "loader_wait": self.loader_wait,
+            "forward": self.forward,
+            "backward": self.backward,
+            "optimizer": self.optimizer,
+            "step_time": step_time,
+            "samples": self.samples,
+            "samples_per_sec": self.samples / total if total else None,
+            "padded_ratio": self.padded_ratio,
+            **self.extra,
+        }
+        if self._file is None:
+            path = os.path.join(self.output_path or output_path or ".", self.file_name)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._file.write(json.dumps(record) + "\n")
+        self._profile_tick(step, output_path)
+        self._last_step_end = time.perf_counter()
+
+    def _profile_tick(self, step, output_path):
+        """Capture a torch.profiler trace of profile_steps steps every profile_every steps"""
+        if not self.profile_every:
+            return
+        if self._profiler is None and step % self.profile_every == 0:
+            import torch.profiler
+
+            trace_dir = os.path.join(self.output_path or output_path or ".", "profiler_traces")
+            self._profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU],
+                schedule=torch.profiler.schedule(wait=0, warmup=1, active=self.profile_steps, repeat=1),
+                on_trace_ready=torch.profiler.tensorboard_trace_handler(trace_dir),
+                record_shapes=True,
+            )
+            self._profiler.start()
+            self._profile_left = self.profile_steps + 1
+        elif self._profiler is not None:
+            self._profiler.step()
+            self._profile_left -= 1
+            if self._profile_left <= 0:
+                self._profiler.stop()
+                self._profiler = None
+
+    def close(self):
+        if self._profiler is not None:
+            self._profiler.stop()
+            self._profiler = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def batch_shape_stats(batch):
+    """(batch size, fraction of padded frames) from whatever length field the batch carries"""
+    for key in ("waveform_lens", "mel_lengths", "mel_lens", "token_lens", "text_lengths"):
+        lengths = batch.get(key) if isinstance(batch, dict) else None
+        if lengths is not None and len(lengths):
+            total = float(lengths.sum())
+            padded = float(lengths.max()) * len(lengths)
+            return len(lengths), 1 - total / padded if padded else 0.0
+    return 0, None
+
+
+class StepProfilerMixin:
+    """Model mixin feeding Coqui Trainer callbacks and optimizer steps into a StepProfiler
+
+    List it before the Coqui model class, e.g. ``class TrainVits(StepProfilerMixin, Vits)``,
+    and set ``step_profiler`` before the Trainer is created so its optimizers get hooked.
+    """
+
+    step_profiler = None
+
+    def on_train_step_start(self, trainer):
+        if self.step_profiler is not None:
+            self.step_profiler.step_start()
+        parent = getattr(super(), "on_train_step_start", None)
+        if parent is not None:
+            parent(trainer)
+
+    def on_train_step_end(self, trainer):
+        parent = getattr(super(), "on_train_step_end", None)
+        if parent is not None:
+            parent(trainer)
+        if self.step_profiler is not None:
+            self.step_profiler.step_end(trainer.total_steps_done, trainer.output_path)
+
+    def train_step(self, batch, *args, **kwargs):
+        if self.step_profiler is None:
+            return super().train_step(batch, *args, **kwargs)
+        self.step_profiler.forward_start(batch)
+        try:
+            return super().train_step(batch, *args, **kwargs)
+        finally:
+            self.step_profiler.forward_end()
+
+    def get_optimizer(self):
+        optimizers = super().get_optimizer()
+        if self.step_profiler is not None:
+            self.step_profiler.watch_optimizers(optimizers)
+        return optimizers
+
+
+def summarize(metrics_path, skip=10):
+    """Mean per-phase times over a step_metrics.jsonl, skipping warm-up steps"""
+    with open(metrics_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()][skip:]
+    if not records:
+        return {}
+    summary = {}
+    for key in ("loader_wait", "forward", "backward", "optimizer", "grad_sync", "step_time", "samples_per_sec",
+                "padded_ratio"):
+        values = [r[key] for r in records if r.get(key) is not None]
+        summary[key] = sum(values) / len(values) if values else None
+    summary["steps"] = len(records)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize step_metrics.jsonl from a training run")
+    parser.add_argument("metrics", help="Path to step_metrics.jsonl")
+    parser.add_argument("--skip", type=int, default=10, help="Warm-up steps to ignore")
+    args = parser.parse_args()
+
+    summary = summarize(args.metrics, args.skip)
+    if not summary:
+        print("❌ No steps recorded")
+    else:
+        print(f"Steps: {summary['steps']}")
+        for key in ("loader_wait", "forward", "backward", "optimizer", "grad_sync", "step_time"):
+            if summary[key] is not None:
+                print(f"{key:>12}: {summary[key] * 1000:.1f} ms")
+        if summary["samples_per_sec"] is not None:
+            print(f"{'samples/sec':>12}: {summary['samples_per_sec']:.2f}")
+        if summary["padded_ratio"] is not None:
+            print(f"{'padding':>12}: {summary['padded_ratio']:.1%}")
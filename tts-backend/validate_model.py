@@ -1,30 +1,28 @@
 import torch
-import librosa
 import numpy as np
-import matplotlib.pyplot as plt
 from TTS.api import TTS
 import soundfile as sf
 import os
 
-def analyze_audio(audio_data, sr, title, output_dir):
-    """Analyze generated audio and create visualizations"""
-    # Create mel spectrogram
-    mel_spect = librosa.feature.melspectrogram(y=audio_data, sr=sr)
-    mel_spect_db = librosa.power_to_db(mel_spect, ref=np.max)
-    
-    plt.figure(figsize=(10, 4))
-    librosa.display.specshow(mel_spect_db, sr=sr, x_axis='time', y_axis='mel')
-    plt.colorbar(format='%+2.0f dB')
-    plt.title(f'Mel Spectrogram - {title}')
-    plt.tight_layout()
-    plt.savefig(f'{output_dir}/mel_spect_{title}.png')
-    plt.close()
+from audio_analysis import analyze_files, render_plots
+
+def analyze_audio(paths, sr, output_dir, plots=True):
+    """Analyze generated audio files in one batch, then render their spectrograms as a separate stage"""
+    columns, errors = analyze_files(paths, sr)
+    for i, path in enumerate(paths):
+        title = os.path.splitext(os.path.basename(path))[0]
+        if path in errors:
+            print(f"\nAudio Analysis - {title}: {errors[path]}")
+            continue
+        print(f"\nAudio Analysis - {title}")
+        print(f"Max amplitude: {columns['peak'][i]:.3f}")
+        print(f"Mean amplitude: {columns['abs_mean'][i]:.3f}")
+        print(f"Zero values: {columns['zero_ratio'][i]:.2%}")
     
-    # Print audio statistics
-    print(f"\nAudio Analysis - {title}")
-    print(f"Max amplitude: {np.abs(audio_data).max():.3f}")
-    print(f"Mean amplitude: {np.abs(audio_data).mean():.3f}")
-    print(f"Zero values: {(np.abs(audio_data) < 1e-6).sum() / len(audio_data):.2%}")
+    if plots:
+        for error in render_plots([p for p in paths if p not in errors], output_dir, sr, prefix="mel_spect_",
+                                  waveform=False):
+            print(f"Plot failed: {error}")
 
 def validate_model(model_path, config_path, output_dir):
     """Validate model by generating and analyzing audio"""
@@ -46,6 +44,7 @@ def validate_model(model_path, config_path, output_dir):
         {"noise_scale": 0.667, "length_scale": 1.0},
     ]
     
+    outputs = []
     for i, p in enumerate(params):
         try:
             # Generate audio
@@ -59,14 +58,16 @@ def validate_model(model_path, config_path, output_dir):
             output_file = f"{output_dir}/test_{i}.wav"
             sf.write(output_file, wav, 16000)
             
-            # Analyze generated audio
-            analyze_audio(wav, 16000, f"test_{i}", output_dir)
+            outputs.append(output_file)
             
             print(f"\nGenerated {output_file}")
             print(f"Parameters: {p}")
             
         except Exception as e:
             print(f"Error with parameters {p}: {str(e)}")
+    
+    # Analyze generated audio
+    analyze_audio(outputs, 16000, output_dir)
 
 if __name__ == "__main__":
     MODEL_PATH = "./workspace/my-vits-checkpoints/hindi_vits_run-April-14-2025_04+55PM-0000000/best_model_56.pth"